@@ -1,20 +1,55 @@
 # lerncharts_save_fixed.py
 # Kopiere in Pythonista; lege optional eine TTF in denselben Ordner und setze FONT_PATH.
 
-import os, re, unicodedata, io, textwrap
+import os, sys, re, math, unicodedata, io, textwrap, threading, queue, weakref, argparse, hashlib, json, time, struct, zlib
+import importlib, importlib.util
+from bisect import bisect_left
+from collections import OrderedDict, deque, namedtuple
 from datetime import datetime
 
-try:
-    from PIL import Image, ImageDraw, ImageFont
-    PIL_AVAILABLE = True
-except Exception:
-    PIL_AVAILABLE = False
+# Pillow und Pythonistas ui/photos werden erst bei der ersten Benutzung importiert: Parsen, CLI und
+# Batch-Jobs importieren dieses Modul ohne deren Ladezeit (benchmarks.py import prüft das Budget).
+class _LazyModule:
+    def __init__(self, name, alias):
+        self._name = name
+        self._alias = alias
 
-try:
-    import ui, photos
-    UI_AVAILABLE = True
-except Exception:
-    UI_AVAILABLE = False
+    def _load(self):
+        mod = importlib.import_module(self._name)
+        globals()[self._alias] = mod   # ab jetzt greifen alle Funktionen direkt auf das Modul zu
+        return mod
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+def _module_exists(name):
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+PIL = _LazyModule('PIL', 'PIL')
+Image = _LazyModule('PIL.Image', 'Image')
+ImageDraw = _LazyModule('PIL.ImageDraw', 'ImageDraw')
+ImageFont = _LazyModule('PIL.ImageFont', 'ImageFont')
+PIL_AVAILABLE = _module_exists('PIL')
+
+ui = _LazyModule('ui', 'ui')
+photos = _LazyModule('photos', 'photos')
+UI_AVAILABLE = _module_exists('ui') and _module_exists('photos')
+
+def load_pil():
+    # Pillow jetzt laden (vor dem Rendern); False, wenn es fehlt oder nicht importierbar ist
+    global PIL_AVAILABLE
+    if not PIL_AVAILABLE: return False
+    try:
+        for alias in ('PIL', 'Image', 'ImageDraw', 'ImageFont'):
+            mod = globals()[alias]
+            if isinstance(mod, _LazyModule):
+                mod._load()
+    except Exception:
+        PIL_AVAILABLE = False
+    return PIL_AVAILABLE
 
 # ====== Einstellungen ======
 INPUT_FILE = 'cards_raw.txt'
@@ -37,12 +72,79 @@ BASE_DIR = os.path.dirname(__file__) if '__file__' in globals() else os.getcwd()
 GENERATE_SINGLE = True
 SAVE_SINGLES_TO_PHOTOS = True   # wirkt nur, wenn Pythonista/"photos" verfügbar ist
 
+# - Parallel rendern: Anzahl Worker-Prozesse (1 = sequenziell, wie bisher; CLI: --workers N)
+RENDER_WORKERS = 1
+# - Speichern im Hintergrund, während weitergerendert wird (0 = im Render-Ablauf wie früher)
+WRITER_THREADS = 2          # Threads je Ziel (Fotos schreibt immer mit einem, in Kartenreihenfolge)
+WRITER_QUEUE_SIZE = 8       # max. wartende Bilder je Ziel, danach wartet das Rendern (Speichergrenze)
+
 # - Druckbögen erzeugen (mehrere Karten pro Seite)
 GENERATE_SHEETS = True
 SHEET_GRID_COLS = 2
 SHEET_GRID_ROWS = 2
 SHEET_CELL_MARGIN = 0   # Kein Innenabstand - Karten grenzen direkt aneinander
+SHEET_BLEED = 0         # Beschnittzugabe in px je Kartenkante (z.B. int(2 * MM_TO_INCH * DPI) für 2 mm)
+# Rückseiten-Bögen für Duplexdruck spiegeln: 'columns' (Blatt seitlich wenden), 'rows' (nach oben
+# wenden) oder None (Rückseiten in gleicher Anordnung wie die Vorderseiten, wie bisher)
+SHEET_DUPLEX_MIRROR = None
+# Ganzzahlige Verkleinerung (2x2: 1/2, 3x3: 1/3 ...) per Image.reduce statt LANCZOS, deutlich schneller
+SHEET_FAST_REDUCE = True
 SHEET_PAGE_SIZE = IMG_SIZE  # für Konsistenz: gleiche Seitengröße wie Einzelkarten
+# Ohne Einzelkarten (GENERATE_SINGLE = False) die Karten direkt in Zellgröße rendern
+SHEET_DIRECT_RENDER = True
+# Bögen als Bilddateien ('images'), als eine duplex sortierte PDF ('pdf') oder beides ('both')
+SHEET_OUTPUT = 'images'
+SHEET_PDF_NAME = 'sheets.pdf'   # im Ordner SHEETS_SUBDIR
+
+# - Zu lange Karten: 'shrink' verkleinert den Fließtext, bis er passt (nicht unter AUTO_FIT_MIN_BODY_SIZE),
+#   'split' setzt ihn auf Folgekarten fort (card_03_back_2.png ...), 'off' lässt ihn überlaufen.
+#   Passt der Text dann immer noch nicht, gibt es eine Warnung.
+AUTO_FIT = 'shrink'
+AUTO_FIT_MIN_BODY_SIZE = 32     # Referenzpixel wie BODY_FONT_SIZE
+
+# - Render-Cache: unveränderte Karten/Bögen aus früheren Läufen wiederverwenden (CLI: --no-cache)
+RENDER_CACHE = True
+RENDER_CACHE_DIR = '.render_cache'   # relativ zum Ausgabeordner
+RENDER_CACHE_MAX_MB = 512           # ältere Einträge werden darüber hinaus verdrängt
+
+# - Pixelformat von der leeren Seite bis zur Kodierung: 'RGB' (24 Bit, wie bisher), 'L' (Graustufen,
+#   z.B. für S/W-Druck) oder 'P' (feste Palette aus den Designfarben, siehe fixed_palette); L und P
+#   brauchen ein Drittel des Speichers je Seite und kodieren schneller
+PIXEL_MODE = 'RGB'          # Einzelkarten
+SHEET_PIXEL_MODE = None     # Druckbögen (None = wie PIXEL_MODE)
+
+# - Bildformat der Ausgabe: 'png', 'webp' (verlustfrei) oder 'jpeg' (verlustbehaftet)
+#   Vergleich von Zeit und Größe je Karte: python3 benchmarks.py encode
+#   'svg': Vektor ohne Rastern (Bildschirm, Web-Viewer), Text bleibt Text; ohne Render-Cache, Fotos und PDF
+OUTPUT_FORMAT = 'png'
+PNG_COMPRESS_LEVEL = 6      # zlib-Stufe 0-9 (höher = kleiner, aber langsamer)
+PNG_PALETTE = True          # RGB-Seiten auf die feste Palette reduzieren (max. Abweichung 10/255)
+PALETTE_STEPS = 16          # Zwischentöne je Farbübergang (Kantenglättung der Schrift)
+WEBP_METHOD = 2             # 0 = schnell ... 6 = klein (0 ist bei verlustfrei kaum komprimiert)
+WEBP_EFFORT = 0             # 0-100, zusätzlicher Kompressionsaufwand bei verlustfrei
+JPEG_QUALITY = 90
+
+# - Render-Daemon: hält Pillow, Fonts und Caches warm (CLI: --serve startet ihn, --via-daemon nutzt
+#   ihn und rendert selbst, wenn keiner läuft). Nur localhost.
+DAEMON_HOST = '127.0.0.1'
+DAEMON_PORT = 8765
+DAEMON_WORKERS = 2              # gleichzeitige Render-Läufe
+DAEMON_MAX_PENDING = 8          # laufende + wartende Aufträge, darüber antwortet der Daemon mit 503
+DAEMON_MAX_REQUEST_MB = 16
+DAEMON_SUBDIR = 'daemon'        # Auftragsordner relativ zum Ausgabeordner
+DAEMON_CLIENT_TIMEOUT = 600     # Sekunden, die der Client höchstens auf ein Ergebnis wartet
+
+# - Batch-Modus (CLI: --batch ORDNER|GLOB): viele Deck-Dateien parallel, jedes in einen eigenen Ordner
+#   BATCH_SUBDIR/<Deckname>/; ein Journal merkt sich fertige Decks, ein abgebrochener Lauf setzt fort
+BATCH_PATTERN = '*.txt'         # Dateimuster, wenn --batch ein Ordner ist ('**/*.txt' mit Unterordnern)
+BATCH_WORKERS = 2               # parallele Decks (Prozesse; CLI: --jobs N)
+BATCH_SUBDIR = 'batch'          # relativ zum Ausgabeordner
+BATCH_JOURNAL = 'journal.jsonl' # im Ordner BATCH_SUBDIR
+BATCH_LOG_NAME = 'log.txt'      # Ausgabe je Deck, in dessen Ordner
+
+# - Block-Index (CLI: --cards 1470-1480): Byte-Offsets und Hashes der Karten einer Eingabedatei, damit
+#   einzelne Karten ohne Parsen des ganzen Decks neu gerendert werden; wird bei Änderung neu aufgebaut
+DECK_INDEX_DIR = '.deck_index'  # relativ zum Ausgabeordner
 
 # Unterordner für getrennte Speicherung
 SINGLE_SUBDIR = 'single'
@@ -58,92 +160,431 @@ MUTED_TEXT_COLOR = (120, 120, 120)    # Footer/Hinweise
 # Abstand zwischen Kopfzeile (Titelbalken) und Fließtext
 TITLE_BODY_GAP = 60
 
+# Einstellungen, die in den Render-Cache-Schlüssel eingehen (alles, was die Pixel verändert)
+RENDER_CACHE_VERSION = 1
+RENDER_CACHE_SETTINGS = (
+    'IMG_SIZE', 'DPI', 'MARGIN', 'FONT_PATH', 'TITLE_FONT_SIZE', 'BODY_FONT_SIZE', 'SMALL_FONT_SIZE',
+    'BACKGROUND_COLOR', 'ACCENT_COLOR', 'TITLE_TEXT_COLOR', 'BODY_TEXT_COLOR', 'MUTED_TEXT_COLOR',
+    'TITLE_BODY_GAP', 'SHEET_GRID_COLS', 'SHEET_GRID_ROWS', 'SHEET_CELL_MARGIN', 'SHEET_PAGE_SIZE',
+    'SHEET_BLEED', 'SHEET_DUPLEX_MIRROR', 'SHEET_FAST_REDUCE',
+    'SHEET_DIRECT_RENDER', 'OUTPUT_FORMAT', 'PNG_COMPRESS_LEVEL', 'PNG_PALETTE', 'PALETTE_STEPS',
+    'WEBP_METHOD', 'WEBP_EFFORT', 'JPEG_QUALITY', 'AUTO_FIT', 'AUTO_FIT_MIN_BODY_SIZE',
+    'TEXT_RENDERER', 'ATLAS_SUBPIXEL', 'PIXEL_MODE', 'SHEET_PIXEL_MODE',
+)
+
 # ====== Utilities ======
+# Ersetzungen typografischer Zeichen und Entfernen von Steuerzeichen (außer \n und \t) in einem Durchgang
+_SANITIZE_MAP = {
+    '\u2014':' - ', '\u2013':' - ', '\u2018':"'", '\u2019':"'", '\u201c':'"', '\u201d':'"',
+    '\u00ab':'"', '\u00bb':'"', '\u2026':'...', '\xa0':' ',
+    **{chr(c): '' for c in range(32) if c not in (9, 10)},
+}
+_SANITIZE_RE = re.compile('[' + ''.join(re.escape(k) for k in _SANITIZE_MAP) + ']')
+
 def sanitize_text(s):
     if not s: return s
     s = unicodedata.normalize('NFC', s)
-    repl = {'\u2014':' - ', '\u2013':' - ', '\u2018':"'", '\u2019':"'", '\u201c':'"', '\u201d':'"',
-            '\u00ab':'"', '\u00bb':'"', '\u2026':'...', '\xa0':' '}
-    for k,v in repl.items(): s = s.replace(k,v)
-    s = ''.join(ch for ch in s if (ch=='\n' or ch=='\t' or ord(ch) >= 32))
-    return s
+    if _SANITIZE_RE.search(s) is None: return s
+    return _SANITIZE_RE.sub(lambda m: _SANITIZE_MAP[m.group()], s)
+
+def _renormalize(s):
+    # Für Teile eines bereits sanitisierten Texts: nur NFC kann sich durch Tag-Entfernung noch ändern
+    if not s or s.isascii() or unicodedata.is_normalized('NFC', s): return s
+    return unicodedata.normalize('NFC', s)
+
+_TAG_RE = re.compile(r'<[^>]+>')
 
 def strip_tags(s):
-    return re.sub(r'<[^>]+>','', s).strip()
+    return _TAG_RE.sub('', s).strip()
+
+_LOG_LOCK = threading.Lock()
+
+def log_line(*args):
+    # print für mehrere Threads (Hintergrund-Schreiber): jede Meldung bleibt eine ganze Zeile
+    with _LOG_LOCK:
+        print(*args)
 
 def read_raw(path):
     with open(path, 'r', encoding='utf-8') as f: return f.read()
 
+_BLOCK_SEP_RE = re.compile(r'(?m)^\s*-{3,}\s*$')
+
 def split_blocks(text):
-    parts = re.split(r'(?m)^\s*-{3,}\s*$', text)
+    parts = _BLOCK_SEP_RE.split(text)
     return [p.strip() for p in parts if p.strip()]
 
-# robuster Front/Back-Extractor
-def extract_front_back(block):
+# ====== Instrumentierung (Profiling: Zeit je Stufe und Karte, Zähler) ======
+# Stufen: parse, render (enthält wrap), wrap, encode, resize, compose, write, photos.
+# Ohne Profiler ist _PROFILER ein NullProfiler: jeder Messpunkt kostet nur einen Methodenaufruf.
+class _NullTimer:
+    __slots__ = ()
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+
+_NULL_TIMER = _NullTimer()
+
+class NullProfiler:
+    enabled = False
+    def start(self): pass
+    def finish(self): return None
+    def card(self, i, timed=True): return _NULL_TIMER
+    def stage(self, name, card=None): return _NULL_TIMER
+    def count(self, name, n=1): pass
+
+class _Timer:
+    # misst Wand- und CPU-Zeit (des eigenen Threads) eines Abschnitts; name None = ganze Karte,
+    # mit timed=False wird nur die Karte für enthaltene Stufen gesetzt (Hintergrund-Schreiber)
+    __slots__ = ('prof', 'name', 'card', 'timed', 'prev', 't0', 'c0')
+
+    def __init__(self, prof, name, card, timed=True):
+        self.prof = prof
+        self.name = name
+        self.card = card
+        self.timed = timed
+
+    def __enter__(self):
+        local = self.prof._local
+        if self.name is None:
+            self.prev = getattr(local, 'card', None)
+            local.card = self.card
+        elif self.card is None:
+            self.card = getattr(local, 'card', None)
+        self.t0 = time.perf_counter()
+        self.c0 = time.thread_time()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self.t0
+        cpu = time.thread_time() - self.c0
+        if self.name is None:
+            self.prof._local.card = self.prev
+        if self.timed:
+            self.prof._record(self.name, self.card, wall, cpu)
+        return False
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+class RunProfiler:
+    # Hook für generate_from_text(profiler=...): sammelt Wand-/CPU-Zeit je Stufe und je Karte sowie
+    # Zähler (Zeilen umbrochen, measure_text-Aufrufe, Bytes geschrieben, ...). finish() liefert den
+    # Bericht als dict, schreibt ihn optional als JSON und optional einen cProfile-Dump.
+    enabled = True
+
+    def __init__(self, report_path=None, cprofile_path=None):
+        self.report_path = report_path
+        self.cprofile_path = cprofile_path
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stages = {}
+        self.cards = {}
+        self.counters = {}
+        self.report = None
+        self._cprofile = None
+
+    def start(self):
+        self._t0 = time.perf_counter()
+        self._c0 = time.process_time()
+        if self.cprofile_path:
+            import cProfile
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def card(self, i, timed=True):
+        return _Timer(self, None, i, timed)
+
+    def stage(self, name, card=None):
+        return _Timer(self, name, card)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def _record(self, name, card, wall, cpu):
+        with self._lock:
+            if card is not None:
+                entry = self.cards.get(card)
+                if entry is None:
+                    entry = self.cards[card] = {'wall_s': 0.0, 'cpu_s': 0.0, 'stages': {}}
+                if name is None:
+                    entry['wall_s'] += wall
+                    entry['cpu_s'] += cpu
+                    return
+                _add_timing(entry['stages'], name, wall, cpu)
+            if name is not None:
+                _add_timing(self.stages, name, wall, cpu)
+
+    def finish(self):
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.cprofile_path)
+            print('cProfile:', self.cprofile_path)
+        with self._lock:
+            self.report = {
+                'wall_s': time.perf_counter() - self._t0,
+                'cpu_s': time.process_time() - self._c0,
+                'peak_rss_mb': _peak_rss_mb(),
+                'stages': self.stages,
+                'counters': self.counters,
+                'cards': [dict(card=i, **self.cards[i]) for i in sorted(self.cards)],
+            }
+        if self.report_path:
+            with open(self.report_path, 'w', encoding='utf-8') as f:
+                json.dump(self.report, f, indent=2)
+            print('Profil:', self.report_path)
+        return self.report
+
+def _add_timing(table, name, wall, cpu):
+    t = table.get(name)
+    if t is None:
+        t = table[name] = {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0}
+    t['calls'] += 1
+    t['wall_s'] += wall
+    t['cpu_s'] += cpu
+
+_PROFILER = NullProfiler()
+
+# ====== Streaming-Reader (große Dateien, stdin) ======
+def _iter_lines(text):
+    # Zeilen eines str ohne Kopie (wie eine Datei: nur an '\n' trennen, '\n' bleibt erhalten)
+    start = 0
+    n = len(text)
+    while start < n:
+        end = text.find('\n', start)
+        if end < 0:
+            yield text[start:]
+            return
+        yield text[start:end+1]
+        start = end + 1
+
+def _is_separator(line):
+    # entspricht (?m)^\s*-{3,}\s*$ aus split_blocks
+    s = line.strip()
+    return len(s) >= 3 and not s.strip('-')
+
+def iter_blocks(lines):
+    # Blöcke wie split_blocks, aber zeilenweise: jeder Block wird geliefert, sobald sein '---' gelesen ist
+    buf = []
+    for line in lines:
+        if _is_separator(line):
+            block = ''.join(buf).strip()
+            buf = []
+            if block: yield block
+        else:
+            buf.append(line)
+    block = ''.join(buf).strip()
+    if block: yield block
+
+def iter_deck(source):
+    # (front_raw, back_raw) je Karte, lazy. source: Kartentext (str), Dateipfad (os.PathLike),
+    # oder eine Datei/ein Iterable von Zeilen (z.B. sys.stdin)
+    if isinstance(source, str):
+        lines = _iter_lines(source)
+    elif isinstance(source, os.PathLike):
+        yield from iter_deck_file(source)
+        return
+    else:
+        lines = source
+    for block in iter_blocks(lines):
+        yield extract_front_back(block)
+
+def iter_deck_file(path):
+    # Universal-Newlines wie read_raw: \r\n und \r kommen als \n an
+    with open(path, 'r', encoding='utf-8') as f:
+        yield from iter_deck(f)
+
+# ====== Parser (vorkompilierte Muster, ein Tokenisier-Durchgang pro Block) ======
+_RUECKSEITE_RE = re.compile(r'(?mi)(?:^|\n)\s*(r(?:ü|u|ue)ckseite)\s*:?\s*')
+_VORDERSEITE_RE = re.compile(r'(?is)^\s*vorderseite\s*:\s*')
+_ERKLAERUNG_H4_RE = re.compile(r'(?is)<h4[^>]*>.*?erkl(?:ä|a)rung.*?</h4>')
+_H4_BLOCK_RE = re.compile(r'(?is)<h4[^>]*>.*?</h4>')
+_BR_RE = re.compile(r'(?is)<br\s*/?>')
+_H4_RE = re.compile(r'(?is)<h4[^>]*>(.*?)</h4>')
+_LIST_RE = re.compile(r'(?is)<ol[^>]*>(.*?)</ol>|<ul[^>]*>(.*?)</ul>')
+_LI_RE = re.compile(r'(?is)<li[^>]*>(.*?)</li>')
+_P_RE = re.compile(r'(?is)<p[^>]*>(.*?)</p>')
+_PARA_SPLIT_RE = re.compile(r'\n\s*\n')
+_MD_BULLET_RE = re.compile(r'^\s*([-*•]|\d+[\.)])\s+(.*)$')
+
+# Wege, auf denen split_front_back Vorder- und Rückseite trennt
+SPLIT_RUECKSEITE = 'rueckseite'
+SPLIT_SEPARATOR = 'separator'
+SPLIT_ERKLAERUNG = 'erklaerung'
+SPLIT_SECOND_H4 = 'second_h4'
+SPLIT_FRONT_ONLY = 'front_only'
+
+class Face:
+    # Inhalt einer Kartenseite (ersetzt das frühere {'title', 'bullets', 'paragraphs'}-Dict)
+    __slots__ = ('title', 'bullets', 'paragraphs')
+
+    def __init__(self, title='', bullets=None, paragraphs=None):
+        self.title = title
+        self.bullets = bullets if bullets is not None else []
+        self.paragraphs = paragraphs if paragraphs is not None else []
+
+    def as_dict(self):
+        return {'title': self.title, 'bullets': self.bullets, 'paragraphs': self.paragraphs}
+
+    def __eq__(self, other):
+        return isinstance(other, Face) and self.as_dict() == other.as_dict()
+
+    def __repr__(self):
+        return f'Face(title={self.title!r}, bullets={self.bullets!r}, paragraphs={self.paragraphs!r})'
+
+class Card:
+    # Eine geparste Karte; split gibt an, welcher Weg in split_front_back gegriffen hat
+    __slots__ = ('index', 'front', 'back', 'split')
+
+    def __init__(self, index, front, back, split=None):
+        self.index = index
+        self.front = front
+        self.back = back
+        self.split = split
+
+    def __repr__(self):
+        return f'Card({self.index}, front={self.front!r}, back={self.back!r}, split={self.split!r})'
+
+def split_front_back(block):
+    # wie extract_front_back, liefert zusätzlich den Weg der Trennung (SPLIT_*)
     b = unicodedata.normalize('NFC', block)
     # Normalisiere Zeilenumbrüche, damit Regex mit ^|\n robust greift
     b = b.replace('\r\n', '\n').replace('\r', '\n')
     # 1) direkt 'Rückseite' Varianten (mit oder ohne Umlaut, mit/ohne Colon)
-    m = re.search(r'(?mi)(?:^|\n)\s*(r(?:ü|u|ue)ckseite)\s*:?\s*', b)
+    m = _RUECKSEITE_RE.search(b)
     if m:
-        front = b[:m.start()].strip()
-        back  = b[m.end():].strip()
-        front = re.sub(r'(?is)^\s*vorderseite\s*:\s*','', front).strip()
-        return front, back
+        front, back, path = b[:m.start()], b[m.end():].strip(), SPLIT_RUECKSEITE
     # 2) '===' separator fallback
-    if '\n===\n' in b:
-        a,c = b.split('\n===\n',1)
-        a = re.sub(r'(?is)^\s*vorderseite\s*:\s*','', a).strip()
-        return a.strip(), c.strip()
-    # 3) Fallback: Split am "Erklärung"-Heading, falls vorhanden
-    m2 = re.search(r'(?is)<h4[^>]*>.*?erkl(?:ä|a)rung.*?</h4>', b)
-    if m2:
-        front = b[:m2.start()].strip()
-        back  = b[m2.start():].strip()
-        front = re.sub(r'(?is)^\s*vorderseite\s*:\s*','', front).strip()
-        return front, back
-    # 4) Fallback: Wenn es mindestens zwei <h4>-Blöcke gibt, trenne am zweiten
-    h4_iter = list(re.finditer(r'(?is)<h4[^>]*>.*?</h4>', b))
-    if len(h4_iter) >= 2:
-        split_at = h4_iter[1].start()
-        front = b[:split_at].strip()
-        back  = b[split_at:].strip()
-        front = re.sub(r'(?is)^\s*vorderseite\s*:\s*','', front).strip()
-        return front, back
-    # final fallback: treat whole block as front
-    front = re.sub(r'(?is)^\s*vorderseite\s*:\s*','', b).strip()
-    return front, ''
+    elif '\n===\n' in b:
+        front, back = b.split('\n===\n', 1)
+        back, path = back.strip(), SPLIT_SEPARATOR
+    else:
+        # 3) Fallback: Split am "Erklärung"-Heading, 4) sonst am zweiten <h4>-Block
+        m = _ERKLAERUNG_H4_RE.search(b)
+        path = SPLIT_ERKLAERUNG
+        if not m:
+            h4_iter = _H4_BLOCK_RE.finditer(b)
+            m = next(h4_iter, None) and next(h4_iter, None)
+            path = SPLIT_SECOND_H4
+        if m:
+            front, back = b[:m.start()], b[m.start():].strip()
+        else:
+            # final fallback: treat whole block as front
+            front, back, path = b, '', SPLIT_FRONT_ONLY
+    front = _VORDERSEITE_RE.sub('', front.strip(), count=1).strip()
+    return front, back, path
 
-def parse_card_html_like(text):
-    if not text: return {'title':'', 'bullets':[], 'paragraphs':[]}
-    t = text.replace('\r\n','\n').replace('\r','\n')
-    # ersetze <br> zu Zeilenumbrüchen vor dem Tag-Strip
-    t = re.sub(r'(?is)<br\s*/?>', '\n', t)
-    t = sanitize_text(t)
+# robuster Front/Back-Extractor
+def extract_front_back(block):
+    front, back, _ = split_front_back(block)
+    return front, back
+
+_TAG_KINDS = ('h4', 'ol', 'ul', 'li', 'p')
+_CLOSE_TAGS = {f'</{k}>': k for k in _TAG_KINDS}
+
+class _TagIndex:
+    # Positionen aller relevanten Tags eines Textes aus einem einzigen Tokenisier-Durchgang.
+    # pairs() bildet die Treffer von re.findall(r'<k[^>]*>(.*?)</k>') exakt nach.
+    __slots__ = ('opens', 'closes', 'close_starts')
+
+    def __init__(self):
+        self.opens = {k: [] for k in _TAG_KINDS}
+        self.closes = {k: [] for k in _TAG_KINDS}
+        self.close_starts = {k: [] for k in _TAG_KINDS}
+
+    @classmethod
+    def build(cls, t):
+        # None, wenn ein '<' nicht sauber als eigenes Tag endet (z.B. "a < b <p>") –
+        # dann können sich Regex-Treffer überlappen und der Regex-Weg wird genommen.
+        idx = cls()
+        n = 0
+        for m in _TAG_RE.finditer(t):
+            n += 1
+            tok = m.group()
+            kind = _CLOSE_TAGS.get(tok.lower()) if tok[1] == '/' else None
+            if kind:
+                idx.closes[kind].append((m.start(), m.end()))
+                idx.close_starts[kind].append(m.start())
+                continue
+            head = tok[1:3].lower()
+            if head in ('h4', 'ol', 'ul', 'li'):
+                idx.opens[head].append((m.start(), m.end()))
+            elif head[:1] == 'p':
+                idx.opens['p'].append((m.start(), m.end()))
+        if n != t.count('<'):
+            return None
+        return idx
+
+    def pairs(self, kinds, lo=0, hi=None):
+        # [(content_start, content_end, match_end)] wie re.findall über t[lo:hi]
+        opens = self.opens[kinds[0]] if len(kinds) == 1 else \
+            sorted((s, e, k) for k in kinds for s, e in self.opens[k])
+        res = []
+        pos = lo
+        for o in opens:
+            s, e = o[0], o[1]
+            k = o[2] if len(o) > 2 else kinds[0]
+            if s < pos: continue
+            if hi is not None and e > hi: break
+            j = bisect_left(self.close_starts[k], e)
+            if j == len(self.close_starts[k]): continue
+            cs, ce = self.closes[k][j]
+            if hi is not None and ce > hi: continue
+            res.append((e, cs, ce))
+            pos = ce
+        return res
+
+def _scan_tokens(t, idx):
+    title = ''
+    bullets = []
+    h4 = idx.pairs(('h4',))
+    if h4:
+        title = strip_tags(t[h4[0][0]:h4[0][1]])
+    # Sammle OL/UL Listenpunkte
+    for s, e, _ in idx.pairs(('ol', 'ul')):
+        for li_s, li_e, _ in idx.pairs(('li',), s, e):
+            bullets.append(strip_tags(t[li_s:li_e]))
+    paras_raw = [t[s:e] for s, e, _ in idx.pairs(('p',))]
+    return title, bullets, paras_raw
+
+def _scan_regex(t):
     title = ''
     bullets = []
-    paras = []
-    m = re.search(r'(?is)<h4[^>]*>(.*?)</h4>', t)
+    m = _H4_RE.search(t)
     if m:
         title = strip_tags(m.group(1))
-    # Sammle OL/UL Listenpunkte
-    lists_content = re.findall(r'(?is)<ol[^>]*>(.*?)</ol>|<ul[^>]*>(.*?)</ul>', t)
-    for ol_content, ul_content in lists_content:
-        content = ol_content if ol_content is not None and ol_content != '' else ul_content
+    for ol_content, ul_content in _LIST_RE.findall(t):
+        content = ol_content or ul_content
         if content:
-            items = re.findall(r'(?is)<li[^>]*>(.*?)</li>', content)
-            for it in items:
-                bullets.append(strip_tags(it))
-    # Paragraphen sammeln (jeder <p> kann \n enthalten, diese als einzelne Zeilen behandeln)
-    paras_raw = re.findall(r'(?is)<p[^>]*>(.*?)</p>', t)
-    tmp = []
+            bullets.extend(strip_tags(it) for it in _LI_RE.findall(content))
+    return title, bullets, _P_RE.findall(t)
+
+def _paragraph_lines(paras_raw):
+    # jeder <p> kann \n enthalten, diese als einzelne Zeilen behandeln
+    out = []
     for p in paras_raw:
-        stripped = strip_tags(p)
-        tmp.extend([ln.strip() for ln in stripped.split('\n') if ln.strip()])
-    paras = tmp
+        for ln in strip_tags(p).split('\n'):
+            ln = ln.strip()
+            if ln: out.append(ln)
+    return out
+
+def parse_card_html_like(text):
+    if not text: return Face()
+    t = text.replace('\r\n','\n').replace('\r','\n')
+    # ersetze <br> zu Zeilenumbrüchen vor dem Tag-Strip
+    if '<' in t:
+        t = _BR_RE.sub('\n', t)
+    t = sanitize_text(t)
+    idx = _TagIndex.build(t)
+    title, bullets, paras_raw = _scan_tokens(t, idx) if idx is not None else _scan_regex(t)
+    paras = _paragraph_lines(paras_raw)
     if not title and not bullets and not paras:
         plain = strip_tags(t)
-        parts = [p.strip() for p in re.split(r'\n\s*\n', plain) if p.strip()]
+        parts = [p.strip() for p in _PARA_SPLIT_RE.split(plain) if p.strip()]
         if parts:
             first = parts[0]
             if len(first) < 140 and '\n' not in first and len(parts) > 1:
@@ -154,73 +595,174 @@ def parse_card_html_like(text):
             paras = [plain]
     # Markdown/Plaintext Bullets als Fallback erkennen, falls noch keine bullets
     if not bullets:
-        lines = [ln for para in paras for ln in para.split('\n') if ln.strip()]
         md_bullets = []
-        for ln in lines:
-            mdb = re.match(r'^\s*([-*•]|\d+[\.)])\s+(.*)$', ln)
-            if mdb:
-                md_bullets.append(mdb.group(2).strip())
+        for para in paras:
+            for ln in para.split('\n'):
+                if not ln.strip(): continue
+                mdb = _MD_BULLET_RE.match(ln)
+                if mdb:
+                    md_bullets.append(mdb.group(2).strip())
         if len(md_bullets) >= 2:
             bullets = md_bullets
             paras = []
-    title = sanitize_text(strip_tags(title))
-    bullets = [sanitize_text(b) for b in bullets]
-    paras = [sanitize_text(p) for p in paras]
+    # alles stammt aus dem sanitisierten t – nur die NFC-Form muss nachgezogen werden
+    title = _renormalize(strip_tags(title))
+    bullets = [_renormalize(b) for b in bullets]
+    paras = [_renormalize(p) for p in paras]
     # Fallback: Wenn ein Titel vorhanden ist, aber weder Absätze noch Bullets erkannt wurden,
     # versuche den restlichen Inhalt ohne <h4>-Block erneut zu parsen bzw. als Plaintext zu übernehmen.
     if title and not bullets and not paras:
-        body_only = re.sub(r'(?is)<h4[^>]*>.*?</h4>', '', t).strip()
-        paras_raw = re.findall(r'(?is)<p[^>]*>(.*?)</p>', body_only)
-        tmp = []
-        for p in paras_raw:
-            stripped = strip_tags(p)
-            parts = [ln.strip() for ln in stripped.split('\n') if ln.strip()]
-            tmp.extend(parts)
+        body_only = _H4_BLOCK_RE.sub('', t).strip()
+        tmp = _paragraph_lines(_P_RE.findall(body_only))
         if tmp:
-            paras = [sanitize_text(p) for p in tmp]
+            paras = [_renormalize(p) for p in tmp]
         else:
             plain = strip_tags(body_only).strip()
             if plain:
-                paras = [sanitize_text(p) for p in re.split(r'\n\s*\n', plain) if p.strip()] or [sanitize_text(plain)]
-    return {'title':title, 'bullets':bullets, 'paragraphs':paras}
+                paras = [_renormalize(p) for p in _PARA_SPLIT_RE.split(plain) if p.strip()] or [_renormalize(plain)]
+    return Face(title, bullets, paras)
 
-# ====== Font loader with clear fallback ======
-def load_truetype_or_none(size):
-    if not PIL_AVAILABLE: return None
-    # if user provided FONT_PATH
-    if FONT_PATH:
-        p = os.path.join(os.path.dirname(__file__) if '__file__' in globals() else '.', FONT_PATH)
-        if os.path.exists(p):
+def parse_card(index, front_raw, back_raw, split=None):
+    return Card(index, parse_card_html_like(front_raw), parse_card_html_like(back_raw), split)
+
+# ====== Font-Registry (prozessweit, löst die Schrift einmal auf und cached die Faces) ======
+# Schriftgrößen der Karten (Titel, Fließtext, Footer)
+TITLE_FONT_SIZE = 128
+BODY_FONT_SIZE = 54
+SMALL_FONT_SIZE = 22
+# Maximale Anzahl gecachter FreeTypeFont-Objekte (LRU)
+FONT_CACHE_SIZE = 32
+# Text zeichnen: 'pil' = draw.text (formt und rastert jede Zeile neu), 'atlas' = jede Glyphe einmal je
+# Font, Größe und Subpixel-Phase rastern und Zeilen aus den Masken zusammensetzen (GlyphAtlas)
+TEXT_RENDERER = 'atlas'
+ATLAS_SUBPIXEL = 4          # Phasen je Pixel (horizontal und vertikal)
+ATLAS_MAX_GLYPHS = 20000    # darüber wird der Atlas geleert und neu aufgebaut
+
+# Systempfade (macOS, Windows, Linux), falls FONT_PATH nicht greift
+FONT_CANDIDATES = [
+    '/System/Library/Fonts/Helvetica.ttc',
+    '/System/Library/Fonts/HelveticaNeue.ttc',
+    '/Library/Fonts/Arial.ttf',
+    'C:\\Windows\\Fonts\\arial.ttf',
+    'C:\\Windows\\Fonts\\Arial.ttf',
+    'C:\\Windows\\Fonts\\SegoeUI.ttf',
+    'C:\\Windows\\Fonts\\Tahoma.ttf',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans-Book.ttf',
+    '/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf',
+    '/usr/share/fonts/truetype/freefont/FreeSans.ttf',
+    '/usr/share/fonts/truetype/noto/NotoSans-Regular.ttf',
+    '/usr/share/fonts/truetype/ubuntu/Ubuntu-R.ttf',
+]
+
+class FontRegistry:
+    # Sucht die Schriftdatei genau einmal und hält geladene Faces nach (path, size, index)
+    # in einem begrenzten LRU-Cache. Alle Renderer holen ihre Fonts von hier.
+    def __init__(self, max_entries=FONT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._fonts = OrderedDict()
+        self._path = None
+        self._resolved = False
+        self._default = None
+        self._lock = threading.RLock()
+
+    def _user_font_path(self):
+        if not FONT_PATH: return None
+        return os.path.join(os.path.dirname(__file__) if '__file__' in globals() else '.', FONT_PATH)
+
+    def resolve_path(self, probe_size=BODY_FONT_SIZE):
+        # Ergebnis (auch "keine Schrift gefunden") wird gemerkt, damit nicht bei jedem Aufruf
+        # erneut FONT_PATH und alle Kandidaten per os.path.exists abgeklappert werden.
+        with self._lock:
+            if self._resolved: return self._path
+            if not PIL_AVAILABLE: return None
+            user_path = self._user_font_path()
+            for c in ([user_path] if user_path else []) + FONT_CANDIDATES:
+                try:
+                    if not os.path.exists(c): continue
+                    font = ImageFont.truetype(c, probe_size)
+                except Exception as e:
+                    if c == user_path:
+                        print('TTF konnte nicht geladen werden von', c, 'Fehler:', e)
+                    continue
+                self._path = c
+                self.misses += 1
+                self._store((c, probe_size, 0), font)
+                break
+            self._resolved = True
+            return self._path
+
+    def _store(self, key, font):
+        self._fonts[key] = font
+        self._fonts.move_to_end(key)
+        while len(self._fonts) > self.max_entries:
+            self._fonts.popitem(last=False)
+
+    def get(self, size, path=None, index=0):
+        if not PIL_AVAILABLE: return None
+        path = path or self.resolve_path(size)
+        if not path: return None
+        key = (path, size, index)
+        with self._lock:
+            font = self._fonts.get(key)
+            if font is not None:
+                self._fonts.move_to_end(key)
+                self.hits += 1
+                return font
+            self.misses += 1
             try:
-                return ImageFont.truetype(p, size)
+                font = ImageFont.truetype(path, size, index=index)
             except Exception as e:
-                print('TTF konnte nicht geladen werden von', p, 'Fehler:', e)
-    # try common system paths (macOS, Windows, Linux)
-    candidates = [
-        '/System/Library/Fonts/Helvetica.ttc',
-        '/System/Library/Fonts/HelveticaNeue.ttc',
-        '/Library/Fonts/Arial.ttf',
-        'C:\\Windows\\Fonts\\arial.ttf',
-        'C:\\Windows\\Fonts\\Arial.ttf',
-        'C:\\Windows\\Fonts\\SegoeUI.ttf',
-        'C:\\Windows\\Fonts\\Tahoma.ttf',
-        '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
-        '/usr/share/fonts/truetype/dejavu/DejaVuSans-Book.ttf',
-        '/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf',
-        '/usr/share/fonts/truetype/freefont/FreeSans.ttf',
-        '/usr/share/fonts/truetype/noto/NotoSans-Regular.ttf',
-        '/usr/share/fonts/truetype/ubuntu/Ubuntu-R.ttf',
-    ]
-    for c in candidates:
-        try:
-            if os.path.exists(c):
-                return ImageFont.truetype(c, size)
-        except Exception:
-            pass
-    # not available -> return None
-    return None
+                print('TTF konnte nicht geladen werden von', path, 'Fehler:', e)
+                return None
+            self._store(key, font)
+            return font
+
+    def prewarm(self, sizes=(TITLE_FONT_SIZE, BODY_FONT_SIZE, SMALL_FONT_SIZE)):
+        for s in sizes:
+            self.get(s)
+        return self
+
+    def default_font(self):
+        with self._lock:
+            if self._default is None:
+                self._default = ImageFont.load_default()
+            return self._default
+
+    def card_fonts(self, sizes=(TITLE_FONT_SIZE, BODY_FONT_SIZE, SMALL_FONT_SIZE)):
+        # (title, body, small) – fällt wie bisher komplett auf die Default-Schrift zurück,
+        # wenn Titel oder Fließtext nicht als TrueType geladen werden können.
+        title, body, small = (self.get(s) for s in sizes)
+        if title is None or body is None:
+            d = self.default_font()
+            return (d, d, d)
+        return (title, body, small)
+
+    def has_truetype(self):
+        return self.resolve_path() is not None
+
+    def stats(self):
+        with self._lock:
+            return {'path': self._path, 'hits': self.hits, 'misses': self.misses,
+                    'cached': len(self._fonts), 'max_entries': self.max_entries}
+
+    def clear(self):
+        with self._lock:
+            self._fonts.clear()
+            self._path = None
+            self._resolved = False
+            self._default = None
+            self.hits = self.misses = 0
+
+FONTS = FontRegistry()
+
+def load_truetype_or_none(size):
+    return FONTS.get(size)
 
 def measure_text(draw, text, font):
+    _PROFILER.count('measure_text')
     try:
         bbox = draw.textbbox((0,0), text, font=font)
         return bbox[2] - bbox[0], bbox[3] - bbox[1]
@@ -230,7 +772,110 @@ def measure_text(draw, text, font):
         except Exception:
             return (len(text) * (getattr(font, 'size', 10)), getattr(font, 'size', 10))
 
+# ====== Text-Metriken (gecachte Wort- und Glyph-Maße pro Font) ======
+# Maximale Anzahl gecachter Wortbreiten pro Font (LRU)
+METRICS_CACHE_SIZE = 8192
+
+class TextMetrics:
+    # Wortbreiten (Advances) werden pro Font gecacht; Zeilenumbruch summiert nur noch diese
+    # Advances. Ein exaktes textbbox gibt es nur noch, wenn die Schätzung so nah an max_w liegt,
+    # dass Kerning/Bearings die Entscheidung kippen könnten -> gleiche Umbrüche wie früher.
+    def __init__(self, font, max_entries=METRICS_CACHE_SIZE):
+        self.font = font
+        self.max_entries = max_entries
+        self.space = font.getlength(' ')
+        # Toleranzband um max_w: Abweichung zwischen Advance-Summe und Ink-Bbox
+        self.slack = 2 + 0.2 * getattr(font, 'size', 10)
+        self._advances = OrderedDict()
+        self._extents = {}
+        self._lock = threading.Lock()
+
+    def advance(self, word):
+        with self._lock:
+            w = self._advances.get(word)
+            if w is not None:
+                self._advances.move_to_end(word)
+                return w
+        w = self.font.getlength(word)
+        with self._lock:
+            self._advances[word] = w
+            if len(self._advances) > self.max_entries:
+                self._advances.popitem(last=False)
+        return w
+
+    def _extent(self, ch):
+        e = self._extents.get(ch)
+        if e is None:
+            b = self.font.getbbox(ch)
+            e = self._extents[ch] = (b[1], b[3])
+        return e
+
+    def line_height(self, text):
+        # Höhe der Ink-Bbox = max(bottom) - min(top) über die Glyphen; identisch zu textbbox
+        if not text: return 0
+        top = bottom = None
+        for ch in set(text):
+            t, b = self._extent(ch)
+            if top is None or t < top: top = t
+            if bottom is None or b > bottom: bottom = b
+        return bottom - top
+
+    def wrap(self, text, max_w, exact_width):
+        words = text.split()
+        if not words: return ['']
+        lines = []
+        cur = [words[0]]
+        cur_w = self.advance(words[0])
+        lo, hi = max_w - self.slack, max_w + self.slack
+        for w in words[1:]:
+            est = cur_w + self.space + self.advance(w)
+            if est <= lo:
+                fits = True
+            elif est > hi:
+                fits = False
+            else:
+                fits = exact_width(' '.join(cur) + ' ' + w) <= max_w
+            if fits:
+                cur.append(w)
+                cur_w = est
+            else:
+                lines.append(' '.join(cur))
+                cur = [w]
+                cur_w = self.advance(w)
+        lines.append(' '.join(cur))
+        return lines
+
+_METRICS = weakref.WeakKeyDictionary()
+_METRICS_LOCK = threading.Lock()
+
+def metrics_for(font):
+    # None, wenn der Font keine Advance-/Bbox-Abfragen kann (sehr alte Pillow-Bitmapfonts)
+    m = _METRICS.get(font)
+    if m is None:
+        if not (hasattr(font, 'getlength') and hasattr(font, 'getbbox')):
+            return None
+        with _METRICS_LOCK:
+            m = _METRICS.get(font)
+            if m is None:
+                m = _METRICS[font] = TextMetrics(font)
+    return m
+
+def line_height(draw, text, font):
+    m = metrics_for(font)
+    if m is None:
+        return measure_text(draw, text, font)[1]
+    return m.line_height(text)
+
 def wrap_by_width(draw, text, font, max_w):
+    with _PROFILER.stage('wrap'):
+        lines = _wrap_by_width(draw, text, font, max_w)
+    _PROFILER.count('lines_wrapped', len(lines))
+    return lines
+
+def _wrap_by_width(draw, text, font, max_w):
+    m = metrics_for(font)
+    if m is not None:
+        return m.wrap(text, max_w, lambda s: measure_text(draw, s, font)[0])
     words = text.split()
     if not words: return ['']
     lines = []
@@ -246,166 +891,551 @@ def wrap_by_width(draw, text, font, max_w):
     lines.append(cur)
     return lines
 
-# ====== Renderer (uses truetype if available; if not, prints instructions) ======
-def render_front(struct, idx, fonts):
-    img = Image.new('RGB', IMG_SIZE, BACKGROUND_COLOR); draw = ImageDraw.Draw(img)
-    title_font, body_font, small_font = fonts
-    x, y = MARGIN, MARGIN
-    content_w = IMG_SIZE[0] - 2*MARGIN
-    # Kopfzeile
-    header_h = max(120, int(IMG_SIZE[1] * 0.22))
-    draw.rectangle([0,0, IMG_SIZE[0], header_h], fill=ACCENT_COLOR)
-    if struct['title']:
-        lines = wrap_by_width(draw, struct['title'], title_font, content_w)
-        ty = int(header_h/2)
-        total_h = 0
-        tmp_sizes = []
-        for ln in lines:
-            w, h = measure_text(draw, ln, title_font)
-            tmp_sizes.append((ln,w,h))
-            total_h += int(h*1.1)
-        cur_y = ty - total_h//2
-        for ln, w, h in tmp_sizes:
-            draw.text(((IMG_SIZE[0]-w)//2, cur_y), ln, font=title_font, fill=TITLE_TEXT_COLOR)
-            cur_y += int(h*1.1)
-    y = header_h + TITLE_BODY_GAP
-    if struct['bullets']:
-        for i,b in enumerate(struct['bullets'], start=1):
-            prefix = f"{i}. "
-            wrapped = wrap_by_width(draw, b, body_font, content_w-80)
-            for j, ln in enumerate(wrapped):
-                txt = prefix + ln if j==0 else ' ' * len(prefix) + ln
-                draw.text((x,y), txt, font=body_font, fill=BODY_TEXT_COLOR)
-                _, h = measure_text(draw, txt, body_font)
-                y += int(h * 1.2)
-            y += 22
+# ====== Layout-Parameter (auflösungsunabhängig, skaliert von IMG_SIZE auf die Zielgröße) ======
+LayoutParams = namedtuple('LayoutParams', 'size scale margin header_h title_body_gap font_sizes '
+                                          'block_gap hint_offset wrap_w')
+
+def layout_params(size=None):
+    # Bei size == IMG_SIZE entsprechen alle Werte exakt den bisherigen Konstanten
+    size = tuple(size or IMG_SIZE)
+    scale = min(size[0] / IMG_SIZE[0], size[1] / IMG_SIZE[1])
+    def px(v): return max(1, int(round(v * scale)))
+    return LayoutParams(
+        size=size, scale=scale,
+        margin=px(MARGIN),
+        header_h=max(px(120), int(size[1] * 0.22)),
+        title_body_gap=px(TITLE_BODY_GAP),
+        font_sizes=(px(TITLE_FONT_SIZE), px(BODY_FONT_SIZE), px(SMALL_FONT_SIZE)),
+        block_gap=px(22),
+        hint_offset=px(40),
+        # Umbruchbreite in Referenzpixeln (IMG_SIZE): jede Zielgröße bricht wie die A4-Karte um
+        wrap_w=int(round(size[0] / scale)) - 2*MARGIN,
+    )
+
+def fit_size(src_size, target_w, target_h):
+    # Größe, die src_size mit gleichem Seitenverhältnis in (target_w, target_h) einnimmt
+    scale = min(target_w / src_size[0], target_h / src_size[1])
+    return (max(1, int(src_size[0] * scale)), max(1, int(src_size[1] * scale)))
+
+# ====== Glyph-Atlas (jede Glyphe einmal rastern, Zeilen aus gecachten Masken zusammensetzen) ======
+class GlyphAtlas:
+    # Alpha-Masken je (Font, Größe, Zeichen, Subpixel-Phase) plus Advances und Kerning-Paare.
+    # draw_text setzt eine Zeile wie draw.text zusammen: Stiftposition = Summe der Advances + Kerning
+    # (in 1/64 px wie FreeType), Glyphe an der ganzzahligen Position, Nachkommaanteil als Phase
+    # (x in 1/subpixel px; y exakt in 1/64 px, da eine Zeile nur eine y-Phase hat).
+    def __init__(self, max_glyphs=ATLAS_MAX_GLYPHS, subpixel=ATLAS_SUBPIXEL):
+        self.max_glyphs = max_glyphs
+        self.subpixel = max(1, subpixel)
+        self.hits = 0
+        self.misses = 0
+        self._fonts = {}
+        self._ramps = {}
+        self._glyphs = 0
+        self._lock = threading.Lock()
+
+    def _entry(self, font):
+        key = (getattr(font, 'path', None), font.size, getattr(font, 'index', 0))
+        entry = self._fonts.get(key)
+        if entry is None:
+            entry = self._fonts[key] = ({}, {}, {})   # Masken, Advances, Kerning
+        return entry
+
+    def _glyph(self, font, masks, ch, fx, fy):
+        key = (ch, fx, fy)
+        g = masks.get(key)
+        if g is not None:
+            self.hits += 1
+            return g
+        self.misses += 1
+        mask, offset = font.getmask2(ch, mode='L', start=(fx / self.subpixel, fy / 64))
+        img = Image.frombytes('L', mask.size, bytes(mask)) if mask.size[0] and mask.size[1] else None
+        g = (img, offset)
+        with self._lock:
+            if self._glyphs >= self.max_glyphs:   # Grenze erreicht: Atlas leeren und neu aufbauen
+                for m, _, _ in self._fonts.values():
+                    m.clear()
+                self._glyphs = 0
+            masks[key] = g
+            self._glyphs += 1
+        return g
+
+    def line_positions(self, font, text):
+        # Stiftposition jedes Zeichens relativ zum Zeilenanfang
+        _, advances, kerning = self._entry(font)
+        pens, pen, prev = [], 0.0, None
+        for ch in text:
+            adv = advances.get(ch)
+            if adv is None:
+                adv = advances[ch] = font.getlength(ch)
+            if prev is not None:
+                pair = prev + ch
+                k = kerning.get(pair)
+                if k is None:
+                    k = kerning[pair] = font.getlength(pair) - advances[prev] - adv
+                pen += k
+            pens.append(pen)
+            pen += adv
+            prev = ch
+        return pens
+
+    def draw_text(self, img, xy, text, font, fill):
+        if not isinstance(font, ImageFont.FreeTypeFont):   # Bitmap-Default-Schrift: wie bisher
+            ImageDraw.Draw(img).text(xy, text, font=font, fill=fill)
+            return
+        masks = self._entry(font)[0]
+        q = self.subpixel
+        # wie draw.text: ganzzahliger Anteil als Position, Nachkommaanteil als Start in 1/64 px
+        x0, y0 = int(xy[0]), int(xy[1])
+        sx, fy = round(math.modf(xy[0])[0] * 64), round(math.modf(xy[1])[0] * 64)
+        placed = []
+        for ch, pen in zip(text, self.line_positions(font, text)):
+            x64 = sx + int(pen * 64)
+            mask, (ox, oy) = self._glyph(font, masks, ch, (x64 & 63) * q >> 6, fy)
+            if mask is not None:
+                placed.append((mask, x0 + (x64 >> 6) + ox, y0 + oy))
+        if not placed:
+            return
+        # Zeilenmaske wie Pillow: Glyphen übereinander geblendet, dann einmal mit der Farbe mischen
+        left, top = min(x for _, x, _ in placed), min(y for _, _, y in placed)
+        right = max(x + m.size[0] for m, x, _ in placed)
+        bottom = max(y + m.size[1] for m, _, y in placed)
+        W, H = img.size
+        if right <= 0 or bottom <= 0 or left >= W or top >= H:
+            return   # Zeile liegt ganz außerhalb (Überlauf unter den Rand)
+        line = Image.new('L', (right - left, bottom - top))
+        for mask, x, y in placed:
+            line.paste(255, (x - left, y - top), mask)
+        if img.mode == 'P':
+            # Palette: Deckung -> Index auf der Rampe Hintergrund -> Schrift, dann die Indizes überall
+            # dort einsetzen, wo die Glyphen etwas decken. Ist der Untergrund nicht einfarbig (Überlauf
+            # über den Footer, Zeile ragt über den Rand), wird der Ausschnitt in RGB gemischt.
+            under = img.crop((left, top, right, bottom))
+            bg, hi = under.getextrema()
+            if bg != hi:
+                rgb = under.convert('RGB')
+                rgb.paste(tuple(fixed_palette().getpalette()[3*fill:3*fill+3]), (0, 0), line)
+                img.paste(quantize_fixed(rgb), (left, top))
+                return
+            idx = line.point(self._ramp(bg, fill))
+            idx.putpalette(fixed_palette().palette)
+            img.paste(idx, (left, top), line.point(_COVERED_LUT))
+        else:
+            img.paste(fill, (left, top), line)
+
+    def _ramp(self, bg, fg):
+        # 256 Paletten-Indizes für Deckung 0..255 zwischen den Paletten-Einträgen bg und fg
+        key = (bg, fg)
+        lut = self._ramps.get(key)
+        if lut is None:
+            pal = fixed_palette().getpalette()
+            a, b = pal[3*bg:3*bg+3], pal[3*fg:3*fg+3]
+            blend = Image.new('RGB', (256, 1))
+            blend.putdata([tuple(round(a[j] + (b[j] - a[j]) * k / 255) for j in range(3)) for k in range(256)])
+            lut = self._ramps[key] = list(quantize_fixed(blend).getdata())
+        return lut
+
+    def stats(self):
+        return {'fonts': len(self._fonts), 'glyphs': self._glyphs, 'hits': self.hits, 'misses': self.misses,
+                'max_glyphs': self.max_glyphs, 'subpixel': self.subpixel}
+
+    def clear(self):
+        with self._lock:
+            self._fonts.clear()
+            self._glyphs = 0
+            self.hits = self.misses = 0
+
+_COVERED_LUT = [0] + [255] * 255
+
+GLYPHS = GlyphAtlas()
+
+# ====== Layout (Zeichenoperationen ohne Pixel) und Paint (Vorlage kopieren, Operationen anwenden) ======
+# Eine Textzeile mit Position, Font, Farbe und Art (kind: 'title', 'body', 'hint', 'footer');
+# FaceLayout ist alles, was für eine Seite gezeichnet wird.
+# Layouts fassen keine Pixel an: wiederverwendbar für Einzelkarten, Bogenzellen (size) und Trockenläufe.
+DrawOp = namedtuple('DrawOp', 'xy text font fill kind')
+FaceLayout = namedtuple('FaceLayout', 'side size header_h ops overflow body_size')
+
+# Vorgerenderte Vorlagen (Hintergrund + Kopfzeile) je Größe und Farben, die pro Seite nur kopiert werden.
+# Beim flachen Standard-Design ist Image.new + Kopfzeile so schnell wie die Kopie (~3 ms bei A4) und
+# spart ~12 MB je Größe -> 0 = aus; lohnt sich bei aufwendigeren Hintergründen.
+TEMPLATE_CACHE_SIZE = 0
+
+_MEASURE = threading.local()
+
+def _measure_draw():
+    # Zeichenfläche nur zum Messen (textbbox hängt nicht von der Bildgröße ab), eine pro Thread
+    draw = getattr(_MEASURE, 'draw', None)
+    if draw is None:
+        draw = _MEASURE.draw = ImageDraw.Draw(Image.new('RGB', (1, 1)))
+    return draw
+
+def _body_fonts(body_size, scale):
+    # (Referenz-Font zum Umbrechen, Font zum Zeichnen) für eine abweichende Fließtext-Größe; None ohne TrueType
+    ref = FONTS.get(body_size)
+    if ref is None or scale == 1:
+        return ref, ref
+    return ref, FONTS.get(max(1, int(round(body_size * scale))))
+
+def _title_ops(title, lp, draw, title_font, ref_title):
+    # Titel zentriert in der Kopfzeile
+    ops = []
+    if not title: return ops
+    W, s = lp.size[0], lp.scale
+    total_h = 0
+    tmp_sizes = []
+    for ln in wrap_by_width(draw, title, ref_title, lp.wrap_w):
+        w, h = measure_text(draw, ln, title_font)
+        if ref_title is not title_font:
+            h = measure_text(draw, ln, ref_title)[1]
+        tmp_sizes.append((ln,w,h))
+        total_h += int(h*1.1)
+    cur_y = int(lp.header_h/2) - int(total_h*s)//2
+    for ln, w, h in tmp_sizes:
+        ops.append(DrawOp(((W-w)//2, cur_y), ln, title_font, TITLE_TEXT_COLOR, 'title'))
+        cur_y += int(int(h*1.1)*s)
+    return ops
+
+def _body_rows(struct, side, wrap, height):
+    # Fließtext einer Seite als Zeilen (Text, Höhe in Referenzpixeln), None = Ende eines Absatzes bzw.
+    # Stichpunkts. wrap(text, numbered) bricht um, height(text) misst. None: kein Fließtext (Hinweis).
+    rows = []
+    def body(texts, numbered, indent=None):
+        # Absätze oder nummerierte Stichpunkte; Folgezeilen eingerückt (indent None = Breite des Präfix)
+        for i, t in enumerate(texts, start=1):
+            prefix = f'{i}. ' if numbered else ''
+            pad = ' ' * (len(prefix) if indent is None else indent)
+            for j, ln in enumerate(wrap(t, numbered)):
+                txt = prefix + ln if j == 0 else pad + ln
+                rows.append((txt, height(txt)))
+            rows.append(None)
+    if side == 'front':
+        # Vorderseite: Stichpunkte (Fragen) vor Absätzen
+        if struct.bullets: body(struct.bullets, True)
+        else: body(struct.paragraphs, False)
     else:
-        for p in struct['paragraphs']:
-            wrapped = wrap_by_width(draw, p, body_font, content_w)
-            for ln in wrapped:
-                draw.text((x,y), ln, font=body_font, fill=BODY_TEXT_COLOR)
-                _, h = measure_text(draw, ln, body_font)
-                y += int(h * 1.2)
-            y += 22
-    footer = f'Karte {idx} - Front'
-    fw, fh = measure_text(draw, footer, small_font)
-    draw.text((IMG_SIZE[0]-MARGIN-fw, IMG_SIZE[1]-MARGIN-fh), footer, font=small_font, fill=MUTED_TEXT_COLOR)
+        # Rückseite: Absätze (Erklärung) vor Stichpunkten, sonst ein Hinweis
+        if struct.paragraphs: body(struct.paragraphs, False)
+        elif struct.bullets: body(struct.bullets, True, indent=4)
+        else: return None
+    return rows
+
+def _place_rows(rows, y0, limit, scale, block_gap, paginate=False):
+    # Zeilen ab y0 auf Seiten verteilen -> ([[(y, text), ...] je Seite], Überlauf der letzten Seite in px).
+    # Ohne paginate bleibt alles auf einer Seite.
+    pages = [[]]
+    y = bottom = y0
+    for row in rows:
+        if row is None:
+            y += block_gap
+            continue
+        txt, h = row
+        step = int(h * 1.2) * scale
+        if paginate and pages[-1] and int(y + step) > limit:
+            pages.append([])
+            y = y0
+        pages[-1].append((int(y), txt))
+        y += step
+        bottom = y
+    return pages, max(0, int(bottom) - limit)
+
+def _layout_pages(struct, idx, side, fonts=None, size=None, body_size=None, paginate=False, min_pages=1):
+    lp = layout_params(size)
+    W, H = lp.size
+    draw = _measure_draw()
+    title_font, body_font, small_font = fonts or FONTS.card_fonts(lp.font_sizes)
+    # Umbrüche und Zeilenhöhen mit den Referenz-Fonts bestimmen, gezeichnet wird mit den skalierten
+    s = lp.scale
+    ref_title, ref_body = (title_font, body_font) if s == 1 else FONTS.card_fonts()[:2]
+    if body_size and body_size != BODY_FONT_SIZE:
+        ref, drawn = _body_fonts(body_size, s)
+        if ref is not None and drawn is not None:
+            ref_body, body_font = ref, drawn
+        else:
+            body_size = None
+    x = lp.margin
+    rows = _body_rows(struct, side,
+                      lambda t, numbered: wrap_by_width(draw, t, ref_body, lp.wrap_w - (80 if numbered else 0)),
+                      lambda txt: line_height(draw, txt, ref_body))
+    label = 'Front' if side == 'front' else 'Back'
+    # Fließtext endet über dem Footer (ohne Folgeseiten ist das auch gleich der Footer selbst)
+    label_size = measure_text(draw, f'Karte {idx} - {label}', small_font)
+    limit = H - lp.margin - label_size[1]
+    y0 = lp.header_h + lp.title_body_gap
+    pages, overflow = _place_rows(rows or [], y0, limit, s, lp.block_gap, paginate)
+    n = max(len(pages), min_pages)
+    layouts = []
+    for p in range(n):
+        if p == 0:
+            ops = _title_ops(struct.title, lp, draw, title_font, ref_title)
+        else:
+            ops = _title_ops(f'{struct.title} (Forts.)'.strip(), lp, draw, title_font, ref_title)
+        if rows is None and p == 0:
+            ops.append(DrawOp((x, int(y0)+lp.hint_offset), "(keine Erklärung gefunden)", body_font,
+                              MUTED_TEXT_COLOR, 'hint'))
+        for y, txt in (pages[p] if p < len(pages) else ()):
+            ops.append(DrawOp((x, y), txt, body_font, BODY_TEXT_COLOR, 'body'))
+        footer = f'Karte {idx} - {label}' + (f' ({p + 1}/{n})' if n > 1 else '')
+        fw, fh = label_size if n == 1 else measure_text(draw, footer, small_font)
+        ops.append(DrawOp((W-lp.margin-fw, H-lp.margin-fh), footer, small_font, MUTED_TEXT_COLOR, 'footer'))
+        layouts.append(FaceLayout(side, lp.size, lp.header_h, ops, overflow if p == len(pages) - 1 else 0,
+                                  body_size or BODY_FONT_SIZE))
+    return layouts
+
+def layout_face(struct, idx, side, fonts=None, size=None, body_size=None):
+    # side: 'front' oder 'back'; size: Zielgröße (Standard IMG_SIZE), Ränder, Abstände und Schriftgrößen
+    # skalieren mit; body_size: Fließtext-Größe (Referenzpixel, Standard BODY_FONT_SIZE).
+    # Eine Seite ohne Anpassung: overflow > 0 = so viele Pixel ragt der Fließtext in den Footer.
+    return _layout_pages(struct, idx, side, fonts, size, body_size)[0]
+
+def layout_pages(struct, idx, side, fonts=None, size=None, min_pages=1):
+    # Seite plus Folgeseiten ("(Forts.)" im Titel, "(2/3)" im Footer); min_pages füllt mit leeren
+    # Folgeseiten auf, damit Vorder- und Rückseite gleich viele Seiten haben (Duplex)
+    return _layout_pages(struct, idx, side, fonts, size, paginate=True, min_pages=min_pages)
+
+def fit_face(struct, idx, side, fonts=None, size=None):
+    # Eine Seite nach AUTO_FIT; Folgekarten ('split') legt render_card mit layout_pages an
+    layout = layout_face(struct, idx, side, fonts, size)
+    if AUTO_FIT == 'shrink' and layout.overflow:
+        layout = _shrink_to_fit(struct, idx, side, fonts, size, layout)
+    return layout
+
+def _shrink_to_fit(struct, idx, side, fonts, size, layout):
+    # Größte Fließtext-Größe zwischen AUTO_FIT_MIN_BODY_SIZE und BODY_FONT_SIZE, bei der der Text passt.
+    # Die binäre Suche setzt die Kandidaten nicht neu: Wortbreiten und Ink-Grenzen stammen einmal aus den
+    # Metriken des Basis-Fonts und skalieren linear mit der Größe, jeder Kandidat ist damit reine
+    # Arithmetik ohne FreeType-Aufruf. Nur das Ergebnis wird exakt gesetzt (und bei Bedarf verkleinert).
+    lo, base = AUTO_FIT_MIN_BODY_SIZE, BODY_FONT_SIZE
+    m = metrics_for(FONTS.card_fonts()[1])
+    if lo >= base or m is None or FONTS.get(lo) is None:
+        return layout
+    with _PROFILER.stage('fit'):
+        lp = layout_params(size)
+        small_font = (fonts or FONTS.card_fonts(lp.font_sizes))[2]
+        label = 'Front' if side == 'front' else 'Back'
+        limit = lp.size[1] - lp.margin - measure_text(_measure_draw(), f'Karte {idx} - {label}', small_font)[1]
+        y0 = lp.header_h + lp.title_body_gap
+        # Je Wort (Breite, oberste, unterste Ink-Kante) beim Basis-Font, über alle Kandidaten geteilt
+        words = {}
+        def word(w):
+            e = words.get(w)
+            if e is None:
+                ext = [m._extent(ch) for ch in set(w)]
+                e = words[w] = (m.advance(w), min(t for t, _ in ext), max(b for _, b in ext))
+            return e
+        space = m._extent(' ')
+
+        def height(txt):
+            # wie m.line_height(txt), aber aus den gecachten Wortgrenzen
+            top, bottom = space if ' ' in txt else (None, None)
+            for w in txt.split():
+                _, t, b = word(w)
+                if top is None or t < top: top = t
+                if bottom is None or b > bottom: bottom = b
+            return bottom - top if top is not None else 0
+
+        def wrap(text, max_w):
+            # gieriger Umbruch wie TextMetrics.wrap, nur mit den Advance-Summen
+            ws = text.split()
+            if not ws: return ['']
+            lines, cur, cur_w = [], [ws[0]], word(ws[0])[0]
+            for w in ws[1:]:
+                adv = word(w)[0]
+                if cur_w + m.space + adv <= max_w:
+                    cur.append(w)
+                    cur_w += m.space + adv
+                else:
+                    lines.append(' '.join(cur))
+                    cur, cur_w = [w], adv
+            lines.append(' '.join(cur))
+            return lines
+
+        def fits(z):
+            r = z / base
+            rows = _body_rows(struct, side, lambda t, numbered: wrap(t, (lp.wrap_w - (80 if numbered else 0)) / r),
+                              lambda txt: height(txt) * r)
+            return _place_rows(rows or [], y0, limit, lp.scale, lp.block_gap)[1] == 0
+
+        best, a, b = lo, lo, base - 1
+        while a <= b:
+            mid = (a + b) // 2
+            if fits(mid):
+                best, a = mid, mid + 1
+            else:
+                b = mid - 1
+        layout = layout_face(struct, idx, side, fonts, size, body_size=best)
+        while layout.overflow and best > lo:
+            best -= 1
+            layout = layout_face(struct, idx, side, fonts, size, body_size=best)
+        return layout
+
+_TEMPLATES = OrderedDict()
+_TEMPLATES_LOCK = threading.Lock()
+
+def _draw_template(size, header_h, mode='RGB'):
+    img = new_image(mode, size, BACKGROUND_COLOR)
+    img.paste(mode_color(ACCENT_COLOR, mode), (0, 0, size[0], header_h + 1))
     return img
 
-def render_back(struct, idx, fonts):
-    img = Image.new('RGB', IMG_SIZE, BACKGROUND_COLOR); draw = ImageDraw.Draw(img)
-    title_font, body_font, small_font = fonts
-    x,y = MARGIN, MARGIN
-    content_w = IMG_SIZE[0] - 2*MARGIN
-    # Kopfzeile
-    header_h = max(120, int(IMG_SIZE[1] * 0.22))
-    draw.rectangle([0,0, IMG_SIZE[0], header_h], fill=ACCENT_COLOR)
-    if struct['title']:
-        lines = wrap_by_width(draw, struct['title'], title_font, content_w)
-        ty = int(header_h/2)
-        total_h = 0
-        tmp_sizes = []
-        for ln in lines:
-            w, h = measure_text(draw, ln, title_font)
-            tmp_sizes.append((ln,w,h))
-            total_h += int(h*1.1)
-        cur_y = ty - total_h//2
-        for ln, w, h in tmp_sizes:
-            draw.text(((IMG_SIZE[0]-w)//2, cur_y), ln, font=title_font, fill=TITLE_TEXT_COLOR)
-            cur_y += int(h*1.1)
-    y = header_h + TITLE_BODY_GAP
-    if struct['paragraphs']:
-        for p in struct['paragraphs']:
-            wrapped = wrap_by_width(draw, p, body_font, content_w)
-            for ln in wrapped:
-                draw.text((x,y), ln, font=body_font, fill=BODY_TEXT_COLOR)
-                _, h = measure_text(draw, ln, body_font)
-                y += int(h * 1.2)
-            y += 22
-    elif struct['bullets']:
-        for i,b in enumerate(struct['bullets'], start=1):
-            wrapped = wrap_by_width(draw, b, body_font, content_w-80)
-            for j, ln in enumerate(wrapped):
-                txt = (f'{i}. ' + ln) if j==0 else (' ' * 4 + ln)
-                draw.text((x,y), txt, font=body_font, fill=BODY_TEXT_COLOR)
-                _, h = measure_text(draw, txt, body_font)
-                y += int(h * 1.2)
-            y += 22
+def face_canvas(size, header_h, mode=None):
+    # Leere Seite zum Bemalen: Kopie der gecachten Vorlage (LRU, TEMPLATE_CACHE_SIZE) oder neu gezeichnet
+    mode = mode or PIXEL_MODE
+    if TEMPLATE_CACHE_SIZE <= 0:
+        return _draw_template(size, header_h, mode)
+    key = (tuple(size), header_h, BACKGROUND_COLOR, ACCENT_COLOR, mode)
+    with _TEMPLATES_LOCK:
+        tpl = _TEMPLATES.get(key)
+        if tpl is not None:
+            _TEMPLATES.move_to_end(key)
+    if tpl is None:
+        tpl = _draw_template(key[0], header_h, mode)
+        with _TEMPLATES_LOCK:
+            _TEMPLATES[key] = tpl
+            while len(_TEMPLATES) > TEMPLATE_CACHE_SIZE:
+                _TEMPLATES.popitem(last=False)
+    return tpl.copy()
+
+def draw_line(img, xy, text, font, fill):
+    # Eine Textzeile nach TEXT_RENDERER; Palettenbilder immer über den Atlas (geglättete Kanten)
+    fill = mode_color(fill, img.mode)
+    if TEXT_RENDERER == 'atlas' or img.mode == 'P':
+        GLYPHS.draw_text(img, xy, text, font, fill)
     else:
-        # Auf der Rückseite immer ein Hinweis anzeigen – hier etwas prominenter
-        draw.text((x, y+40), "(keine Erklärung gefunden)", font=body_font, fill=MUTED_TEXT_COLOR)
-    footer = f'Karte {idx} - Back'
-    fw, fh = measure_text(draw, footer, small_font)
-    draw.text((IMG_SIZE[0]-MARGIN-fw, IMG_SIZE[1]-MARGIN-fh), footer, font=small_font, fill=MUTED_TEXT_COLOR)
+        ImageDraw.Draw(img).text(xy, text, font=font, fill=fill)
+
+def paint_layout(layout, mode=None):
+    # Leere Seite + Textzeilen; kein Messen, kein Umbrechen. mode: Pixelformat (Standard: PIXEL_MODE)
+    with _PROFILER.stage('paint'):
+        img = face_canvas(layout.size, layout.header_h, mode)
+        for op in layout.ops:
+            draw_line(img, op.xy, op.text, op.font, op.fill)
     return img
 
-def compose_sheet(images, page_size, grid_cols, grid_rows, cell_margin, footer_text=None, fonts=None):
+# ====== Renderer (uses truetype if available; if not, prints instructions) ======
+def render_front(struct, idx, fonts=None, size=None):
+    return paint_layout(fit_face(struct, idx, 'front', fonts, size))
+
+def render_back(struct, idx, fonts=None, size=None):
+    return paint_layout(fit_face(struct, idx, 'back', fonts, size))
+
+def sheet_cell_size(page_size=None, grid_cols=None, grid_rows=None, cell_margin=None, bleed=None):
+    # Nutzbare Zellgröße (ohne Innenabstand und Beschnittzugabe) eines Druckbogens
+    page_size = page_size or SHEET_PAGE_SIZE
+    grid_cols = grid_cols or SHEET_GRID_COLS
+    grid_rows = grid_rows or SHEET_GRID_ROWS
+    cell_margin = SHEET_CELL_MARGIN if cell_margin is None else cell_margin
+    bleed = SHEET_BLEED if bleed is None else bleed
+    return (max(1, page_size[0] // grid_cols - 2*cell_margin - 2*bleed),
+            max(1, page_size[1] // grid_rows - 2*cell_margin - 2*bleed))
+
+def sheet_pixel_mode():
+    return SHEET_PIXEL_MODE or PIXEL_MODE
+
+def _reduce_factor(src_size, size):
+    # Ganzzahliger Faktor k, wenn Image.reduce(k) höchstens 2 px größer als size ist (Rundung der
+    # Zellgröße), sonst None. Beim Standardbogen ist das der Normalfall: 2x2 2338x1653 -> 1169x827
+    # für 1168x826, 4x4 -> 585x414 für 584x412
+    k = round(src_size[0] / size[0])
+    if k < 2: return None
+    for src, dst in zip(src_size, size):
+        if not 0 <= -(-src // k) - dst <= 2:
+            return None
+    return k
+
+def fit_to_cell(img, target_w, target_h):
+    # Seitenverhältnis beibehalten; passt das Bild schon, wird es unverändert übernommen.
+    # SHEET_FAST_REDUCE: ganzzahlige Faktoren per Image.reduce (Box-Mittelung) und Beschnitt der
+    # überzähligen Randzeile, sonst erst grob reduzieren und dann LANCZOS (reducing_gap)
+    size = fit_size(img.size, target_w, target_h)
+    if size == img.size: return img
+    with _PROFILER.stage('resize'):
+        if not SHEET_FAST_REDUCE:
+            return img.resize(size, Image.LANCZOS)
+        k = _reduce_factor(img.size, size)
+        if k is None:
+            return img.resize(size, Image.LANCZOS, reducing_gap=2.0)
+        small = img.reduce(k)
+        return small if small.size == size else small.crop((0, 0) + size)
+
+def cell_image(img, target_w, target_h, mode):
+    # Karte für eine Bogenzelle im Pixelformat mode: Paletten werden zum Verkleinern nach RGB gewandelt,
+    # für Graustufen-Bögen wird schon vor dem Verkleinern gewandelt (ein Drittel der Arbeit)
+    if (img.mode == 'P' or mode == 'L' != img.mode) and fit_size(img.size, target_w, target_h) != img.size:
+        img = img.convert('L' if mode == 'L' else 'RGB')
+    return to_pixel_mode(fit_to_cell(img, target_w, target_h), mode)
+
+def _paste_bleed(page, img, x, y, bleed):
+    # Kartenränder um bleed px nach außen verlängern (Randzeilen/-spalten gestreckt, Ecken einfarbig)
+    w, h = img.size
+    N = Image.NEAREST
+    page.paste(img.crop((0, 0, w, 1)).resize((w, bleed), N), (x, y - bleed))
+    page.paste(img.crop((0, h-1, w, h)).resize((w, bleed), N), (x, y + h))
+    page.paste(img.crop((0, 0, 1, h)).resize((bleed, h), N), (x - bleed, y))
+    page.paste(img.crop((w-1, 0, w, h)).resize((bleed, h), N), (x + w, y))
+    for cx, cy, px, py in ((0, 0, x-bleed, y-bleed), (w-1, 0, x+w, y-bleed),
+                           (0, h-1, x-bleed, y+h), (w-1, h-1, x+w, y+h)):
+        page.paste(img.getpixel((cx, cy)), (px, py, px + bleed, py + bleed))
+
+def compose_sheet(images, page_size, grid_cols, grid_rows, cell_margin, footer_text=None, fonts=None,
+                  bleed=0, mirror=None, mode='RGB'):
     # images: list of PIL Images (already rendered single-card images)
-    page = Image.new('RGB', page_size, 'white')
-    draw = ImageDraw.Draw(page)
+    # bleed: Beschnittzugabe in px rund um jede Karte (Randfarben laufen über die Schnittkante hinaus)
+    # mirror: Rückseiten-Bogen spiegeln, damit er beim Duplexdruck hinter den Vorderseiten liegt:
+    #   'columns' (Blatt seitlich wenden wie ein Buch) oder 'rows' (nach oben wenden wie ein Kalender)
+    # mode: Pixelformat des Bogens ('RGB', 'L', 'P'); Karten in anderem Format werden umgewandelt
+    # Die Seite ist ein einziger Puffer; Karten und Linien werden per paste hineinkopiert.
+    page = new_image(mode, page_size, (255, 255, 255))
+    line_color = mode_color((200, 200, 200), mode)
     cell_w = page_size[0] // grid_cols
     cell_h = page_size[1] // grid_rows
+    inset = cell_margin + bleed
     
-    # Zeichne Schnittlinien für einfaches Ausschneiden
-    # Vertikale Linien
-    for i in range(1, grid_cols):
-        x = i * cell_w
-        draw.line([(x, 0), (x, page_size[1])], fill=(200, 200, 200), width=1)
-    
-    # Horizontale Linien
-    for i in range(1, grid_rows):
-        y = i * cell_h
-        draw.line([(0, y), (page_size[0], y)], fill=(200, 200, 200), width=1)
+    # Schnittlinien für einfaches Ausschneiden: ohne Beschnittzugabe an den Zellgrenzen (vor den Karten),
+    # mit Beschnittzugabe an den Kartenkanten (über der Zugabe)
+    lines = []
+    if not bleed:
+        lines += [(i * cell_w, 0, i * cell_w + 1, page_size[1]) for i in range(1, grid_cols)]
+        lines += [(0, i * cell_h, page_size[0], i * cell_h + 1) for i in range(1, grid_rows)]
+        for box in lines:
+            page.paste(line_color, box)
     
     for idx, img in enumerate(images):
         if idx >= grid_cols * grid_rows:
             break
         col = idx % grid_cols
         row = idx // grid_cols
-        x0 = col * cell_w + cell_margin
-        y0 = row * cell_h + cell_margin
-        x1 = (col+1) * cell_w - cell_margin
-        y1 = (row+1) * cell_h - cell_margin
+        if mirror == 'columns': col = grid_cols - 1 - col
+        elif mirror == 'rows': row = grid_rows - 1 - row
+        x0 = col * cell_w + inset
+        y0 = row * cell_h + inset
         # Fit image into cell keeping aspect ratio
-        target_w = max(1, x1 - x0)
-        target_h = max(1, y1 - y0)
-        src_w, src_h = img.size
-        scale = min(target_w / src_w, target_h / src_h)
-        new_w = max(1, int(src_w * scale))
-        new_h = max(1, int(src_h * scale))
-        resized = img.resize((new_w, new_h), Image.LANCZOS)
+        target_w = max(1, cell_w - 2*inset)
+        target_h = max(1, cell_h - 2*inset)
+        resized = cell_image(img, target_w, target_h, mode)
+        new_w, new_h = resized.size
         off_x = x0 + (target_w - new_w)//2
         off_y = y0 + (target_h - new_h)//2
         page.paste(resized, (off_x, off_y))
+        if bleed:
+            _paste_bleed(page, resized, off_x, off_y, bleed)
+    
+    if bleed:
+        for c in range(grid_cols):
+            for x in (c * cell_w + inset, (c+1) * cell_w - inset):
+                page.paste(line_color, (x, 0, x + 1, page_size[1]))
+        for r in range(grid_rows):
+            for y in (r * cell_h + inset, (r+1) * cell_h - inset):
+                page.paste(line_color, (0, y, page_size[0], y + 1))
     
     # Footer ohne margin am unteren Rand platzieren
-    if footer_text and fonts:
-        _, _, small_font = fonts
-        w, h = measure_text(draw, footer_text, small_font)
-        draw.text((page_size[0]-w-10, page_size[1]-h-10), footer_text, font=small_font, fill=(120,120,120))
+    if footer_text:
+        _, _, small_font = fonts or FONTS.card_fonts()
+        w, h = measure_text(_measure_draw(), footer_text, small_font)
+        draw_line(page, (page_size[0]-w-10, page_size[1]-h-10), footer_text, small_font, (120,120,120))
     return page
 
-# ====== UI View (nur wenn UI verfügbar) ======
-class CardGeneratorView(ui.View):
-    def __init__(self):
-        self.name = 'Lernkarten Generator'
-        self.background_color = 'white'
-        
-        # Hauptcontainer
-        self.scroll_view = ui.ScrollView(frame=(0, 0, self.width, self.height))
-        self.scroll_view.flex = 'WH'
-        self.add_subview(self.scroll_view)
-        
-        # Title
-        title_label = ui.Label(frame=(10, 10, self.width-20, 40))
-        title_label.text = 'Lernkarten Generator'
-        title_label.font = ('HelveticaNeue-Medium', 24)
-        title_label.alignment = ui.ALIGN_CENTER
-        self.scroll_view.add_subview(title_label)
-        
-        # Anleitung
-        instruction_label = ui.Label(frame=(10, 60, self.width-20, 260))
-        instruction_label.text = '''📋 FORMATIERUNG FÜR KARTENEINGABE:
+# ====== Pythonista-Oberfläche (UI-View, Share Sheet; nur wenn ui verfügbar) ======
+# Texte der View auf Modulebene: bündig, "Vorderseite:" steht am Zeilenanfang
+INSTRUCTION_TEXT = '''📋 FORMATIERUNG FÜR KARTENEINGABE:
 
 ✅ STRUKTUR:
 • Jede Karte wird durch drei Bindestriche (---) auf einer eigenen Zeile getrennt
@@ -432,24 +1462,9 @@ Rückseite:
 • Keine Leerzeichen vor "Vorderseite:" oder "Rückseite:"
 • HTML-Tags müssen korrekt geschlossen werden
 • Verwenden Sie <b> für Fettschrift, <ol>/<ul> für Listen'''
-        instruction_label.font = ('Menlo', 10)
-        instruction_label.number_of_lines = 0
-        instruction_label.text_color = '#444444'
-        self.scroll_view.add_subview(instruction_label)
-        
-        # Cards Raw Text Input
-        cards_label = ui.Label(frame=(10, 330, self.width-20, 30))
-        cards_label.text = 'Karteneingabe (Text):'
-        cards_label.font = ('HelveticaNeue-Medium', 16)
-        self.scroll_view.add_subview(cards_label)
-        
-        self.cards_text = ui.TextView(frame=(10, 365, self.width-20, 300))
-        self.cards_text.font = ('Menlo', 12)
-        self.cards_text.border_width = 1
-        self.cards_text.border_color = '#CCCCCC'
-        self.cards_text.corner_radius = 5
-        # Beispieltext einfügen
-        self.cards_text.text = '''Vorderseite:
+
+# Beispieltext für die Karteneingabe
+SAMPLE_DECK_TEXT = '''Vorderseite:
 <h4><b>Thema: Beispielthema</b></h4>
 <ol>
 <li>Was ist die erste Frage?</li>
@@ -461,70 +1476,1153 @@ Rückseite:
 <h4><b>Erklärung: Beispielthema</b></h4>
 <p>Hier kommt die Erklärung mit <b>wichtigen Begriffen</b> in Fettschrift.</p>
 ---'''
-        self.scroll_view.add_subview(self.cards_text)
-        
-        # Shortcut Input
-        shortcut_label = ui.Label(frame=(10, 675, self.width-20, 30))
-        shortcut_label.text = 'Shortcuts (optional):'
-        shortcut_label.font = ('HelveticaNeue-Medium', 16)
-        self.scroll_view.add_subview(shortcut_label)
-        
-        self.shortcut_text = ui.TextField(frame=(10, 710, self.width-20, 40))
-        self.shortcut_text.font = ('HelveticaNeue', 14)
-        self.shortcut_text.placeholder = 'z.B. Tastenkombinationen oder Notizen'
-        self.shortcut_text.border_width = 1
-        self.shortcut_text.border_color = '#CCCCCC'
-        self.shortcut_text.corner_radius = 5
-        self.scroll_view.add_subview(self.shortcut_text)
-        
-        # Generate Button
-        self.generate_btn = ui.Button(frame=(10, 760, self.width-20, 50))
-        self.generate_btn.title = 'Karten generieren'
-        self.generate_btn.bg_color = '#007AFF'
-        self.generate_btn.tint_color = 'white'
-        self.generate_btn.font = ('HelveticaNeue-Medium', 18)
-        self.generate_btn.corner_radius = 10
-        self.generate_btn.action = self.generate_cards
-        self.scroll_view.add_subview(self.generate_btn)
-        
-        # Status Label
-        self.status_label = ui.Label(frame=(10, 820, self.width-20, 40))
-        self.status_label.text = ''
-        self.status_label.font = ('HelveticaNeue', 14)
-        self.status_label.text_color = '#666666'
-        self.status_label.alignment = ui.ALIGN_CENTER
-        self.status_label.number_of_lines = 0
-        self.scroll_view.add_subview(self.status_label)
-        
-        # Set content size
-        self.scroll_view.content_size = (self.width, 870)
+
+# Die View-Klasse wird erst beim ersten Zugriff definiert, weil sie von ui.View erbt:
+# so lässt sich das Modul ohne Pythonista importieren (Main.CardGeneratorView bleibt nutzbar).
+_VIEW_CLASS = None
+
+def _card_generator_view_class():
+    global _VIEW_CLASS
+    if _VIEW_CLASS is None:
+        class CardGeneratorView(ui.View):
+            def __init__(self):
+                self.name = 'Lernkarten Generator'
+                self.background_color = 'white'
+                
+                # Hauptcontainer
+                self.scroll_view = ui.ScrollView(frame=(0, 0, self.width, self.height))
+                self.scroll_view.flex = 'WH'
+                self.add_subview(self.scroll_view)
+                
+                # Title
+                title_label = ui.Label(frame=(10, 10, self.width-20, 40))
+                title_label.text = 'Lernkarten Generator'
+                title_label.font = ('HelveticaNeue-Medium', 24)
+                title_label.alignment = ui.ALIGN_CENTER
+                self.scroll_view.add_subview(title_label)
+                
+                # Anleitung
+                instruction_label = ui.Label(frame=(10, 60, self.width-20, 260))
+                instruction_label.text = INSTRUCTION_TEXT
+                instruction_label.font = ('Menlo', 10)
+                instruction_label.number_of_lines = 0
+                instruction_label.text_color = '#444444'
+                self.scroll_view.add_subview(instruction_label)
+                
+                # Cards Raw Text Input
+                cards_label = ui.Label(frame=(10, 330, self.width-20, 30))
+                cards_label.text = 'Karteneingabe (Text):'
+                cards_label.font = ('HelveticaNeue-Medium', 16)
+                self.scroll_view.add_subview(cards_label)
+                
+                self.cards_text = ui.TextView(frame=(10, 365, self.width-20, 300))
+                self.cards_text.font = ('Menlo', 12)
+                self.cards_text.border_width = 1
+                self.cards_text.border_color = '#CCCCCC'
+                self.cards_text.corner_radius = 5
+                # Beispieltext einfügen
+                self.cards_text.text = SAMPLE_DECK_TEXT
+                self.scroll_view.add_subview(self.cards_text)
+                
+                # Shortcut Input
+                shortcut_label = ui.Label(frame=(10, 675, self.width-20, 30))
+                shortcut_label.text = 'Shortcuts (optional):'
+                shortcut_label.font = ('HelveticaNeue-Medium', 16)
+                self.scroll_view.add_subview(shortcut_label)
+                
+                self.shortcut_text = ui.TextField(frame=(10, 710, self.width-20, 40))
+                self.shortcut_text.font = ('HelveticaNeue', 14)
+                self.shortcut_text.placeholder = 'z.B. Tastenkombinationen oder Notizen'
+                self.shortcut_text.border_width = 1
+                self.shortcut_text.border_color = '#CCCCCC'
+                self.shortcut_text.corner_radius = 5
+                self.scroll_view.add_subview(self.shortcut_text)
+                
+                # Generate Button
+                self.generate_btn = ui.Button(frame=(10, 760, self.width-20, 50))
+                self.generate_btn.title = 'Karten generieren'
+                self.generate_btn.bg_color = '#007AFF'
+                self.generate_btn.tint_color = 'white'
+                self.generate_btn.font = ('HelveticaNeue-Medium', 18)
+                self.generate_btn.corner_radius = 10
+                self.generate_btn.action = self.generate_cards
+                self.scroll_view.add_subview(self.generate_btn)
+                
+                # Status Label
+                self.status_label = ui.Label(frame=(10, 820, self.width-20, 40))
+                self.status_label.text = ''
+                self.status_label.font = ('HelveticaNeue', 14)
+                self.status_label.text_color = '#666666'
+                self.status_label.alignment = ui.ALIGN_CENTER
+                self.status_label.number_of_lines = 0
+                self.scroll_view.add_subview(self.status_label)
+                
+                # Set content size
+                self.scroll_view.content_size = (self.width, 870)
+            
+            def generate_cards(self, sender):
+                # Läuft im Hintergrund (GenerationJob); ein zweiter Tipp auf den Button bricht ab
+                job = getattr(self, 'job', None)
+                if job is not None and job.running:
+                    job.cancel()
+                    self.generate_btn.enabled = False
+                    self.status_label.text = 'Breche nach der laufenden Karte ab...'
+                    return
+                self.status_label.text = 'Generiere Karten...'
+                self.generate_btn.title = 'Abbrechen'
+                self.job = GenerationJob(self.cards_text.text, self.shortcut_text.text, on_event=self.on_progress)
+                self.job.start()
+            
+            def on_progress(self, ev):
+                # Ereignisse kommen aus dem Job-Thread; die Anzeige wird im Haupt-Thread gesetzt
+                main_thread = getattr(ui, 'on_main_thread', None)
+                (main_thread(self.show_progress) if main_thread else self.show_progress)(ev)
+            
+            def show_progress(self, ev):
+                kind = ev['event']
+                if kind in ('start', 'card', 'page'):
+                    total = f' von ~{ev["total"]}' if ev['total'] else ''
+                    eta = f', noch ~{ev["eta"]:.0f} s' if ev['eta'] is not None else ''
+                    self.status_label.text = f'Karte {ev["cards"]}{total}, {ev["pages"]} Bögen{eta}'
+                    return
+                if kind == 'done':
+                    self.status_label.text = f'Karten erfolgreich generiert! ({ev["saved"]} Bilder)'
+                elif kind == 'cancelled':
+                    self.status_label.text = f'Abgebrochen nach {ev["cards"]} Karten ({ev["saved"]} Bilder gespeichert)'
+                else:
+                    self.status_label.text = f'Fehler: {ev["error"]}'
+                self.generate_btn.title = 'Karten generieren'
+                self.generate_btn.enabled = True
+        _VIEW_CLASS = CardGeneratorView
+    return _VIEW_CLASS
+
+def __getattr__(name):
+    if name == 'CardGeneratorView':
+        return _card_generator_view_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def run_share_extension():
+    # Pythonista Share Sheet (appex): Text übernehmen und Karten erzeugen; False außerhalb von appex
+    try:
+        import appex
+    except ImportError:
+        return False  # appex nicht verfügbar (nicht in Pythonista)
+    if not appex.is_running_extension():
+        return False
+    # Text aus Share Sheet holen
+    cards_text = appex.get_text()
+    if not cards_text:
+        return False
+    print('Text über Share Sheet empfangen, generiere Karten...')
+    try:
+        generate_from_text(cards_text)
+        print('Karten erfolgreich generiert!')
+    except Exception as e:
+        print(f'Fehler beim Generieren: {str(e)}')
+    return True
+
+# ====== Render-Cache (inhaltsadressiert, auf Platte) ======
+class RenderCache:
+    # PNG-Bytes gerenderter Kartenseiten und Bögen unter dem SHA-256 ihres Inhalts und aller
+    # Render-Einstellungen. Das Manifest (Größe, letzte Nutzung) pflegt nur der Hauptprozess;
+    # Worker melden ihre Zugriffe als Events zurück (track_events=True). Mehrere Läufe auf einem
+    # Cache-Ordner (Daemon, Batch-Prozesse) mischen ihre Einträge unter MANIFEST_LOCK ins Manifest.
+    MANIFEST = 'manifest.json'
+    MANIFEST_LOCK = 'manifest.lock'
+
+    def __init__(self, root, max_bytes=None, fingerprint=None, load_manifest=True, track_events=False):
+        self.root = root
+        self.max_bytes = RENDER_CACHE_MAX_MB * 1024 * 1024 if max_bytes is None else max_bytes
+        self.fingerprint = fingerprint or render_fingerprint()
+        self.entries = {}
+        self.events = [] if track_events else None
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(root, exist_ok=True)
+        if load_manifest:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(os.path.join(self.root, self.MANIFEST), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return
+        if manifest.get('version') == RENDER_CACHE_VERSION:
+            self.entries = manifest.get('entries', {})
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key + '.bin')
+
+    def face_key(self, struct, side, idx, size=None, pages=1):
+        # idx und pages stecken im Footer ("Karte N - Front (1/3)") und gehören deshalb zum Schlüssel;
+        # side enthält die Seitennummer ('front_2'). pages hängt bei 'split' auch von der anderen Seite ab.
+        return _hash_key(self.fingerprint, 'face', side, idx, size, pages, struct.as_dict())
+
+    def sheet_key(self, side, page_idx, face_keys):
+        return _hash_key(self.fingerprint, 'sheet', side, page_idx, face_keys)
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touch(key, len(data))
+        return data
+
+    def put(self, key, data):
+        p = self._path(key)
+        tmp = f'{p}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(p), exist_ok=True)
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, p)
+        except OSError as e:
+            print('Render-Cache: Schreiben fehlgeschlagen:', e)
+            return
+        self._touch(key, len(data))
+
+    def _touch(self, key, size):
+        entry = [size, time.time()]
+        self.entries[key] = entry
+        if self.events is not None:
+            self.events.append((key, entry))
+
+    def drain_events(self):
+        events = {'entries': self.events, 'hits': self.hits, 'misses': self.misses}
+        self.events = []
+        self.hits = self.misses = 0
+        return events
+
+    def merge(self, events):
+        for key, entry in events['entries']:
+            self.entries[key] = entry
+        self.hits += events['hits']
+        self.misses += events['misses']
+
+    def evict(self):
+        # älteste Einträge löschen, bis die Gesamtgröße unter max_bytes liegt
+        total = sum(e[0] for e in self.entries.values())
+        if total <= self.max_bytes: return 0
+        removed = 0
+        for key, (size, _) in sorted(self.entries.items(), key=lambda kv: kv[1][1]):
+            if total <= self.max_bytes: break
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            del self.entries[key]
+            total -= size
+            removed += 1
+        return removed
+
+    def close(self):
+        # Einträge paralleler Läufe (Daemon, Batch) aus dem Manifest auf Platte übernehmen, dann
+        # schreiben; die Dateisperre gilt über Prozesse hinweg, _MANIFEST_LOCK für Threads
+        with _MANIFEST_LOCK, open(os.path.join(self.root, self.MANIFEST_LOCK), 'a') as lock:
+            _lock_file(lock)
+            mine = self.entries
+            self._load()
+            for key, entry in mine.items():
+                old = self.entries.get(key)
+                if old is None or old[1] <= entry[1]:
+                    self.entries[key] = entry
+            self.evict()
+            p = os.path.join(self.root, self.MANIFEST)
+            tmp = f'{p}.{os.getpid()}.{threading.get_ident()}.tmp'
+            try:
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump({'version': RENDER_CACHE_VERSION, 'entries': self.entries}, f)
+                os.replace(tmp, p)
+            except OSError as e:
+                print('Render-Cache: Manifest konnte nicht geschrieben werden:', e)
+
+_MANIFEST_LOCK = threading.Lock()
+
+def _lock_file(f):
+    # Exklusive Sperre auf f bis f.close(); ohne fcntl (Windows) oder wo das Dateisystem keine
+    # Sperren kann, bleibt es bei der Thread-Sperre
+    try:
+        import fcntl
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    except (ImportError, OSError):
+        pass
+
+def _hash_key(*parts):
+    blob = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+def render_fingerprint():
+    # Alles außer dem Karteninhalt, was die Pixel beeinflusst: Einstellungen, Schriftdatei, Pillow-Version
+    font = FONTS.resolve_path()
+    try:
+        st = os.stat(font)
+        font_id = [font, st.st_size, int(st.st_mtime)]
+    except (OSError, TypeError):
+        font_id = font
+    settings = {k: globals().get(k) for k in RENDER_CACHE_SETTINGS}
+    return _hash_key(RENDER_CACHE_VERSION, PIL.__version__ if PIL_AVAILABLE else None, font_id, settings)
+
+# ====== Bild-Encoding ======
+IMAGE_EXTENSIONS = {'png': 'png', 'webp': 'webp', 'jpeg': 'jpg', 'svg': 'svg'}
+
+def image_ext(fmt=None):
+    fmt = (fmt or OUTPUT_FORMAT).lower()
+    if fmt not in IMAGE_EXTENSIONS:
+        raise ValueError(f'Unbekanntes Ausgabeformat: {fmt}')
+    return IMAGE_EXTENSIONS[fmt]
+
+_PALETTE_CACHE = {}
+
+def fixed_palette(steps=None):
+    # Feste Palette: Übergänge zwischen den Designfarben (Schrift auf Hintergrund, Titel auf Kopfzeile,
+    # Bogenlinien/Footer auf Weiß), damit geglättete Kanten und verkleinerte Karten darstellbar bleiben.
+    steps = steps or PALETTE_STEPS
+    white = (255, 255, 255)
+    ramps = ((BACKGROUND_COLOR, BODY_TEXT_COLOR), (BACKGROUND_COLOR, MUTED_TEXT_COLOR),
+             (BACKGROUND_COLOR, ACCENT_COLOR), (ACCENT_COLOR, TITLE_TEXT_COLOR),
+             (BACKGROUND_COLOR, white), (white, (200, 200, 200)), (white, MUTED_TEXT_COLOR))
+    key = (steps, ramps)
+    pal = _PALETTE_CACHE.get(key)
+    if pal is None:
+        colors = []
+        for a, b in ramps:
+            for k in range(steps + 1):
+                c = tuple(round(a[j] + (b[j] - a[j]) * k / steps) for j in range(3))
+                if c not in colors:
+                    colors.append(c)
+        colors = colors[:256]
+        pal = Image.new('P', (1, 1))
+        pal.putpalette([v for c in colors for v in c] + [0, 0, 0] * (256 - len(colors)))
+        _PALETTE_CACHE.clear()
+        _PALETTE_CACHE[key] = pal
+    return pal
+
+def quantize_fixed(img):
+    return img.convert('RGB').quantize(palette=fixed_palette(), dither=0)   # ohne Dithering
+
+def to_pixel_mode(img, mode):
+    if img.mode == mode: return img
+    return quantize_fixed(img) if mode == 'P' else img.convert(mode)
+
+_MODE_COLORS = {}
+
+def mode_color(color, mode):
+    # Designfarbe (RGB-Tupel) als Pixelwert in mode: unverändert, Grauwert oder Paletten-Index
+    if mode == 'RGB': return color
+    key = (color, mode, PALETTE_STEPS)
+    value = _MODE_COLORS.get(key)
+    if value is None:
+        value = _MODE_COLORS[key] = to_pixel_mode(Image.new('RGB', (1, 1), color), mode).getpixel((0, 0))
+    return value
+
+def new_image(mode, size, color):
+    # Einfarbige Fläche in mode; Palettenbilder bekommen die feste Palette
+    img = Image.new(mode, size, mode_color(color, mode))
+    if mode == 'P':
+        img.putpalette(fixed_palette().palette)
+    return img
+
+def encode_image(img, fmt=None):
+    with _PROFILER.stage('encode'):
+        data = _encode_image(img, fmt)
+    _PROFILER.count('images_encoded')
+    return data
+
+def _encode_image(img, fmt=None):
+    fmt = (fmt or OUTPUT_FORMAT).lower()
+    buf = io.BytesIO()
+    if fmt == 'png':
+        if PNG_PALETTE and img.mode == 'RGB':
+            img = quantize_fixed(img)
+        img.save(buf, 'PNG', compress_level=PNG_COMPRESS_LEVEL)
+    elif fmt == 'webp':
+        img = img if img.mode in ('RGB', 'L') else img.convert('RGB')
+        img.save(buf, 'WEBP', lossless=True, method=WEBP_METHOD, quality=WEBP_EFFORT)
+    elif fmt == 'jpeg':
+        img = img if img.mode in ('RGB', 'L') else img.convert('RGB')
+        img.save(buf, 'JPEG', quality=JPEG_QUALITY)
+    else:
+        raise ValueError(f'Unbekanntes Ausgabeformat: {fmt}')
+    return buf.getvalue()
+
+def _write_file(path, data):
+    with _PROFILER.stage('write'):
+        with open(path, 'wb') as f:
+            f.write(data)
+    _PROFILER.count('bytes_written', len(data))
+    _PROGRESS.add_bytes(len(data))
+
+# ====== PDF-Ausgabe (Druckbögen) ======
+_PNG_SIG = b'\x89PNG\r\n\x1a\n'
+
+def _png_xobject(data):
+    # PNG ohne Neukodierung übernehmen: IDAT ist ein zlib-Stream mit PNG-Prädiktoren, den PDF direkt
+    # lesen kann. None bei Varianten, die das nicht erlauben (Alpha, 16 Bit, Interlacing).
+    pos, ihdr, plte, idat = 8, None, None, []
+    while pos + 8 <= len(data):
+        length, ctype = struct.unpack('>I4s', data[pos:pos+8])
+        chunk = data[pos+8:pos+8+length]
+        pos += 12 + length
+        if ctype == b'IHDR': ihdr = struct.unpack('>IIBBBBB', chunk)
+        elif ctype == b'PLTE': plte = chunk
+        elif ctype == b'IDAT': idat.append(chunk)
+        elif ctype == b'IEND': break
+    if ihdr is None: return None
+    w, h, bits, color, _, _, interlace = ihdr
+    if interlace or bits > 8: return None
+    if color == 0: cs, colors = b'/DeviceGray', 1
+    elif color == 2: cs, colors = b'/DeviceRGB', 3
+    elif color == 3 and plte: cs, colors = b'[/Indexed /DeviceRGB %d <%s>]' % (len(plte) // 3 - 1, plte.hex().encode()), 1
+    else: return None
+    parms = b'/DecodeParms << /Predictor 15 /Colors %d /BitsPerComponent %d /Columns %d >>' % (colors, bits, w)
+    return w, h, cs, bits, b'/FlateDecode ' + parms, b''.join(idat)
+
+def _pdf_xobject(data):
+    # -> (Breite, Höhe, Farbraum, Bits, Filter, Stream) für ein kodiertes Bogenbild
+    if data[:8] == _PNG_SIG:
+        xo = _png_xobject(data)
+        if xo: return xo
+    img = Image.open(io.BytesIO(data))
+    if data[:2] == b'\xff\xd8' and img.mode in ('RGB', 'L'):
+        return img.width, img.height, b'/DeviceRGB' if img.mode == 'RGB' else b'/DeviceGray', 8, b'/DCTDecode', data
+    img = img.convert('RGB')
+    return img.width, img.height, b'/DeviceRGB', 8, b'/FlateDecode', zlib.compress(img.tobytes(), PNG_COMPRESS_LEVEL)
+
+class SheetPdf:
+    # Druckbögen als eine mehrseitige PDF in Duplex-Reihenfolge (Front 1, Back 1, Front 2, ...).
+    # Jede Seite wird sofort angehängt; im Speicher bleiben nur die Objekt-Offsets und höchstens
+    # die Bögen, deren Vorgängerseite noch fehlt. Fehlende Seiten werden leer eingefügt.
+    def __init__(self, path, page_size=None, dpi=None):
+        self.path = path
+        w, h = page_size or SHEET_PAGE_SIZE
+        dpi = dpi or DPI
+        self.media = (w * 72 / dpi, h * 72 / dpi)
+        self.f = open(path + '.tmp', 'wb')
+        self.f.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        self.offsets = {}
+        self.next_obj = 3   # 1 = Katalog, 2 = Seitenbaum
+        self.kids = []
+        self.pending = {}
+        self.expect = ('front', 1)
+        self.pages = 0
+
+    def _obj(self, body, stream=None, num=None):
+        if num is None:
+            num = self.next_obj
+            self.next_obj += 1
+        self.offsets[num] = self.f.tell()
+        self.f.write(b'%d 0 obj\n' % num)
+        if stream is None:
+            self.f.write(body + b'\nendobj\n')
+        else:
+            self.f.write(body[:-2] + b' /Length %d >>\nstream\n' % len(stream))
+            self.f.write(stream)
+            self.f.write(b'\nendstream\nendobj\n')
+        return num
+
+    def _page(self, data):
+        pw, ph = self.media
+        resources = b''
+        content = b''
+        if data is not None:
+            w, h, cs, bits, filt, stream = _pdf_xobject(data)
+            img = self._obj(b'<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace %s '
+                            b'/BitsPerComponent %d /Filter %s >>' % (w, h, cs, bits, filt), stream)
+            resources = b'/XObject << /Im0 %d 0 R >>' % img
+            content = b'q %.4f 0 0 %.4f 0 0 cm /Im0 Do Q' % (pw, ph)
+        cont = self._obj(b'<< >>', content)
+        self.kids.append(self._obj(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.4f %.4f] '
+                                   b'/Resources << %s >> /Contents %d 0 R >>' % (pw, ph, resources, cont)))
+        self.pages += 1
+
+    def _advance(self):
+        side, idx = self.expect
+        self.expect = ('back', idx) if side == 'front' else ('front', idx + 1)
+
+    def add(self, side, page_idx, data):
+        # data: kodiertes Bogenbild (PNG/JPEG/...) oder None für eine leere Seite (z.B. nach Fehler)
+        self.pending[(side, page_idx)] = data
+        while self.expect in self.pending:
+            self._page(self.pending.pop(self.expect))
+            self._advance()
+
+    def close(self):
+        # Restliche Seiten in Reihenfolge, Lücken und eine fehlende letzte Rückseite leer auffüllen
+        while self.pending or self.expect[0] == 'back':
+            self._page(self.pending.pop(self.expect, None))
+            self._advance()
+        kids = b' '.join(b'%d 0 R' % k for k in self.kids)
+        self._obj(b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(self.kids)), num=2)
+        self._obj(b'<< /Type /Catalog /Pages 2 0 R >>', num=1)
+        xref = self.f.tell()
+        n = self.next_obj
+        self.f.write(b'xref\n0 %d\n0000000000 65535 f \n' % n)
+        for num in range(1, n):
+            self.f.write(b'%010d 00000 n \n' % self.offsets[num])
+        self.f.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (n, xref))
+        self.f.close()
+        os.replace(self.path + '.tmp', self.path)
+        return self.path
+
+    def abort(self):
+        # Lauf fehlgeschlagen: halbe PDF verwerfen, eine vorhandene ältere bleibt stehen
+        if not self.f.closed:
+            self.f.close()
+        try:
+            os.remove(self.path + '.tmp')
+        except OSError:
+            pass
+
+# ====== SVG-Ausgabe (Vektor: Layout ohne Rastern, Text als <text>) ======
+# OUTPUT_FORMAT = 'svg': dieselben FaceLayouts wie paint_layout, aber statt Pixeln ein SVG-Dokument je
+# Seite; Bögen betten die Karten-SVGs als verschachtelte <svg> ein. Positionen und Umbrüche stammen aus
+# wrap_by_width und den Font-Metriken, der Betrachter zeichnet den Text mit der genannten Schrift.
+VECTOR_FORMATS = ('svg',)
+_SVG_NS = 'http://www.w3.org/2000/svg'
+_SVG_ROOT_RE = re.compile(rb'^<svg xmlns="[^"]*" width="(\d+)" height="(\d+)"')
+_XML_INVALID_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_SVG_FONTS = weakref.WeakKeyDictionary()
+
+def vector_output(fmt=None):
+    return (fmt or OUTPUT_FORMAT).lower() in VECTOR_FORMATS
+
+def _svg_color(color):
+    return '#%02x%02x%02x' % tuple(color[:3])
+
+def _svg_escape(text):
+    return _XML_INVALID_RE.sub('', text).replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+def _svg_font(font):
+    # (Attribute der Textgruppe, Oberlänge): draw.text setzt xy an die Oberlänge, SVG an die Grundlinie
+    entry = _SVG_FONTS.get(font)
+    if entry is None:
+        try:
+            family, style = font.getname()
+        except Exception:
+            family, style = None, ''
+        attrs = f'font-size="{getattr(font, "size", 10)}" font-family="'
+        attrs += (f"'{_svg_escape(family)}', sans-serif" if family else 'sans-serif') + '"'
+        if style and 'bold' in style.lower():
+            attrs += ' font-weight="bold"'
+        try:
+            ascent = font.getmetrics()[0]
+        except Exception:
+            ascent = getattr(font, 'size', 10)
+        entry = _SVG_FONTS[font] = (attrs, ascent)
+    return entry
+
+def svg_face(layout):
+    # Eine Seite als SVG-Dokument (bytes): Hintergrund, Kopfzeile und die Zeilen aus layout.ops,
+    # gruppiert nach Font und Farbe. Führende Leerzeichen (Einzug der Stichpunkte) werden zu x-Versatz.
+    W, H = layout.size
+    parts = [f'<svg xmlns="{_SVG_NS}" width="{W}" height="{H}" viewBox="0 0 {W} {H}">',
+             f'<rect width="{W}" height="{H}" fill="{_svg_color(BACKGROUND_COLOR)}"/>',
+             f'<rect width="{W}" height="{layout.header_h + 1}" fill="{_svg_color(ACCENT_COLOR)}"/>']
+    groups = OrderedDict()
+    for op in layout.ops:
+        groups.setdefault((op.font, op.fill), []).append(op)
+    for (font, fill), ops in groups.items():
+        attrs, ascent = _svg_font(font)
+        parts.append(f'<g {attrs} fill="{_svg_color(fill)}">')
+        for op in ops:
+            text = op.text.lstrip(' ')
+            x = op.xy[0]
+            if len(text) < len(op.text):
+                x += round(font.getlength(op.text[:len(op.text) - len(text)]))
+            parts.append(f'<text x="{x}" y="{op.xy[1] + ascent}">{_svg_escape(text)}</text>')
+        parts.append('</g>')
+    parts.append('</svg>')
+    return ''.join(parts).encode('utf-8')
+
+def compose_sheet_svg(faces, page_size, grid_cols, grid_rows, cell_margin, footer_text=None, fonts=None,
+                      bleed=0, mirror=None):
+    # Wie compose_sheet (Raster, Schnittlinien, Beschnittzugabe, Duplex-Spiegelung, Footer), faces sind
+    # Karten-SVGs aus svg_face; jede wird als verschachteltes <svg> in ihre Zelle skaliert
+    W, H = page_size
+    line = _svg_color((200, 200, 200))
+    cell_w, cell_h = W // grid_cols, H // grid_rows
+    inset = cell_margin + bleed
+    parts = [f'<svg xmlns="{_SVG_NS}" width="{W}" height="{H}" viewBox="0 0 {W} {H}">',
+             f'<rect width="{W}" height="{H}" fill="#ffffff"/>']
+    lines = []
+    if not bleed:
+        lines += [(i * cell_w, 0, 1, H) for i in range(1, grid_cols)]
+        lines += [(0, i * cell_h, W, 1) for i in range(1, grid_rows)]
+    else:
+        lines += [(x, 0, 1, H) for c in range(grid_cols) for x in (c * cell_w + inset, (c+1) * cell_w - inset)]
+        lines += [(0, y, W, 1) for r in range(grid_rows) for y in (r * cell_h + inset, (r+1) * cell_h - inset)]
+    cut = ''.join(f'<rect x="{x}" y="{y}" width="{w}" height="{h}"/>' for x, y, w, h in lines)
+    cut = f'<g fill="{line}">{cut}</g>' if cut else ''
+    if not bleed:
+        parts.append(cut)
+    for idx, data in enumerate(faces[:grid_cols * grid_rows]):
+        col, row = idx % grid_cols, idx // grid_cols
+        if mirror == 'columns': col = grid_cols - 1 - col
+        elif mirror == 'rows': row = grid_rows - 1 - row
+        target_w, target_h = max(1, cell_w - 2*inset), max(1, cell_h - 2*inset)
+        m = _SVG_ROOT_RE.match(data)
+        fw, fh = int(m.group(1)), int(m.group(2))
+        new_w, new_h = fit_size((fw, fh), target_w, target_h)
+        off_x = col * cell_w + inset + (target_w - new_w)//2
+        off_y = row * cell_h + inset + (target_h - new_h)//2
+        if bleed:
+            # Hintergrund und Kopfzeile laufen über die Schnittkante hinaus (wie _paste_bleed)
+            head = round((layout_params((fw, fh)).header_h + 1) * new_h / fh)
+            parts.append(f'<rect x="{off_x - bleed}" y="{off_y - bleed}" width="{new_w + 2*bleed}" '
+                         f'height="{new_h + 2*bleed}" fill="{_svg_color(BACKGROUND_COLOR)}"/>'
+                         f'<rect x="{off_x - bleed}" y="{off_y - bleed}" width="{new_w + 2*bleed}" '
+                         f'height="{head + bleed}" fill="{_svg_color(ACCENT_COLOR)}"/>')
+        parts.append(f'<svg x="{off_x}" y="{off_y}" width="{new_w}" height="{new_h}"'
+                     + data[m.end():].decode('utf-8'))
+    if bleed:
+        parts.append(cut)
+    if footer_text:
+        _, _, small_font = fonts or FONTS.card_fonts()
+        w, h = measure_text(_measure_draw(), footer_text, small_font)
+        attrs, ascent = _svg_font(small_font)
+        parts.append(f'<text x="{W - w - 10}" y="{H - h - 10 + ascent}" {attrs} fill="#787878">'
+                     f'{_svg_escape(footer_text)}</text>')
+    parts.append('</svg>')
+    return ''.join(parts).encode('utf-8')
+
+# ====== Karten-Pipeline (sequenziell oder über einen Prozess-Pool) ======
+class SheetFace:
+    # Eine Kartenseite für den Druckbogen: bereits auf Zellgröße gebracht (img)
+    # oder als kodierte Bytes aus dem Render-Cache (data), die erst bei Bedarf dekodiert werden.
+    __slots__ = ('key', 'img', 'data')
+
+    def __init__(self, key=None, img=None, data=None):
+        self.key = key
+        self.img = img
+        self.data = data
+
+    def image(self):
+        if self.img is None:
+            img = Image.open(io.BytesIO(self.data))
+            img.load()
+            self.img = img if img.mode in ('RGB', 'L', 'P') else img.convert('RGB')
+        return self.img
+
+class SheetStream:
+    # Pipeline-Stufe für Druckbögen einer Seite ('front'/'back'): sammelt Bogenbilder, bis eine
+    # Seite (SHEET_GRID_COLS * SHEET_GRID_ROWS) voll ist, schreibt sie und gibt die Bilder frei.
+    # Mit Render-Cache wird ein Bogen, dessen Karten sich nicht geändert haben, direkt übernommen.
+    # Mit pdf (SheetPdf) wird jeder Bogen zusätzlich bzw. statt als Bilddatei an die PDF angehängt.
+    def __init__(self, side, sheets_dir, fonts=None, cache=None, pdf=None, write_images=True):
+        self.side = side
+        self.sheets_dir = sheets_dir
+        self.fonts = fonts
+        self.cache = cache
+        self.pdf = pdf
+        self.write_images = write_images
+        self.per_sheet = SHEET_GRID_COLS * SHEET_GRID_ROWS
+        self.page_idx = 1
+        self.batch = []
+
+    def add(self, face):
+        if not isinstance(face, SheetFace):
+            face = SheetFace(img=face)
+        self.batch.append(face)
+        if len(self.batch) >= self.per_sheet:
+            self.flush()
+
+    def flush(self):
+        if not self.batch: return None
+        batch, self.batch = self.batch, []
+        out_path = os.path.join(self.sheets_dir, f'sheet_{self.page_idx:02d}_{self.side}.{image_ext()}')
+        key = None
+        if self.cache is not None and all(f.key for f in batch):
+            key = self.cache.sheet_key(self.side, self.page_idx, [f.key for f in batch])
+        try:
+            data = self.cache.get(key) if key else None
+            if data is None:
+                args = (SHEET_PAGE_SIZE, SHEET_GRID_COLS, SHEET_GRID_ROWS, SHEET_CELL_MARGIN)
+                kwargs = dict(footer_text=f'Sheet {self.side.capitalize()} {self.page_idx}', fonts=self.fonts,
+                              bleed=SHEET_BLEED, mirror=SHEET_DUPLEX_MIRROR if self.side == 'back' else None)
+                with _PROFILER.stage('compose'):
+                    if vector_output():
+                        data = compose_sheet_svg([f.data for f in batch], *args, **kwargs)
+                    else:
+                        page = compose_sheet([f.image() for f in batch], *args, mode=sheet_pixel_mode(), **kwargs)
+                if data is None:
+                    data = encode_image(page)
+                if key:
+                    self.cache.put(key, data)
+            if self.write_images:
+                _write_file(out_path, data)
+                log_line('Saved', out_path)
+            else:
+                out_path = None
+        except Exception as e:
+            log_line(f'Fehler speichern sheet {self.side}:', e)
+            data = out_path = None
+        if self.pdf is not None:
+            try:
+                self.pdf.add(self.side, self.page_idx, data)
+            except Exception as e:
+                log_line(f'Fehler PDF sheet {self.side}:', e)
+        self.page_idx += 1
+        if data is not None:
+            _PROGRESS.page()
+        return out_path
+
+# Ziele für fertig kodierte Einzelbilder: write(i, side, data, log) speichert eine Kartenseite.
+# counts: zählt für "Bilder erzeugt/gespeichert"; max_threads: 1 erzwingt die Kartenreihenfolge.
+class FileSink:
+    name = 'Datei'
+    counts = True
+    max_threads = None
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def write(self, i, side, data, log):
+        p_single = os.path.join(self.directory, f'card_{i:02d}_{side}.{image_ext()}')
+        _write_file(p_single, data)
+        log('Saved', p_single)
+
+def _save_to_photos(data):
+    photos.save_image(ui.Image.from_data(data))
+
+class PhotosSink:
+    name = 'Fotos'
+    counts = False
+    max_threads = 1
+
+    def __init__(self, save_image=None):
+        self.save_image = save_image or _save_to_photos
+
+    def write(self, i, side, data, log):
+        with _PROFILER.stage('photos'):
+            self.save_image(data)
+        log(f'Saved to Photos ({side})', i)
+
+class FaceWriter:
+    # Verteilt jede kodierte Kartenseite an alle Ziele (Dateien, Fotos, ...). Mit threads > 0 hat
+    # jedes Ziel eigene Hintergrund-Threads und eine begrenzte Warteschlange: Rendern und Speichern
+    # laufen überlappend, und ist ein Ziel zu langsam, wartet submit() (Backpressure).
+    # Fehler werden pro Karte und Ziel gemeldet, die übrigen Ziele schreiben weiter.
+    def __init__(self, sinks, threads=None, queue_size=None, log=log_line):
+        self.sinks = list(sinks)
+        self.log = log
+        self.saved = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._queues = []
+        self._threads = []
+        threads = WRITER_THREADS if threads is None else threads
+        if threads <= 0: return
+        for sink in self.sinks:
+            n = min(threads, sink.max_threads or threads)
+            q = queue.Queue(queue_size or WRITER_QUEUE_SIZE)
+            self._queues.append((q, n))
+            for _ in range(n):
+                t = threading.Thread(target=self._run, args=(sink, q), daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def _write(self, sink, i, side, data, log):
+        try:
+            with _PROFILER.card(i, timed=False):
+                sink.write(i, side, data, log)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            log(f'Fehler speichern {side} (Karte {i}, {sink.name}):', e)
+            return
+        if sink.counts:
+            with self._lock:
+                self.saved += 1
+
+    def _run(self, sink, q):
+        while True:
+            job = q.get()
+            if job is None: return
+            self._write(sink, *job)
+
+    def submit(self, i, side, data, log=None):
+        log = log or self.log
+        if not self._threads:
+            for sink in self.sinks:
+                self._write(sink, i, side, data, log)
+            return
+        for q, _ in self._queues:
+            q.put((i, side, data, log))
+
+    def close(self):
+        # wartet, bis alles geschrieben ist; Rückgabe: Anzahl gespeicherter Bilder
+        for q, n in self._queues:
+            for _ in range(n):
+                q.put(None)
+        for t in self._threads:
+            t.join()
+        self._queues, self._threads = [], []
+        return self.saved
+
+class _CollectSink:
+    # im Worker-Prozess: Bilder nur einsammeln, geschrieben wird im Hauptprozess
+    name = 'Worker'
+    counts = False
+    max_threads = None
+
+    def __init__(self):
+        self.items = []
+
+    def write(self, i, side, data, log):
+        self.items.append((i, side, data))
+
+def _sheet_face(img, data, key, cell_size):
+    if img is None:
+        return SheetFace(key, data=data)
+    return SheetFace(key, img=cell_image(img, *cell_size, sheet_pixel_mode()) if cell_size else img)
+
+def _render_face(i, label, struct, layout, fonts, face_size, writer, log, cell_size, cache, pages=1):
+    # Eine Seite (label: 'front', 'back', 'front_2', ...) rendern, einmal kodieren und an writer geben.
+    # layout None = fit_face nach AUTO_FIT; pages: Seitenzahl der Karte (Folgekarten, 'split').
+    # Rückgabe: (Bogenbild oder None, False bei Renderfehler)
+    side = label.split('_')[0]
+    key = cache.face_key(struct, label, i, face_size, pages) if cache else None
+    data = cache.get(key) if cache else None
+    img = None
+    if data is None:
+        try:
+            with _PROFILER.stage('render'):
+                if layout is None:
+                    layout = fit_face(struct, i, side, fonts, face_size)
+                if vector_output():
+                    data = svg_face(layout)
+                else:
+                    img = paint_layout(layout, sheet_pixel_mode() if face_size else PIXEL_MODE)
+        except Exception as e:
+            log(f'Fehler {side.capitalize()} render:', e)
+            return None, False
+        if layout.overflow:
+            log(f'Warnung: Karte {i} {label}: Text ragt {layout.overflow} px in den Footer/über den Rand')
     
-    def generate_cards(self, sender):
-        self.status_label.text = 'Generiere Karten...'
-        # Den eingegebenen Text verwenden statt der Datei
-        raw_text = self.cards_text.text
-        shortcut_text = self.shortcut_text.text
+    sheet = None
+    try:
+        if data is None and (GENERATE_SINGLE or cache):
+            data = encode_image(img)
+            if cache: cache.put(key, data)
+        if GENERATE_SINGLE and writer is not None:
+            writer.submit(i, label, data, log)
+        if GENERATE_SHEETS:
+            sheet = _sheet_face(img, data, key, cell_size)
+    except Exception as e:
+        log(f'Fehler speichern {side}:', e)
+    return sheet, True
+
+def render_card(i, front_raw, back_raw, fonts, writer=None, log=log_line, cell_size=None, cache=None):
+    # Parst und rendert eine Karte; jede Seite wird genau einmal kodiert und an writer (FaceWriter)
+    # zum Speichern übergeben. Rückgabe: Liste von (Bogenbild Front, Bogenbild Back), eine je gedruckter
+    # Karte (mehr als eine nur mit Folgekarten, AUTO_FIT = 'split'); ein Bogenbild (SheetFace) ist None,
+    # wenn die Seite nicht auf den Druckbogen soll (Fehler oder keine Bögen). Mit cell_size werden die
+    # Bogenbilder schon auf Zellgröße verkleinert, mit cache werden unveränderte Seiten aus dem
+    # Render-Cache übernommen statt neu gerendert.
+    with _PROFILER.card(i):
+        with _PROFILER.stage('parse'):
+            card = parse_card(i, front_raw, back_raw)
+        front, back = card.front, card.back
+        log(f'Karte {i}: Processing...')
+        # Nur Bögen gewünscht: direkt in Zellgröße rendern statt A4 zu rendern und herunterzurechnen
+        face_size = None
+        if cell_size and not GENERATE_SINGLE and SHEET_DIRECT_RENDER:
+            face_size = fit_size(IMG_SIZE, *cell_size)
+            fonts = FONTS.card_fonts(layout_params(face_size).font_sizes)
         
-        # Temporär den Text in cards_raw speichern (für Kompatibilität)
-        temp_file = os.path.join(BASE_DIR, 'temp_cards_raw.txt')
-        with open(temp_file, 'w', encoding='utf-8') as f:
-            f.write(raw_text)
+        pages = [(None, None)]
+        if AUTO_FIT == 'split':
+            # Die Zahl der Folgekarten steht erst nach dem Layout fest; Vorder- und Rückseite bekommen
+            # gleich viele Seiten, damit die Duplex-Bögen zusammenpassen
+            try:
+                with _PROFILER.stage('render'):
+                    pages_f = layout_pages(front, i, 'front', fonts, face_size)
+                    pages_b = layout_pages(back, i, 'back', fonts, face_size)
+                    n = max(len(pages_f), len(pages_b))
+                    if len(pages_f) < n: pages_f = layout_pages(front, i, 'front', fonts, face_size, n)
+                    if len(pages_b) < n: pages_b = layout_pages(back, i, 'back', fonts, face_size, n)
+            except Exception as e:
+                log('Fehler Layout:', e)
+                return [(None, None)]
+            if n > 1:
+                log(f'Karte {i}: zu lang, {n - 1} Folgekarte(n)')
+            pages = list(zip(pages_f, pages_b))
         
-        # Main generation logic aufrufen
+        results = []
+        for p, (layout_f, layout_b) in enumerate(pages):
+            suffix = f'_{p + 1}' if p else ''
+            sheet_f, ok = _render_face(i, 'front' + suffix, front, layout_f, fonts, face_size, writer, log,
+                                       cell_size, cache, len(pages))
+            if not ok:
+                results.append((None, None))
+                break
+            sheet_b, ok = _render_face(i, 'back' + suffix, back, layout_b, fonts, face_size, writer, log,
+                                       cell_size, cache, len(pages))
+            results.append((sheet_f, sheet_b))
+            if not ok:
+                break
+        return results
+
+def _render_settings():
+    # Momentaufnahme der Einstellungen für Worker-Prozesse (bei "spawn" wird das Modul frisch importiert)
+    return {k: v for k, v in globals().items()
+            if k.isupper() and not k.endswith('_AVAILABLE')
+            and isinstance(v, (bool, int, float, str, tuple, list, type(None)))}
+
+_WORKER_FONTS = None
+_WORKER_CACHE = None
+
+def _init_render_worker(settings, cache_root, fingerprint):
+    # Einmal pro Worker: Einstellungen übernehmen, Fonts laden und den Cache öffnen
+    global _WORKER_FONTS, _WORKER_CACHE
+    globals().update(settings)
+    FONTS.prewarm()
+    _WORKER_FONTS = FONTS.card_fonts()
+    if cache_root:
+        _WORKER_CACHE = RenderCache(cache_root, fingerprint=fingerprint, load_manifest=False, track_events=True)
+
+def _render_card_worker(job):
+    # Rendern und Kodieren im Worker; die kodierten Bilder gehen an den FaceWriter des Hauptprozesses
+    i, front_raw, back_raw, cell_size = job
+    messages = []
+    def log(*args):
+        messages.append(' '.join(str(a) for a in args))
+    collect = _CollectSink()
+    parts = render_card(i, front_raw, back_raw, _WORKER_FONTS, FaceWriter([collect], threads=0),
+                        log=log, cell_size=cell_size, cache=_WORKER_CACHE)
+    events = _WORKER_CACHE.drain_events() if _WORKER_CACHE else None
+    return parts, collect.items, messages, events
+
+def _render_cards_parallel(cards, writer, workers, cache=None):
+    # Liefert die Ergebnisse in Kartenreihenfolge; None, wenn kein Prozess-Pool möglich ist
+    try:
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_render_worker,
+                                       initargs=(_render_settings(), cache.root if cache else None,
+                                                 cache.fingerprint if cache else None))
+    except (ImportError, NotImplementedError, OSError) as e:
+        print('Prozess-Pool nicht verfügbar, rendere sequenziell:', e)
+        return None
+    cell_size = sheet_cell_size() if GENERATE_SHEETS else None
+    jobs = ((i, f, b, cell_size) for i, (f, b) in enumerate(cards, start=1))
+    def _collect(fut):
+        parts, faces, messages, events = fut.result()
+        for m in messages:
+            log_line(m)
+        for face in faces:
+            writer.submit(*face)
+        if cache is not None and events:
+            cache.merge(events)
+        return parts
+    def results():
+        with executor:
+            # begrenztes Fenster offener Jobs, Ausgabe strikt in Kartenreihenfolge
+            pending = deque()
+            for job in jobs:
+                pending.append(executor.submit(_render_card_worker, job))
+                if len(pending) >= workers * 2:
+                    yield _collect(pending.popleft())
+            while pending:
+                yield _collect(pending.popleft())
+    return results()
+
+# ====== Fortschritt und Abbruch (Ereignisse für UI und CLI, Hintergrund-Job) ======
+# Ereignis = dict: event ('start', 'card', 'page', 'done', 'cancelled', 'error'), cards (fertige Karten),
+# total (geschätzte Kartenzahl, None bei gestreamter Eingabe), faces (gerenderte Seiten), pages (Bögen),
+# bytes (geschrieben), elapsed und eta (Sekunden, eta None ohne total), bei 'error' zusätzlich error.
+class GenerationCancelled(Exception):
+    # generate_from_text(cancel=...) wurde zwischen zwei Karten abgebrochen
+    def __init__(self, saved=0, cards=0):
+        super().__init__(f'Abgebrochen nach {cards} Karten ({saved} Bilder gespeichert)')
+        self.saved = saved
+        self.cards = cards
+
+class NullProgress:
+    enabled = False
+    def begin(self, total=None): pass
+    def card(self, faces): pass
+    def page(self): pass
+    def add_bytes(self, n): pass
+    def end(self, event, **extra): pass
+
+class RunProgress:
+    # Hook für generate_from_text(progress=...): zählt mit und ruft callback(ereignis) im
+    # Render-Thread auf. Bytes kommen auch aus den Schreib-Threads und werden nur mitgezählt.
+    enabled = True
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.total = None
+        self.cards = self.faces = self.pages = self.bytes = 0
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def event(self, name, **extra):
+        elapsed = time.perf_counter() - self._t0
+        eta = None
+        if self.total and self.cards:
+            eta = max(0.0, elapsed / self.cards * (self.total - self.cards))
+        with self._lock:
+            n_bytes = self.bytes
+        ev = {'event': name, 'cards': self.cards, 'total': self.total, 'faces': self.faces, 'pages': self.pages,
+              'bytes': n_bytes, 'elapsed': round(elapsed, 3), 'eta': None if eta is None else round(eta, 1)}
+        ev.update(extra)
+        self.callback(ev)
+        return ev
+
+    def begin(self, total=None):
+        self.total = total
+        self._t0 = time.perf_counter()
+        self.event('start')
+
+    def card(self, faces):
+        self.cards += 1
+        self.faces += faces
+        self.event('card')
+
+    def page(self):
+        self.pages += 1
+        self.event('page')
+
+    def add_bytes(self, n):
+        with self._lock:
+            self.bytes += n
+
+    def end(self, event, **extra):
+        self.event(event, **extra)
+
+_PROGRESS = NullProgress()
+
+def estimate_cards(raw_text):
+    # Kartenzahl für die ETA (Blöcke zwischen ---): Text direkt, Dateien nur, wenn sie sich
+    # zurückspulen lassen (nicht stdin/Pipes); sonst None
+    if isinstance(raw_text, str):
+        return len(split_blocks(raw_text))
+    seekable = getattr(raw_text, 'seekable', None)
+    if seekable is None or not seekable():
+        return None
+    pos = raw_text.tell()
+    n, content = 0, False
+    for line in raw_text:
+        if _BLOCK_SEP_RE.match(line):
+            n += content
+            content = False
+        elif line.strip():
+            content = True
+    raw_text.seek(pos)
+    return n + content
+
+def format_progress(ev):
+    # Eine Zeile für die Konsole (CLI: --progress)
+    total = f'/{ev["total"]}' if ev['total'] else ''
+    eta = f', noch ~{ev["eta"]:.0f} s' if ev['eta'] is not None and ev['event'] == 'card' else ''
+    return (f'[{ev["event"]}] {ev["cards"]}{total} Karten, {ev["faces"]} Seiten, {ev["pages"]} Bögen, '
+            f'{ev["bytes"] / 1e6:.1f} MB, {ev["elapsed"]:.1f} s{eta}')
+
+class GenerationJob:
+    # generate_from_text in einem Hintergrund-Thread (UI bleibt bedienbar). Fortschritt kommt als
+    # Ereignis an on_event (im Job-Thread) und/oder über events() (Iterator, endet mit 'done',
+    # 'cancelled' oder 'error'); cancel() bricht nach der laufenden Karte ab. Weitere Argumente
+    # (workers, use_cache, sheet_output, output_dir, ...) gehen an generate_from_text.
+    def __init__(self, raw_text, shortcut_text=None, on_event=None, **kwargs):
+        self.raw_text = raw_text
+        self.shortcut_text = shortcut_text
+        self.on_event = on_event
+        self.kwargs = kwargs
+        self.result = None
+        self.error = None
+        self.cancelled = False
+        self._cancel = threading.Event()
+        self._events = queue.Queue()
+        self._thread = None
+
+    def _emit(self, ev):
+        self._events.put(ev)
+        if self.on_event is not None:
+            self.on_event(ev)
+
+    def run(self):
+        # synchron im aufrufenden Thread; Fehler landen in self.error und als Ereignis 'error'
         try:
-            generate_from_text(raw_text, shortcut_text)
-            self.status_label.text = 'Karten erfolgreich generiert!'
+            self.result = generate_from_text(self.raw_text, self.shortcut_text, progress=self._emit,
+                                             cancel=self._cancel, **self.kwargs)
+        except GenerationCancelled as e:
+            self.cancelled = True
+            self.result = e.saved
         except Exception as e:
-            self.status_label.text = f'Fehler: {str(e)}'
+            self.error = e
+            self._emit({'event': 'error', 'error': f'{type(e).__name__}: {e}'})
         finally:
-            # Temp file aufräumen
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
+            self._events.put(None)
+        return self
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name='GenerationJob', daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def wait(self, timeout=None):
+        # -> Anzahl gespeicherter Bilder; wirft den Fehler des Laufs weiter
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def events(self, timeout=None):
+        while True:
+            ev = self._events.get(timeout=timeout)
+            if ev is None:
+                return
+            yield ev
 
 # ====== Modified Main logic ======
-def generate_from_text(raw_text, shortcut_text=None):
+def output_base_dir():
+    return OUTPUT_FOLDER if os.path.isabs(OUTPUT_FOLDER) else os.path.join(BASE_DIR, OUTPUT_FOLDER)
+
+def generate_from_text(raw_text, shortcut_text=None, workers=None, use_cache=None, sheet_output=None,
+                       profiler=None, output_dir=None, progress=None, cancel=None, stats=None):
+    # raw_text: Kartentext als str oder eine Datei/ein Iterable von Zeilen (wird gestreamt gelesen)
+    # sheet_output: 'images', 'pdf' oder 'both' (Standard: SHEET_OUTPUT)
+    # profiler: z.B. RunProfiler(); misst den Lauf je Stufe und Karte (CLI: --profile)
+    # output_dir: statt OUTPUT_FOLDER (z.B. ein Ordner je Daemon-Auftrag); der Render-Cache bleibt geteilt
+    # progress: callback(ereignis) für Fortschritt (siehe RunProgress; CLI: --progress)
+    # cancel: z.B. threading.Event; gesetzt -> Abbruch nach der laufenden Karte (GenerationCancelled)
+    # stats: dict, wird nach dem Lauf mit 'cards' und 'saved' gefüllt (Rückgabe bleibt die Bildanzahl)
+    args = (raw_text, shortcut_text, workers, use_cache, sheet_output, output_dir, cancel, stats)
+    global _PROFILER, _PROGRESS
+    prev_progress = _PROGRESS
+    if progress is not None:
+        _PROGRESS = RunProgress(progress)
+    try:
+        if profiler is None:
+            return _generate_from_text(*args)
+        prev, _PROFILER = _PROFILER, profiler
+        profiler.start()
+        try:
+            return _generate_from_text(*args)
+        finally:
+            _PROFILER = prev
+            profiler.finish()
+    finally:
+        _PROGRESS = prev_progress
+
+def _generate_from_text(raw_text, shortcut_text, workers, use_cache, sheet_output, output_dir, cancel=None,
+                        stats=None):
     print('Start generation...')
-    output_dir = OUTPUT_FOLDER if os.path.isabs(OUTPUT_FOLDER) else os.path.join(BASE_DIR, OUTPUT_FOLDER)
+    output_dir = output_dir or output_base_dir()
     os.makedirs(output_dir, exist_ok=True)
     
     # Separate Ausgabeverzeichnisse
@@ -535,148 +2633,866 @@ def generate_from_text(raw_text, shortcut_text=None):
     if GENERATE_SHEETS:
         os.makedirs(sheets_dir, exist_ok=True)
     
-    if not PIL_AVAILABLE:
+    if not load_pil():
         print('Pillow (PIL) ist nicht verfügbar. Bitte installiere Pillow, z.B. via apt: sudo apt-get install -y python3-pil')
         raise Exception('PIL nicht verfügbar')
     
-    blocks = split_blocks(raw_text)
-    cards = [extract_front_back(b) for b in blocks]
-    print('Gefundene Karten:', len(cards))
+    # Karten werden gestreamt: Karte 1 wird gerendert, bevor die Eingabe komplett gelesen ist
+    cards = iter_deck(raw_text)
+    _PROGRESS.begin(estimate_cards(raw_text) if _PROGRESS.enabled else None)
     
-    # Load fonts
-    title_size = 128; body_size = 54; small_size = 22
-    tt_title = load_truetype_or_none(title_size)
-    tt_body  = load_truetype_or_none(body_size)
-    tt_small = load_truetype_or_none(small_size)
-    if tt_title is None or tt_body is None:
+    # Fonts aus der prozessweiten Registry (einmal aufgelöst, danach aus dem Cache)
+    if not FONTS.has_truetype():
         print('Warnung: Keine TrueType-Schrift gefunden.')
-        tt_title = ImageFont.load_default()
-        tt_body  = ImageFont.load_default()
-        tt_small = ImageFont.load_default()
-    fonts = (tt_title, tt_body, tt_small)
+    fonts = FONTS.card_fonts()
+    
+    if workers is None: workers = RENDER_WORKERS
+    if workers > 1 and _PROFILER.enabled:
+        print('Hinweis: Profiling misst nur diesen Prozess, rendere ohne Worker.')
+        workers = 1
+    
+    # Bogenausgabe prüfen, bevor Cache, Schreib-Threads oder PDF angelegt werden
+    if sheet_output is None: sheet_output = SHEET_OUTPUT
+    if sheet_output not in ('images', 'pdf', 'both'):
+        raise ValueError(f'Unbekannte Bogenausgabe: {sheet_output}')
+    if GENERATE_SHEETS and sheet_output != 'images' and vector_output():
+        print('Hinweis: keine PDF bei SVG-Ausgabe, Bögen werden als SVG geschrieben')
+        sheet_output = 'images'
     
-    saved = 0
-    sheet_images_front = []
-    sheet_images_back = []
+    # Render-Cache: unveränderte Karten und Bögen werden aus früheren Läufen übernommen
+    if use_cache is None: use_cache = RENDER_CACHE
+    cache = None
+    if use_cache and not vector_output():   # SVG schreiben ist billiger als der Cache
+        cache_root = RENDER_CACHE_DIR if os.path.isabs(RENDER_CACHE_DIR) else os.path.join(output_base_dir(), RENDER_CACHE_DIR)
+        cache = RenderCache(cache_root)
     
-    for i, (front_raw, back_raw) in enumerate(cards, start=1):
-        front = parse_card_html_like(front_raw)
-        back  = parse_card_html_like(back_raw)
-        print(f'Karte {i}: Processing...')
+    # Einzelbilder werden einmal kodiert und im Hintergrund an alle Ziele geschrieben
+    sinks = []
+    if GENERATE_SINGLE:
+        sinks.append(FileSink(single_dir))
+        if UI_AVAILABLE and SAVE_SINGLES_TO_PHOTOS and not vector_output():
+            sinks.append(PhotosSink())
+    writer = FaceWriter(sinks)
+    
+    # Ab hier räumt finally auf, auch bei Fehlern und Strg+C: Pool beenden, Schreib-Threads leeren
+    # (angenommene Bilder werden noch gespeichert), halbe PDF verwerfen, Cache-Manifest schreiben
+    pdf = results = None
+    n_cards = saved = 0
+    finished = False
+    try:
+        # Druckbögen werden gestreamt: jeder volle Bogen wird sofort geschrieben und freigegeben
+        if GENERATE_SHEETS and sheet_output != 'images':
+            pdf = SheetPdf(os.path.join(sheets_dir, SHEET_PDF_NAME), SHEET_PAGE_SIZE, DPI)
+        write_images = sheet_output != 'pdf'
+        sheet_front = SheetStream('front', sheets_dir, fonts, cache, pdf, write_images) if GENERATE_SHEETS else None
+        sheet_back = SheetStream('back', sheets_dir, fonts, cache, pdf, write_images) if GENERATE_SHEETS else None
+        
+        if workers > 1:
+            results = _render_cards_parallel(cards, writer, workers, cache)
+        if results is None:
+            cell_size = sheet_cell_size() if GENERATE_SHEETS else None
+            results = (render_card(i, front_raw, back_raw, fonts, writer, cell_size=cell_size, cache=cache)
+                       for i, (front_raw, back_raw) in enumerate(cards, start=1))
+        cancelled = cancel is not None and cancel.is_set()
+        if not cancelled:
+            for parts in results:
+                n_cards += 1
+                for img_f, img_b in parts:
+                    if img_f is not None:
+                        sheet_front.add(img_f)
+                    if img_b is not None:
+                        sheet_back.add(img_b)
+                _PROGRESS.card(2 * len(parts))
+                if cancel is not None and cancel.is_set():
+                    # fertige Karten werden noch geschrieben (auch ihre angefangenen Bögen)
+                    cancelled = True
+                    print('Abbruch nach Karte', n_cards)
+                    break
+        results.close()   # Prozess-Pool beenden (wartet auf laufende Karten)
         
+        # Angefangene letzte Bögen schreiben
+        if GENERATE_SHEETS:
+            sheet_front.flush()
+            sheet_back.flush()
+        if pdf is not None:
+            pdf_path = pdf.close()
+            _PROGRESS.add_bytes(os.path.getsize(pdf_path))
+            log_line('Saved', pdf_path, f'({pdf.pages} Seiten)')
+        finished = True
+    finally:
+        if results is not None:
+            results.close()
+        if pdf is not None and not finished:
+            pdf.abort()
+        saved = writer.close()
+        if cache is not None:
+            cache.close()
+    
+    print('Gefundene Karten:', n_cards)
+    if cache is not None:
+        print(f'Render-Cache: {cache.hits} Treffer, {cache.misses} neu gerendert')
+    if stats is not None:
+        stats.update(cards=n_cards, saved=saved)
+    if cancelled:
+        _PROGRESS.end('cancelled', saved=saved)
+        raise GenerationCancelled(saved, n_cards)
+    print('Fertig. Bilder erzeugt/gespeichert:', saved)
+    _PROGRESS.end('done', saved=saved)
+    return saved
+
+# ====== Render-Daemon (localhost HTTP) und Client ======
+# POST /render  {"deck": "...", "shortcut_text": ..., "sheet_output": ..., "use_cache": ..., "response": "paths"|"zip"}
+#   -> "paths": JSON {"saved", "output_dir", "files"}; "zip": alle erzeugten Dateien als ZIP (Ordner wird gelöscht)
+# GET /health   -> JSON mit Auslastung
+# Einstellungen wie OUTPUT_FORMAT gelten für den ganzen Daemon, nicht pro Auftrag.
+class RenderDaemon:
+    def __init__(self, host=None, port=None, workers=None, max_pending=None):
+        import http.server
+        self.workers = workers or DAEMON_WORKERS
+        self.max_pending = max_pending or DAEMON_MAX_PENDING
+        self.root = os.path.join(output_base_dir(), DAEMON_SUBDIR)
+        self._slots = threading.BoundedSemaphore(self.workers)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.jobs = 0
+        self.server = http.server.ThreadingHTTPServer((host or DAEMON_HOST, DAEMON_PORT if port is None else port),
+                                                      _daemon_handler(self))
+        self.server.daemon_threads = True
+
+    @property
+    def address(self):
+        return self.server.server_address[:2]
+
+    def warm_up(self):
+        # Pillow laden, Schrift auflösen und die Karten-Fonts (A4 und Zellgröße) anlegen
+        if not load_pil():
+            raise Exception('PIL nicht verfügbar')
+        FONTS.prewarm()
+        FONTS.card_fonts()
+        if GENERATE_SHEETS and not GENERATE_SINGLE and SHEET_DIRECT_RENDER:
+            FONTS.card_fonts(layout_params(fit_size(IMG_SIZE, *sheet_cell_size())).font_sizes)
+
+    def status(self):
+        with self._lock:
+            return {'ok': True, 'workers': self.workers, 'pending': self.pending, 'jobs': self.jobs}
+
+    def serve_forever(self):
+        self.warm_up()
+        host, port = self.address
+        print(f'Render-Daemon läuft auf http://{host}:{port} ({self.workers} Worker)')
         try:
-            img_f = render_front(front, i, fonts)
-        except Exception as e:
-            print('Fehler Front render:', e)
-            continue
-            
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+
+    def shutdown(self):
+        self.server.shutdown()
+
+    def run_job(self, req):
+        # -> (HTTP-Status, Ergebnis-dict); blockiert, bis ein Worker-Platz frei ist
+        with self._lock:
+            if self.pending >= self.max_pending:
+                return 503, {'error': 'Daemon ausgelastet'}
+            self.pending += 1
+            self.jobs += 1
+            job = self.jobs
         try:
-            if GENERATE_SINGLE:
-                if UI_AVAILABLE and SAVE_SINGLES_TO_PHOTOS:
-                    buf = io.BytesIO()
-                    img_f.save(buf,'PNG')
-                    photos.save_image(ui.Image.from_data(buf.getvalue()))
-                    print('Saved to Photos (front)', i)
-                p_single = os.path.join(single_dir, f'card_{i:02d}_front.png')
-                img_f.save(p_single)
-                print('Saved', p_single)
-                saved += 1
-            if GENERATE_SHEETS:
-                sheet_images_front.append(img_f)
+            with self._slots:
+                out_dir = os.path.join(self.root, f'job_{time.strftime("%Y%m%d_%H%M%S")}_{job:04d}')
+                saved = generate_from_text(req['deck'], req.get('shortcut_text'), workers=1,
+                                           use_cache=req.get('use_cache'), sheet_output=req.get('sheet_output'),
+                                           output_dir=out_dir)
         except Exception as e:
-            print('Fehler speichern front:', e)
-        
+            return 500, {'error': f'{type(e).__name__}: {e}'}
+        finally:
+            with self._lock:
+                self.pending -= 1
+        files = sorted(os.path.join(d, f) for d, _, names in os.walk(out_dir) for f in names)
+        return 200, {'saved': saved, 'output_dir': out_dir, 'files': files}
+
+def _daemon_handler(daemon):
+    import http.server
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        server_version = 'LernkartenDaemon/1'
+
+        def log_message(self, fmt, *args):
+            log_line('Daemon:', fmt % args)
+
+        def _send_json(self, code, obj):
+            body = json.dumps(obj, ensure_ascii=False).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/health':
+                self._send_json(200, daemon.status())
+            else:
+                self._send_json(404, {'error': 'unbekannter Pfad'})
+
+        def do_POST(self):
+            if self.path != '/render':
+                return self._send_json(404, {'error': 'unbekannter Pfad'})
+            length = int(self.headers.get('Content-Length') or 0)
+            if length <= 0 or length > DAEMON_MAX_REQUEST_MB * 1024 * 1024:
+                return self._send_json(413, {'error': 'Anfrage leer oder zu groß'})
+            try:
+                req = json.loads(self.rfile.read(length).decode('utf-8'))
+            except ValueError as e:
+                return self._send_json(400, {'error': f'ungültiges JSON: {e}'})
+            if not isinstance(req, dict) or not isinstance(req.get('deck'), str):
+                return self._send_json(400, {'error': '"deck" (Kartentext) fehlt'})
+            if req.get('sheet_output') not in (None, 'images', 'pdf', 'both'):
+                return self._send_json(400, {'error': 'sheet_output: images, pdf oder both'})
+            response = req.get('response', 'paths')
+            if response not in ('paths', 'zip'):
+                return self._send_json(400, {'error': 'response: paths oder zip'})
+            code, result = daemon.run_job(req)
+            if code != 200 or response == 'paths':
+                return self._send_json(code, result)
+            self._send_zip(result)
+
+        def _send_zip(self, result):
+            # ZIP in eine temporäre Datei (ab 32 MB auf Platte) und dann blockweise senden
+            import tempfile, zipfile, shutil
+            out_dir = result['output_dir']
+            with tempfile.SpooledTemporaryFile(max_size=32 * 1024 * 1024) as buf:
+                with zipfile.ZipFile(buf, 'w', zipfile.ZIP_STORED) as zf:   # Bilder sind schon komprimiert
+                    for path in result['files']:
+                        zf.write(path, os.path.relpath(path, out_dir))
+                size = buf.tell()
+                buf.seek(0)
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/zip')
+                self.send_header('Content-Length', str(size))
+                self.send_header('X-Cards-Saved', str(result['saved']))
+                self.end_headers()
+                shutil.copyfileobj(buf, self.wfile, 256 * 1024)
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+    return Handler
+
+def render_via_daemon(raw_text, shortcut_text=None, use_cache=None, sheet_output=None, response='paths',
+                      host=None, port=None, timeout=None):
+    # Auftrag an einen laufenden Daemon. None, wenn keiner erreichbar oder er ausgelastet ist
+    # (der Aufrufer rendert dann selbst); "paths" -> dict, "zip" -> ZIP-Bytes.
+    import urllib.request, urllib.error
+    base = f'http://{host or DAEMON_HOST}:{DAEMON_PORT if port is None else port}'
+    try:
+        with urllib.request.urlopen(base + '/health', timeout=0.5) as r:
+            r.read()
+    except (urllib.error.URLError, OSError):
+        return None
+    body = json.dumps({'deck': raw_text, 'shortcut_text': shortcut_text, 'use_cache': use_cache,
+                       'sheet_output': sheet_output, 'response': response}).encode('utf-8')
+    req = urllib.request.Request(base + '/render', data=body, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout or DAEMON_CLIENT_TIMEOUT) as r:
+            data = r.read()
+    except urllib.error.HTTPError as e:
+        if e.code == 503:
+            return None
         try:
-            img_b = render_back(back, i, fonts)
-        except Exception as e:
-            print('Fehler Back render:', e)
+            msg = json.loads(e.read().decode('utf-8')).get('error')
+        except ValueError:
+            msg = e.reason
+        raise Exception(f'Render-Daemon: {msg}')
+    except urllib.error.URLError:
+        return None
+    return data if response == 'zip' else json.loads(data)
+
+def generate_via_daemon(raw_text, shortcut_text=None, use_cache=None, sheet_output=None):
+    # Über den Daemon rendern, sonst wie bisher im eigenen Prozess; Rückgabe: Anzahl gespeicherter Bilder
+    if not isinstance(raw_text, str):
+        raw_text = ''.join(raw_text)
+    result = render_via_daemon(raw_text, shortcut_text, use_cache, sheet_output)
+    if result is None:
+        print('Kein Render-Daemon erreichbar, rendere im Prozess.')
+        return generate_from_text(raw_text, shortcut_text, use_cache=use_cache, sheet_output=sheet_output)
+    for path in result['files']:
+        print('Saved', path)
+    print('Fertig (Daemon). Bilder erzeugt/gespeichert:', result['saved'])
+    return result['saved']
+
+# ====== Batch-Modus (viele Deck-Dateien, Prozess-Pool, Journal zum Fortsetzen) ======
+def find_decks(source, pattern=None):
+    # Deck-Dateien aus einem Ordner (BATCH_PATTERN, '**/' für Unterordner) oder einem Glob-Muster, sortiert
+    import glob
+    if os.path.isdir(source):
+        paths = glob.glob(os.path.join(source, pattern or BATCH_PATTERN), recursive=True)
+    else:
+        paths = glob.glob(source, recursive=True)
+    return sorted(p for p in paths if os.path.isfile(p))
+
+def _load_journal(path):
+    # Letzter Eintrag je Deck; unvollständige Zeilen (Abbruch beim Schreiben) werden übersprungen
+    entries = {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(entry, dict) and 'deck' in entry:
+                    entries[entry['deck']] = entry
+    except OSError:
+        pass
+    return entries
+
+def _init_batch_worker(settings):
+    globals().update(settings)
+    load_pil()
+    FONTS.prewarm()
+
+def _batch_deck(job):
+    # Ein Deck in seinen eigenen Ordner rendern (Ausgabe nach BATCH_LOG_NAME); Rückgabe: Kennzahlen
+    import contextlib, shutil
+    path, out_dir, use_cache, sheet_output = job
+    shutil.rmtree(out_dir, ignore_errors=True)   # Reste eines abgebrochenen Laufs
+    os.makedirs(out_dir)
+    t0 = time.perf_counter()
+    stats = {}
+    with open(os.path.join(out_dir, BATCH_LOG_NAME), 'w', encoding='utf-8') as log, \
+         contextlib.redirect_stdout(log), open(path, 'r', encoding='utf-8') as deck:
+        saved = generate_from_text(deck, workers=1, use_cache=use_cache, sheet_output=sheet_output,
+                                   output_dir=out_dir, stats=stats)
+    n_bytes = sum(os.path.getsize(os.path.join(d, f)) for d, _, names in os.walk(out_dir)
+                  for f in names if f != BATCH_LOG_NAME)
+    return {'cards': stats['cards'], 'saved': saved, 'bytes': n_bytes,
+            'seconds': round(time.perf_counter() - t0, 3)}
+
+def run_batch(source, jobs=None, use_cache=None, sheet_output=None, resume=True):
+    # Rendert alle Decks aus source (Ordner oder Glob) parallel, jedes in einen eigenen Ordner unter
+    # BATCH_SUBDIR (darin SINGLE_SUBDIR/SHEETS_SUBDIR). Fertige Decks stehen im Journal; ein
+    # abgebrochener Lauf setzt beim nächsten Start dort fort (geänderte Decks/Einstellungen werden
+    # neu gerendert). Rückgabe: Zusammenfassung als dict
+    decks = find_decks(source)
+    if not decks:
+        print('Keine Decks gefunden:', source)
+        return None
+    if not load_pil():
+        raise Exception('PIL nicht verfügbar')
+    base = source if os.path.isdir(source) else os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in decks])
+    out_root = os.path.join(output_base_dir(), BATCH_SUBDIR)
+    os.makedirs(out_root, exist_ok=True)
+    journal_path = os.path.join(out_root, BATCH_JOURNAL)
+    journal = _load_journal(journal_path) if resume else {}
+    fingerprint = _hash_key(render_fingerprint(), sheet_output or SHEET_OUTPUT, GENERATE_SINGLE, GENERATE_SHEETS)
+    todo = []
+    for p in decks:
+        st = os.stat(p)
+        key = _hash_key(fingerprint, st.st_size, st.st_mtime_ns)
+        entry = journal.get(os.path.abspath(p))
+        if entry and entry.get('status') == 'done' and entry.get('key') == key:
             continue
-            
+        # Ordner heißt wie die Datei samt Endung: a.txt und a.md landen nicht im selben Ordner
+        todo.append((p, os.path.join(out_root, os.path.relpath(p, base)), key))
+    jobs = max(1, jobs or BATCH_WORKERS)
+    print(f'Batch: {len(decks)} Decks, {len(decks) - len(todo)} laut Journal fertig, {len(todo)} zu rendern '
+          f'({min(jobs, max(1, len(todo)))} parallel) -> {out_root}')
+    
+    totals = {'decks': len(decks), 'rendered': 0, 'failed': 0, 'skipped': len(decks) - len(todo),
+              'cards': 0, 'bytes': 0, 'interrupted': False}
+    def record(path, out_dir, key, result=None, error=None):
+        entry = {'deck': os.path.abspath(path), 'key': key, 'output_dir': out_dir,
+                 'finished': time.strftime('%Y-%m-%d %H:%M:%S')}
+        if error is None:
+            entry.update(status='done', **result)
+            totals['rendered'] += 1
+            totals['cards'] += result['cards']
+            totals['bytes'] += result['bytes']
+            print(f'  fertig: {os.path.relpath(path, base)} ({result["cards"]} Karten, '
+                  f'{result["bytes"] / 1e6:.1f} MB, {result["seconds"]:.1f} s)')
+        else:
+            entry.update(status='error', error=error)
+            totals['failed'] += 1
+            print(f'  Fehler: {os.path.relpath(path, base)}: {error}')
+        with open(journal_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    
+    executor = None
+    if jobs > 1 and len(todo) > 1:
         try:
-            if GENERATE_SINGLE:
-                if UI_AVAILABLE and SAVE_SINGLES_TO_PHOTOS:
-                    buf = io.BytesIO()
-                    img_b.save(buf,'PNG')
-                    photos.save_image(ui.Image.from_data(buf.getvalue()))
-                    print('Saved to Photos (back)', i)
-                p_single = os.path.join(single_dir, f'card_{i:02d}_back.png')
-                img_b.save(p_single)
-                print('Saved', p_single)
-                saved += 1
-            if GENERATE_SHEETS:
-                sheet_images_back.append(img_b)
-        except Exception as e:
-            print('Fehler speichern back:', e)
+            from concurrent.futures import ProcessPoolExecutor
+            executor = ProcessPoolExecutor(max_workers=jobs, initializer=_init_batch_worker,
+                                           initargs=(_render_settings(),))
+        except (ImportError, NotImplementedError, OSError) as e:
+            print('Prozess-Pool nicht verfügbar, Decks nacheinander:', e)
+    t0 = time.perf_counter()
+    try:
+        if executor is None:
+            for path, out_dir, key in todo:
+                try:
+                    result = _batch_deck((path, out_dir, use_cache, sheet_output))
+                except Exception as e:
+                    record(path, out_dir, key, error=f'{type(e).__name__}: {e}')
+                    continue
+                record(path, out_dir, key, result)
+        else:
+            from concurrent.futures import as_completed
+            with executor:
+                futures = {executor.submit(_batch_deck, (path, out_dir, use_cache, sheet_output)): (path, out_dir, key)
+                           for path, out_dir, key in todo}
+                try:
+                    for fut in as_completed(futures):
+                        try:
+                            result = fut.result()
+                        except Exception as e:
+                            record(*futures[fut], error=f'{type(e).__name__}: {e}')
+                            continue
+                        record(*futures[fut], result)
+                except KeyboardInterrupt:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise
+    except KeyboardInterrupt:
+        totals['interrupted'] = True
+        print('Abgebrochen; fertige Decks stehen im Journal, der nächste Lauf setzt dort fort.')
     
-    # Druckbögen generieren
-    if GENERATE_SHEETS:
-        cards_per_sheet = SHEET_GRID_COLS * SHEET_GRID_ROWS
-        def chunks(lst, n):
-            for k in range(0, len(lst), n):
-                yield lst[k:k+n]
-        
-        page_idx = 1
-        for batch in chunks(sheet_images_front, cards_per_sheet):
-            page = compose_sheet(batch, SHEET_PAGE_SIZE, SHEET_GRID_COLS, SHEET_GRID_ROWS, 
-                               SHEET_CELL_MARGIN, footer_text=f'Sheet Front {page_idx}', fonts=fonts)
-            out_path = os.path.join(sheets_dir, f'sheet_{page_idx:02d}_front.png')
-            try:
-                page.save(out_path)
-                print('Saved', out_path)
-            except Exception as e:
-                print('Fehler speichern sheet front:', e)
-            page_idx += 1
-            
-        page_idx = 1
-        for batch in chunks(sheet_images_back, cards_per_sheet):
-            page = compose_sheet(batch, SHEET_PAGE_SIZE, SHEET_GRID_COLS, SHEET_GRID_ROWS, 
-                               SHEET_CELL_MARGIN, footer_text=f'Sheet Back {page_idx}', fonts=fonts)
-            out_path = os.path.join(sheets_dir, f'sheet_{page_idx:02d}_back.png')
+    wall = time.perf_counter() - t0
+    totals['seconds'] = wall
+    mb = totals['bytes'] / 1e6
+    rate = (lambda n: n / wall) if wall > 0 else (lambda n: 0.0)
+    print(f'Batch: {totals["rendered"]} Decks gerendert, {totals["skipped"]} übersprungen, {totals["failed"]} Fehler; '
+          f'{totals["cards"]} Karten in {wall:.1f} s ({rate(totals["cards"]):.2f} Karten/s), '
+          f'{mb:.1f} MB geschrieben ({rate(mb):.1f} MB/s)')
+    print('Journal:', journal_path)
+    return totals
+
+# ====== Block-Index (Byte-Offsets je Karte, gezieltes Neu-Rendern einzelner Karten) ======
+DECK_INDEX_VERSION = 1
+_LONE_CR_RE = re.compile(rb'\r(?!\n)')
+
+class DeckIndexStale(Exception):
+    pass
+
+def _block_hash(data):
+    return hashlib.blake2b(data, digest_size=12).hexdigest()
+
+class DeckIndex:
+    # Byte-Bereich (start, end) und Inhalts-Hash je Block einer Kartendatei; Block n ist Karte n wie
+    # bei iter_blocks. Die Suche nach Trennzeilen entspricht split_blocks, dekodiert wird nur, was
+    # '---' enthält. Gespeichert unter DECK_INDEX_DIR, gültig solange Größe und mtime der Datei stimmen.
+    def __init__(self, path, size, mtime_ns, blocks):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.blocks = blocks
+
+    def __len__(self):
+        return len(self.blocks)
+
+    @classmethod
+    def scan(cls, path):
+        # Nur Zeilen mit '---' werden angesehen (gemappt, nicht zeilenweise gelesen); einzelne \r
+        # (alte Mac-Zeilenenden) zählen wie im Textmodus als Zeilenende, die Offsets bleiben gleich
+        import mmap
+        blocks = []
+        with open(path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if st.st_size else b''
             try:
-                page.save(out_path)
-                print('Saved', out_path)
-            except Exception as e:
-                print('Fehler speichern sheet back:', e)
-            page_idx += 1
+                lines = _LONE_CR_RE.sub(b'\n', data) if data.find(b'\r') >= 0 else data
+                start = 0
+                pos = lines.find(b'---')
+                while pos >= 0:
+                    line_start = lines.rfind(b'\n', 0, pos) + 1
+                    line_end = lines.find(b'\n', pos) + 1 or len(lines)
+                    if _is_separator(lines[line_start:line_end].decode('utf-8')):
+                        cls._add_block(blocks, data[start:line_start], start)
+                        start = line_end
+                    pos = lines.find(b'---', line_end)
+                cls._add_block(blocks, data[start:], start)
+            finally:
+                if isinstance(data, mmap.mmap): data.close()
+        return cls(os.path.abspath(path), st.st_size, st.st_mtime_ns, blocks)
+
+    @staticmethod
+    def _add_block(blocks, chunk, start):
+        # leere Blöcke (nur Leerraum) überspringt iter_blocks ebenfalls; dekodiert wird nur, wenn der
+        # Block mit Nicht-ASCII beginnt (Leerraum wie NBSP ist für str.strip auch Leerraum)
+        s = chunk.strip()
+        if s and ((s[0] < 0x80 and not chr(s[0]).isspace()) or s.decode('utf-8', 'replace').strip()):
+            blocks.append((start, start + len(chunk), _block_hash(chunk)))
+
+    @staticmethod
+    def index_path(path, index_dir=None):
+        index_dir = index_dir or os.path.join(output_base_dir(), DECK_INDEX_DIR)
+        name = os.path.splitext(os.path.basename(path))[0]
+        return os.path.join(index_dir, f'{name}_{_hash_key(os.path.abspath(path))[:12]}.json')
+
+    @classmethod
+    def load(cls, path, index_dir=None):
+        # Gespeicherten Index verwenden oder (Datei geändert, fehlt, andere Version) neu aufbauen
+        ipath = cls.index_path(path, index_dir)
+        st = os.stat(path)
+        old = None
+        try:
+            with open(ipath, encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == DECK_INDEX_VERSION:
+                old = cls(data['path'], data['size'], data['mtime_ns'], [tuple(b) for b in data['blocks']])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        if old is not None and (old.size, old.mtime_ns) == (st.st_size, st.st_mtime_ns):
+            return old
+        index = cls.scan(path)
+        index.save(ipath)
+        if old is not None:
+            changed = [n for n, b in enumerate(index.blocks, start=1)
+                       if n > len(old.blocks) or old.blocks[n - 1][2] != b[2]]
+            print(f'Block-Index neu aufgebaut ({len(index)} Karten), geändert seit dem letzten Index:',
+                  _format_card_ranges(changed) if changed else 'keine')
+        return index
+
+    def save(self, ipath):
+        os.makedirs(os.path.dirname(ipath), exist_ok=True)
+        tmp = ipath + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': DECK_INDEX_VERSION, 'path': self.path, 'size': self.size,
+                       'mtime_ns': self.mtime_ns, 'blocks': self.blocks}, f, separators=(',', ':'))
+        os.replace(tmp, ipath)
+
+    def read(self, numbers):
+        # (n, block) für die Kartennummern numbers (aufsteigend); DeckIndexStale, wenn ein Block nicht
+        # mehr zum Hash passt (Datei in derselben mtime-Auflösung geändert)
+        with open(self.path, 'rb') as f:
+            for n in numbers:
+                start, end, digest = self.blocks[n - 1]
+                f.seek(start)
+                data = f.read(end - start)
+                if _block_hash(data) != digest:
+                    raise DeckIndexStale(f'Karte {n} passt nicht mehr zum Block-Index')
+                yield n, data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n').strip()
+
+def parse_card_ranges(spec):
+    # '1470-1480', '3,7,12' oder gemischt '1-4,9' -> aufsteigende Kartennummern
+    numbers = set()
+    for part in spec.replace(' ', '').split(','):
+        if not part: continue
+        lo, sep, hi = part.partition('-')
+        lo, hi = int(lo), int(hi) if sep else int(lo)
+        if lo < 1 or hi < lo:
+            raise ValueError(f'Ungültiger Kartenbereich: {part}')
+        numbers.update(range(lo, hi + 1))
+    return sorted(numbers)
+
+def _format_card_ranges(numbers):
+    # [1, 2, 3, 7] -> '1-3, 7'
+    out = []
+    for n in numbers:
+        if out and out[-1][1] == n - 1:
+            out[-1][1] = n
+        else:
+            out.append([n, n])
+    return ', '.join(f'{a}-{b}' if a != b else str(a) for a, b in out)
+
+def _card_slots(index, fonts, face_size):
+    # (Karte, erster Bogenplatz ab 0, Anzahl Plätze) der Reihe nach: eine Zelle je Karte, bei
+    # AUTO_FIT = 'split' so viele, wie die Karte Folgekarten hat (nur Layout, ohne Malen)
+    if AUTO_FIT != 'split':
+        for n in range(1, len(index) + 1):
+            yield n, n - 1, 1
+        return
+    slot = 0
+    for i, block in index.read(range(1, len(index) + 1)):
+        card = parse_card(i, *extract_front_back(block))
+        k = max(len(layout_pages(card.front, i, 'front', fonts, face_size)),
+                len(layout_pages(card.back, i, 'back', fonts, face_size)))
+        yield i, slot, k
+        slot += k
+
+def rerender_cards(path, numbers, use_cache=None, sheet_output=None, output_dir=None):
+    # Nur die Karten numbers (1-basiert wie im vollen Lauf) aus der Datei path neu rendern: Blöcke
+    # werden über den Block-Index direkt angesprungen, Einzelbilder nur für diese Karten geschrieben und
+    # nur die Bögen (sheet_NN_*) neu zusammengesetzt, auf denen sie liegen; deren übrige Karten kommen
+    # meist aus dem Render-Cache. Karten mit Renderfehler im vollen Lauf verschieben die Bögen dort,
+    # das kann der Index nicht wissen. Die Duplex-PDF wird nicht angefasst. Rückgabe: gespeicherte Bilder
+    if not load_pil():
+        raise Exception('PIL nicht verfügbar')
+    try:
+        index = DeckIndex.load(path)
+        return _rerender_cards(index, numbers, use_cache, sheet_output, output_dir)
+    except DeckIndexStale as e:
+        print(f'{e}, baue den Index neu auf')
+        os.remove(DeckIndex.index_path(path))
+        return _rerender_cards(DeckIndex.load(path), numbers, use_cache, sheet_output, output_dir)
+
+def _rerender_cards(index, numbers, use_cache, sheet_output, output_dir):
+    wanted = [n for n in numbers if n <= len(index)]
+    if len(wanted) < len(numbers):
+        print(f'Hinweis: das Deck hat nur {len(index)} Karten')
+    if not wanted:
+        return 0
+    output_dir = output_dir or output_base_dir()
+    single_dir = os.path.join(output_dir, SINGLE_SUBDIR)
+    sheets_dir = os.path.join(output_dir, SHEETS_SUBDIR)
+    if sheet_output is None: sheet_output = SHEET_OUTPUT
+    sheets = GENERATE_SHEETS and (sheet_output != 'pdf' or vector_output())
+    if GENERATE_SHEETS and sheet_output != 'images' and not vector_output():
+        print('Hinweis: die Duplex-PDF wird mit --cards nicht aktualisiert (voller Lauf nötig)')
+    fonts = FONTS.card_fonts()
+    if use_cache is None: use_cache = RENDER_CACHE
+    cache = None
+    if use_cache and not vector_output():   # SVG schreiben ist billiger als der Cache
+        cache_root = RENDER_CACHE_DIR if os.path.isabs(RENDER_CACHE_DIR) else os.path.join(output_base_dir(), RENDER_CACHE_DIR)
+        cache = RenderCache(cache_root)
+    sinks = []
+    if GENERATE_SINGLE:
+        os.makedirs(single_dir, exist_ok=True)
+        sinks.append(FileSink(single_dir))
+        if UI_AVAILABLE and SAVE_SINGLES_TO_PHOTOS and not vector_output():
+            sinks.append(PhotosSink())
+    writer = FaceWriter(sinks)
     
-    print('Fertig. Bilder erzeugt/gespeichert:', saved)
+    # Wie im vollen Lauf: Schreib-Threads leeren und Cache-Manifest schreiben, auch bei Fehlern
+    try:
+        # Bögen der gewählten Karten und alle Karten, die darauf liegen
+        cell_size = sheet_cell_size() if GENERATE_SHEETS else None
+        cards, pages, last, chosen = wanted, [], {}, set(wanted)
+        if sheets:
+            os.makedirs(sheets_dir, exist_ok=True)
+            per = SHEET_GRID_COLS * SHEET_GRID_ROWS
+            face_size = fit_size(IMG_SIZE, *cell_size) if not GENERATE_SINGLE and SHEET_DIRECT_RENDER else None
+            layout_fonts = FONTS.card_fonts(layout_params(face_size).font_sizes) if face_size else fonts
+            first, spans = {}, {}
+            for n, slot, k in _card_slots(index, layout_fonts, face_size):
+                if n > wanted[-1] and slot >= (pages[-1] + 1) * per: break
+                first[n], spans[n] = slot, range(slot // per, (slot + k - 1) // per + 1)
+                if n in chosen:
+                    pages = sorted(set(pages).union(spans[n]))
+            cards = [n for n in sorted(spans) if any(p in spans[n] for p in pages)]
+            last = {p: max(n for n in cards if p in spans[n]) for p in pages}
+        
+        faces = {}   # Bogenplatz -> (Front, Back)
+        stream_f = SheetStream('front', sheets_dir, fonts, cache) if sheets else None
+        stream_b = SheetStream('back', sheets_dir, fonts, cache) if sheets else None
+        for i, block in index.read(cards):
+            parts = render_card(i, *extract_front_back(block), fonts, writer if i in chosen else None,
+                                cell_size=cell_size if sheets else None, cache=cache)
+            if not sheets: continue
+            for k, part in enumerate(parts):
+                faces[first[i] + k] = part
+            for p in [p for p in pages if last[p] == i]:
+                # Bogen p ist vollständig: in Kartenreihenfolge neu zusammensetzen
+                stream_f.page_idx = stream_b.page_idx = p + 1
+                for slot in range(p * per, (p + 1) * per):
+                    img_f, img_b = faces.pop(slot, (None, None))
+                    if img_f is not None: stream_f.add(img_f)
+                    if img_b is not None: stream_b.add(img_b)
+                stream_f.flush()
+                stream_b.flush()
+    finally:
+        saved = writer.close()
+        if cache is not None:
+            cache.close()
+    print(f'Karten {_format_card_ranges(wanted)} neu gerendert, Bilder gespeichert: {saved}')
     return saved
 
+# ====== Deck-Prüfung (--check: Layout nur mit Font-Metriken, keine Leinwand, kein Encoding) ======
+def _long_lines(layout, width):
+    # Titel- und Fließtextzeilen, die breiter als die Inhaltsbreite sind -> [(Text, Breite in px)].
+    # Wie beim Umbruch: Advance-Summe aus den Wort-Metriken, exakt gemessen nur nahe an width.
+    draw = _measure_draw()
+    found = []
+    for op in layout.ops:
+        if op.kind not in ('title', 'body'):
+            continue  # Footer und Hinweis
+        m = metrics_for(op.font)
+        if m is not None:
+            words = op.text.split()
+            if sum(map(m.advance, words)) + m.space * (len(words) - 1) < width - m.slack:
+                continue
+        w = measure_text(draw, op.text, op.font)[0]
+        if w > width:
+            found.append((op.text, w))
+    return found
+
+def check_card(i, block, fonts=None):
+    # Prüft eine Karte (Rohblock) und liefert {'card', 'split', 'faces', 'issues'}; issues: Liste von
+    # Dicts mit 'type' in overflow, pages, empty_back, fallback_split, long_line, error
+    front_raw, back_raw, path = split_front_back(block)
+    card = parse_card(i, front_raw, back_raw, path)
+    fonts = fonts or FONTS.card_fonts()
+    lp = layout_params()
+    width = lp.size[0] - 2*lp.margin
+    issues = []
+    if path != SPLIT_RUECKSEITE:
+        issues.append({'type': 'fallback_split', 'path': path})
+    faces = {}
+    for side, face in (('front', card.front), ('back', card.back)):
+        try:
+            if AUTO_FIT == 'split':
+                pages = layout_pages(face, i, side, fonts)
+                layout = pages[0]
+                if len(pages) > 1:
+                    issues.append({'type': 'pages', 'side': side, 'pages': len(pages)})
+            else:
+                pages = [fit_face(face, i, side, fonts)]
+                layout = pages[0]
+        except Exception as e:
+            issues.append({'type': 'error', 'side': side, 'message': str(e)})
+            continue
+        faces[side] = {'lines': sum(op.kind == 'body' for p in pages for op in p.ops),
+                       'body_size': layout.body_size, 'overflow': pages[-1].overflow}
+        if pages[-1].overflow:
+            issues.append({'type': 'overflow', 'side': side, 'px': pages[-1].overflow,
+                           'body_size': layout.body_size})
+        if side == 'back' and not face.paragraphs and not face.bullets:
+            issues.append({'type': 'empty_back', 'side': side})
+        for p in pages:
+            for text, w in _long_lines(p, width):
+                issues.append({'type': 'long_line', 'side': side, 'text': text, 'width': w, 'max': width})
+    return {'card': i, 'split': path, 'faces': faces, 'issues': issues}
+
+def check_deck(source):
+    # Wie ein Renderlauf über source (str, Pfad, Datei oder Zeilen), aber nur Parser und Layout.
+    # Rückgabe: {'cards', 'issues' (Anzahl je Typ), 'problems' (Karten mit Befund), 'seconds'}
+    if not load_pil():
+        raise Exception('PIL nicht verfügbar')
+    t0 = time.perf_counter()
+    if isinstance(source, os.PathLike):
+        with open(source, 'r', encoding='utf-8') as f:
+            return check_deck(f)
+    lines = _iter_lines(source) if isinstance(source, str) else source
+    fonts = FONTS.card_fonts()
+    counts, problems, n = {}, [], 0
+    for n, block in enumerate(iter_blocks(lines), start=1):
+        result = check_card(n, block, fonts)
+        if result['issues']:
+            problems.append(result)
+            for it in result['issues']:
+                counts[it['type']] = counts.get(it['type'], 0) + 1
+    return {'cards': n, 'truetype': FONTS.has_truetype(), 'auto_fit': AUTO_FIT, 'issues': counts,
+            'problems': problems, 'seconds': round(time.perf_counter() - t0, 4)}
+
+def run_check(args):
+    # --check: Quelle wie beim Rendern (--input, Kartentext, sonst INPUT_FILE), Bericht als JSON
+    if args.input == '-':
+        report = check_deck(io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8'))
+    elif args.input or not args.cards_text:
+        path = args.input or (INPUT_FILE if os.path.isabs(INPUT_FILE) else os.path.join(BASE_DIR, INPUT_FILE))
+        with open(path, 'r', encoding='utf-8') as f:
+            report = check_deck(f)
+    else:
+        report = check_deck(args.cards_text)
+    data = json.dumps(report, ensure_ascii=False, indent=1)
+    if args.check == '-':
+        print(data)
+    else:
+        with open(args.check, 'w', encoding='utf-8') as f:
+            f.write(data)
+        print(f'{report["cards"]} Karten geprüft, {len(report["problems"])} mit Befund -> {args.check}')
+    sys.exit(1 if report['problems'] else 0)
+
 # ====== Main ======
+def parse_cli_args(argv):
+    ap = argparse.ArgumentParser(description='Lernkarten Generator')
+    ap.add_argument('cards_text', nargs='?', help='Kartentext (z.B. über Shortcuts übergeben)')
+    ap.add_argument('shortcut_text', nargs='?', help='optionale Notizen/Shortcuts')
+    ap.add_argument('--workers', type=int, default=None,
+                    help='Anzahl Render-Prozesse (Standard: RENDER_WORKERS)')
+    ap.add_argument('--no-cache', dest='use_cache', action='store_false', default=None,
+                    help='Render-Cache für diesen Lauf nicht verwenden')
+    ap.add_argument('--input', metavar='DATEI',
+                    help="Kartendatei zeilenweise streamen ('-' = stdin)")
+    ap.add_argument('--format', choices=sorted(IMAGE_EXTENSIONS), default=None,
+                    help='Bildformat der Ausgabe (Standard: OUTPUT_FORMAT)')
+    ap.add_argument('--sheet-output', choices=('images', 'pdf', 'both'), default=None,
+                    help='Druckbögen als Bilder, als eine Duplex-PDF oder beides (Standard: SHEET_OUTPUT)')
+    ap.add_argument('--profile', metavar='DATEI', nargs='?', const='profile.json', default=None,
+                    help='Zeiten je Stufe/Karte und Zähler als JSON schreiben (Standard: profile.json)')
+    ap.add_argument('--cprofile', metavar='DATEI', default=None,
+                    help='zusätzlich einen cProfile-Dump schreiben (auswerten mit pstats)')
+    ap.add_argument('--progress', action='store_true',
+                    help='Fortschritt (Karten, Seiten, Bögen, MB, Restzeit) nach jeder Karte ausgeben')
+    ap.add_argument('--serve', action='store_true',
+                    help='Render-Daemon auf DAEMON_HOST:DAEMON_PORT starten (hält Fonts und Caches warm)')
+    ap.add_argument('--via-daemon', action='store_true',
+                    help='über einen laufenden Daemon rendern, sonst im Prozess')
+    ap.add_argument('--port', type=int, default=None, help='Port des Daemons für --serve/--via-daemon (Standard: DAEMON_PORT)')
+    ap.add_argument('--batch', metavar='QUELLE',
+                    help='alle Decks eines Ordners (BATCH_PATTERN) oder eines Glob-Musters rendern')
+    ap.add_argument('--jobs', type=int, default=None, help='parallele Decks für --batch (Standard: BATCH_WORKERS)')
+    ap.add_argument('--no-resume', dest='resume', action='store_false',
+                    help='--batch: Journal ignorieren und alle Decks neu rendern')
+    ap.add_argument('--cards', metavar='NUMMERN', type=parse_card_ranges,
+                    help="nur diese Karten neu rendern, z.B. '1470-1480' oder '3,7,12' (Datei aus --input "
+                         "oder INPUT_FILE, über den Block-Index); nur deren Bögen werden neu zusammengesetzt")
+    ap.add_argument('--check', metavar='DATEI', nargs='?', const='-', default=None,
+                    help="Deck nur prüfen (Überlauf, leere Rückseite, Fallback-Trennung, zu lange Zeilen), "
+                         "Bericht als JSON ('-' = stdout, Standard); Exit-Code 1 bei Befunden")
+    return ap.parse_args(argv)
+
 def main():
+    # Prüfe ob Text über Shortcuts übergeben wurde
+    args = parse_cli_args(sys.argv[1:])
+    if args.check:
+        run_check(args)
+        return
     print('Start...')
     
-    # Prüfe ob Text über Shortcuts übergeben wurde
-    import sys
+    global OUTPUT_FORMAT, DAEMON_PORT
+    if args.format:
+        OUTPUT_FORMAT = args.format
+    if args.port is not None:
+        DAEMON_PORT = args.port
+    profiler = None
+    if args.profile or args.cprofile:
+        profiler = RunProfiler(args.profile, args.cprofile)
+    
+    if args.serve:
+        RenderDaemon().serve_forever()
+        return
+    
+    if args.batch:
+        run_batch(args.batch, args.jobs, use_cache=args.use_cache, sheet_output=args.sheet_output,
+                  resume=args.resume)
+        return
+    
+    if args.cards:
+        # Gezielt einzelne Karten: braucht eine Datei (Offsets), keinen Text oder stdin
+        path = args.input or (INPUT_FILE if os.path.isabs(INPUT_FILE) else os.path.join(BASE_DIR, INPUT_FILE))
+        if path == '-' or not os.path.exists(path):
+            print('--cards braucht eine Kartendatei (--input DATEI oder INPUT_FILE):', path)
+            return
+        rerender_cards(path, args.cards, use_cache=args.use_cache,
+                       sheet_output=args.sheet_output)
+        return
+    
+    def run(text, shortcut_text=None):
+        if args.via_daemon:
+            return generate_via_daemon(text, shortcut_text, use_cache=args.use_cache, sheet_output=args.sheet_output)
+        return generate_from_text(text, shortcut_text, workers=args.workers, use_cache=args.use_cache,
+                                  sheet_output=args.sheet_output, profiler=profiler,
+                                  progress=(lambda ev: log_line(format_progress(ev))) if args.progress else None)
     
     # Pythonista-spezifisch: Prüfe auch auf appex (Share Sheet)
-    try:
-        import appex
-        if appex.is_running_extension():
-            # Text aus Share Sheet holen
-            cards_text = appex.get_text()
-            if cards_text:
-                print('Text über Share Sheet empfangen, generiere Karten...')
-                try:
-                    generate_from_text(cards_text)
-                    print('Karten erfolgreich generiert!')
-                except Exception as e:
-                    print(f'Fehler beim Generieren: {str(e)}')
-                return
-    except ImportError:
-        pass  # appex nicht verfügbar (nicht in Pythonista)
+    if UI_AVAILABLE and run_share_extension():
+        return
+    
+    # Kartendatei oder stdin zeilenweise streamen (z.B. große zusammengeführte Decks, Pipes)
+    if args.input:
+        if args.input == '-':
+            stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+        else:
+            stream = open(args.input, 'r', encoding='utf-8')
+        with stream:
+            run(stream, args.shortcut_text)
+        return
     
     # Wenn Argumente übergeben wurden (z.B. über Shortcuts)
-    if len(sys.argv) > 1:
-        # Der erste Parameter ist der Kartentext
-        cards_text = sys.argv[1]
-        
-        # Optional: zweiter Parameter für Notizen/Shortcuts
-        shortcut_text = sys.argv[2] if len(sys.argv) > 2 else None
+    if args.cards_text:
+        # Der erste Parameter ist der Kartentext, optional zweiter für Notizen/Shortcuts
+        cards_text = args.cards_text
+        shortcut_text = args.shortcut_text
         
         print('Text über Shortcuts empfangen, generiere Karten...')
         try:
-            generate_from_text(cards_text, shortcut_text)
+            run(cards_text, shortcut_text)
             print('Karten erfolgreich generiert!')
         except Exception as e:
             print(f'Fehler beim Generieren: {str(e)}')
@@ -684,7 +3500,7 @@ def main():
     
     # Wenn UI verfügbar ist, GUI zeigen
     if UI_AVAILABLE:
-        v = CardGeneratorView()
+        v = _card_generator_view_class()()
         v.present('sheet')
     else:
         # Fallback auf Datei-basierte Verarbeitung
@@ -693,8 +3509,8 @@ def main():
             print('cards_raw.txt nicht gefunden im Ordner. Bitte anlegen. Pfad versucht:', input_path)
             return
         
-        raw = read_raw(input_path)
-        generate_from_text(raw)
+        with open(input_path, 'r', encoding='utf-8') as f:
+            run(f)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,1636 @@
+# benchmarks.py
+# Mikrobenchmarks für den Lernkarten-Generator (läuft neben Main.py, braucht Pillow).
+#   python3 benchmarks.py stages [--cards 8] [--unicode] [--json out.json] [--compare base.json] [--threshold 0.25]
+#   python3 benchmarks.py wrap [--words 500] [--repeat 20]
+#   python3 benchmarks.py memory [--cards 8 32] [--tolerance 0.15]
+#   python3 benchmarks.py sheets [--cards 16]
+#   python3 benchmarks.py parser [--blocks 100000] [--fuzz 5000]
+#   python3 benchmarks.py encode [--cards 8]
+#   python3 benchmarks.py pdf [--cards 20] [--format png]
+#   python3 benchmarks.py writer [--cards 12] [--photo-ms 40]
+#   python3 benchmarks.py import [--budget-ms 60] [--runs 5]
+#   python3 benchmarks.py daemon [--cards 3] [--runs 3]
+#   python3 benchmarks.py paint [--cards 8] [--repeat 3]
+#   python3 benchmarks.py autofit [--cards 12] [--repeat 3]
+#   python3 benchmarks.py compose [--repeat 3]
+#   python3 benchmarks.py batch [--decks 6] [--cards 4] [--jobs 2]
+#   python3 benchmarks.py atlas [--cards 8] [--repeat 3] [--tolerance 0]
+#   python3 benchmarks.py pixelmode [--cards 8] [--repeat 3]
+#   python3 benchmarks.py progress [--cards 12]
+#   python3 benchmarks.py check [--cards 12] [--min-speedup 50]
+#   python3 benchmarks.py index [--cards 40] [--pick 21-22] [--scan-cards 20000]
+#   python3 benchmarks.py svg [--cards 200]
+
+import os, sys, io, re, gc, time, json, random, argparse, subprocess, tempfile, shutil, unicodedata, struct, zlib, types
+import platform, tracemalloc, threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import Main
+
+WORDS = ('Planwirtschaft Kollektivierung Produktionsmittel Wirtschaft Staat Bürger '
+         'Verteilung Wohlstand Gegensatz Marktwirtschaft Länder Industrie Städte '
+         'Effizienzsteigerung Hungersnöte Widerstand die der und im zu mit von ein '
+         'eine wurde war nicht sondern für über Ziel Praxis Menschenleben').split()
+
+# Typografische Zeichen, NBSP, zerlegte Umlaute (NFD) und Ligaturen: alles, was sanitize_text anfasst
+UNICODE_WORDS = ('\u201eKollektiv\u201c', 'Staat\u2014Markt', 'Plan\u2013Soll', 'usw.\u2026', '\u00abNEP\u00bb',
+                 'O\u0308konomie', 'Bu\u0308rger', '\ufb01nanziell', 'Café', '10\xa0%', '\u2018Kulak\u2019', '€-Preise')
+
+def synthetic_paragraph(n_words, seed=0, words=WORDS):
+    rnd = random.Random(seed)
+    return ' '.join(rnd.choice(words) for _ in range(n_words))
+
+def synthetic_deck(n_cards, n_bullets=3, n_words=60, seed=0, n_paragraphs=1, unicode=False):
+    # Kartentext im Vorderseite:/Rückseite:-Format; unicode mischt UNICODE_WORDS unter die Wörter
+    rnd = random.Random(seed)
+    words = WORDS + list(UNICODE_WORDS) if unicode else WORDS
+    blocks = []
+    for i in range(1, n_cards + 1):
+        topic = f'{rnd.choice(words)} {i}'
+        items = ''.join(f'<li>{synthetic_paragraph(rnd.randint(6, 14), seed=rnd.random(), words=words)}?</li>\n'
+                        for _ in range(n_bullets))
+        paras = ''.join(f'<p>{synthetic_paragraph(n_words, seed=rnd.random(), words=words)}</p>\n'
+                        for _ in range(n_paragraphs))
+        blocks.append(f'Vorderseite:\n<h4><b>Thema: {topic}</b></h4>\n<ol>\n{items}</ol>\n\n'
+                      f'Rückseite:\n<h4><b>Erklärung: {topic}</b></h4>\n'
+                      f'{paras}---\n')
+    return ''.join(blocks)
+
+def legacy_wrap_by_width(draw, text, font, max_w):
+    # Referenz: die ursprüngliche quadratische Variante (textbbox über die ganze Zeile je Wort)
+    words = text.split()
+    if not words: return ['']
+    lines = []
+    cur = words[0]
+    for w in words[1:]:
+        test = cur + ' ' + w
+        w_px, _ = Main.measure_text(draw, test, font)
+        if w_px <= max_w:
+            cur = test
+        else:
+            lines.append(cur)
+            cur = w
+    lines.append(cur)
+    return lines
+
+def _best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        best = dt if best is None or dt < best else best
+    return best
+
+def bench_wrap(n_words=500, repeat=20, paragraphs=10):
+    draw = Main.ImageDraw.Draw(Main.Image.new('RGB', (1, 1)))
+    _, body_font, _ = Main.FONTS.card_fonts()
+    max_w = Main.IMG_SIZE[0] - 2 * Main.MARGIN
+    paras = [synthetic_paragraph(n_words, seed=s) for s in range(paragraphs)]
+    for p in paras:
+        if Main.wrap_by_width(draw, p, body_font, max_w) != legacy_wrap_by_width(draw, p, body_font, max_w):
+            raise SystemExit('wrap_by_width weicht von der Referenz ab')
+    legacy = _best_of(lambda: [legacy_wrap_by_width(draw, p, body_font, max_w) for p in paras], repeat)
+    cached = _best_of(lambda: [Main.wrap_by_width(draw, p, body_font, max_w) for p in paras], repeat)
+    print(f'wrap_by_width, {paragraphs} Absätze à {n_words} Wörter:')
+    print(f'  legacy  {legacy * 1000:8.2f} ms')
+    print(f'  cached  {cached * 1000:8.2f} ms   ({legacy / cached:.1f}x)')
+    return {'legacy_s': legacy, 'cached_s': cached}
+
+# ====== Referenz: der ursprüngliche Regex-Parser (für Gleichheitsprüfung und Vergleich) ======
+def legacy_sanitize_text(s):
+    if not s: return s
+    s = unicodedata.normalize('NFC', s)
+    repl = {'—':' - ', '–':' - ', '‘':"'", '’':"'", '“':'"', '”':'"',
+            '«':'"', '»':'"', '…':'...', '\xa0':' '}
+    for k,v in repl.items(): s = s.replace(k,v)
+    s = ''.join(ch for ch in s if (ch=='\n' or ch=='\t' or ord(ch) >= 32))
+    return s
+
+def legacy_strip_tags(s):
+    return re.sub(r'<[^>]+>','', s).strip()
+
+def legacy_extract_front_back(block):
+    b = unicodedata.normalize('NFC', block)
+    b = b.replace('\r\n', '\n').replace('\r', '\n')
+    m = re.search(r'(?mi)(?:^|\n)\s*(r(?:ü|u|ue)ckseite)\s*:?\s*', b)
+    if m:
+        front = b[:m.start()].strip()
+        back  = b[m.end():].strip()
+        front = re.sub(r'(?is)^\s*vorderseite\s*:\s*','', front).strip()
+        return front, back
+    if '\n===\n' in b:
+        a,c = b.split('\n===\n',1)
+        a = re.sub(r'(?is)^\s*vorderseite\s*:\s*','', a).strip()
+        return a.strip(), c.strip()
+    m2 = re.search(r'(?is)<h4[^>]*>.*?erkl(?:ä|a)rung.*?</h4>', b)
+    if m2:
+        front = b[:m2.start()].strip()
+        back  = b[m2.start():].strip()
+        front = re.sub(r'(?is)^\s*vorderseite\s*:\s*','', front).strip()
+        return front, back
+    h4_iter = list(re.finditer(r'(?is)<h4[^>]*>.*?</h4>', b))
+    if len(h4_iter) >= 2:
+        split_at = h4_iter[1].start()
+        front = b[:split_at].strip()
+        back  = b[split_at:].strip()
+        front = re.sub(r'(?is)^\s*vorderseite\s*:\s*','', front).strip()
+        return front, back
+    front = re.sub(r'(?is)^\s*vorderseite\s*:\s*','', b).strip()
+    return front, ''
+
+def legacy_parse_card_html_like(text):
+    sanitize_text, strip_tags = legacy_sanitize_text, legacy_strip_tags
+    if not text: return {'title':'', 'bullets':[], 'paragraphs':[]}
+    t = text.replace('\r\n','\n').replace('\r','\n')
+    t = re.sub(r'(?is)<br\s*/?>', '\n', t)
+    t = sanitize_text(t)
+    title = ''
+    bullets = []
+    paras = []
+    m = re.search(r'(?is)<h4[^>]*>(.*?)</h4>', t)
+    if m:
+        title = strip_tags(m.group(1))
+    lists_content = re.findall(r'(?is)<ol[^>]*>(.*?)</ol>|<ul[^>]*>(.*?)</ul>', t)
+    for ol_content, ul_content in lists_content:
+        content = ol_content if ol_content is not None and ol_content != '' else ul_content
+        if content:
+            items = re.findall(r'(?is)<li[^>]*>(.*?)</li>', content)
+            for it in items:
+                bullets.append(strip_tags(it))
+    paras_raw = re.findall(r'(?is)<p[^>]*>(.*?)</p>', t)
+    tmp = []
+    for p in paras_raw:
+        stripped = strip_tags(p)
+        tmp.extend([ln.strip() for ln in stripped.split('\n') if ln.strip()])
+    paras = tmp
+    if not title and not bullets and not paras:
+        plain = strip_tags(t)
+        parts = [p.strip() for p in re.split(r'\n\s*\n', plain) if p.strip()]
+        if parts:
+            first = parts[0]
+            if len(first) < 140 and '\n' not in first and len(parts) > 1:
+                title = first; paras = parts[1:]
+            else:
+                paras = parts
+        else:
+            paras = [plain]
+    if not bullets:
+        lines = [ln for para in paras for ln in para.split('\n') if ln.strip()]
+        md_bullets = []
+        for ln in lines:
+            mdb = re.match(r'^\s*([-*•]|\d+[\.)])\s+(.*)$', ln)
+            if mdb:
+                md_bullets.append(mdb.group(2).strip())
+        if len(md_bullets) >= 2:
+            bullets = md_bullets
+            paras = []
+    title = sanitize_text(strip_tags(title))
+    bullets = [sanitize_text(b) for b in bullets]
+    paras = [sanitize_text(p) for p in paras]
+    if title and not bullets and not paras:
+        body_only = re.sub(r'(?is)<h4[^>]*>.*?</h4>', '', t).strip()
+        paras_raw = re.findall(r'(?is)<p[^>]*>(.*?)</p>', body_only)
+        tmp = []
+        for p in paras_raw:
+            stripped = strip_tags(p)
+            parts = [ln.strip() for ln in stripped.split('\n') if ln.strip()]
+            tmp.extend(parts)
+        if tmp:
+            paras = [sanitize_text(p) for p in tmp]
+        else:
+            plain = strip_tags(body_only).strip()
+            if plain:
+                paras = [sanitize_text(p) for p in re.split(r'\n\s*\n', plain) if p.strip()] or [sanitize_text(plain)]
+    return {'title':title, 'bullets':bullets, 'paragraphs':paras}
+
+# Bausteine für den Fuzz-Korpus: gültiges Markup, kaputtes Markup, Sonderzeichen, Umbrüche
+_FUZZ_PIECES = [
+    'Vorderseite:', 'vorderseite :', 'Rückseite:', 'Ruckseite', 'RUECKSEITE:', '\n===\n', '\n', '\r\n', '\r',
+    '<h4>', '</h4>', '<H4 class="x">', '<h4><b>Thema: ', '</b></h4>', 'Erklärung: ', 'Erklarung',
+    '<ol>', '</ol>', '<ul>', '</UL>', '<li>', '</li>', '<LI x>', '<p>', '</p>', '<P>', '<pre>', '<br>', '<BR />',
+    '<b>', '</b>', '<', '>', 'a < b', '<<b>x>', '- ', '* ', '• ', '1. ', '2) ', '\n\n', '  ', '\t',
+    '—', '–', '‘’', '“”', '«»', '…', '\xa0', '\x07', 'ä', 'Å', 'ß', 'Wort', 'Frage?', 'Antwort.',
+]
+
+def fuzz_block(rnd, n=40):
+    return ''.join(rnd.choice(_FUZZ_PIECES) if rnd.random() < 0.6 else rnd.choice(WORDS) + ' '
+                   for _ in range(rnd.randint(1, n)))
+
+def check_parser(fuzz=5000, seed=0):
+    # Neuer Parser (und der Streaming-Reader) muss auf cards_raw.txt, synthetischen Decks
+    # und dem Fuzz-Korpus identisch sein
+    rnd = random.Random(seed)
+    raw_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cards_raw.txt')
+    blocks = Main.split_blocks(Main.read_raw(raw_path)) if os.path.exists(raw_path) else []
+    blocks += Main.split_blocks(synthetic_deck(50))
+    blocks += [fuzz_block(rnd) for _ in range(fuzz)]
+    for b in blocks:
+        if list(Main.iter_blocks(Main._iter_lines(b))) != Main.split_blocks(b):
+            raise SystemExit(f'iter_blocks weicht von split_blocks ab für {b!r}')
+        fb_new, fb_old = Main.extract_front_back(b), legacy_extract_front_back(b)
+        if fb_new != fb_old:
+            raise SystemExit(f'extract_front_back weicht ab für {b!r}')
+        for part in (b,) + fb_old:
+            if Main.parse_card_html_like(part).as_dict() != legacy_parse_card_html_like(part):
+                raise SystemExit(f'parse_card_html_like weicht ab für {part!r}')
+        if Main.sanitize_text(b) != legacy_sanitize_text(b):
+            raise SystemExit(f'sanitize_text weicht ab für {b!r}')
+    print(f'Parser identisch auf {len(blocks)} Blöcken')
+    return len(blocks)
+
+def bench_parser(n_blocks=100000, fuzz=5000):
+    check_parser(fuzz)
+    deck = synthetic_deck(200)
+    blocks = Main.split_blocks(deck)
+    blocks = (blocks * (n_blocks // len(blocks) + 1))[:n_blocks]
+    def run(extract, parse):
+        for b in blocks:
+            f, r = extract(b)
+            parse(f); parse(r)
+    t0 = time.perf_counter(); run(legacy_extract_front_back, legacy_parse_card_html_like)
+    legacy = time.perf_counter() - t0
+    t0 = time.perf_counter(); run(Main.extract_front_back, Main.parse_card_html_like)
+    new = time.perf_counter() - t0
+    print(f'Parser, {n_blocks} Blöcke:')
+    print(f'  legacy  {legacy:8.2f} s')
+    print(f'  neu     {new:8.2f} s   ({legacy / new:.1f}x)')
+    return {'legacy_s': legacy, 'new_s': new}
+
+def _max_rss_mb():
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+def _memory_child(n_cards, sheet_output=None):
+    # läuft in einem frischen Prozess, damit ru_maxrss nur diesen Lauf misst
+    out = tempfile.mkdtemp(prefix='cards_mem_')
+    try:
+        Main.OUTPUT_FOLDER = out
+        Main.SAVE_SINGLES_TO_PHOTOS = False
+        Main.generate_from_text(synthetic_deck(n_cards), sheet_output=sheet_output)
+    finally:
+        shutil.rmtree(out, ignore_errors=True)
+    print(f'MAXRSS {_max_rss_mb():.1f}')
+
+def bench_memory(deck_sizes=(8, 32), tolerance=0.15, sheet_output=None):
+    # Spitzen-RSS muss bei wachsendem Deck flach bleiben (Bögen werden gestreamt)
+    peaks = {}
+    extra = ['--sheet-output', sheet_output] if sheet_output else []
+    for n in deck_sizes:
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), 'memory', '--child', str(n)] + extra,
+                             capture_output=True, text=True, check=True).stdout
+        peaks[n] = float(out.rsplit('MAXRSS', 1)[1])
+        print(f'  {n:5d} Karten: Spitzen-RSS {peaks[n]:8.1f} MB')
+    base = peaks[deck_sizes[0]]
+    worst = max(peaks.values())
+    if worst > base * (1 + tolerance):
+        raise SystemExit(f'Speicher wächst mit der Deckgröße: {base:.1f} MB -> {worst:.1f} MB')
+    print(f'  flach innerhalb {tolerance:.0%}')
+    return peaks
+
+def _timed_run(deck, **settings):
+    out = tempfile.mkdtemp(prefix='cards_bench_')
+    saved = {k: getattr(Main, k) for k in settings}
+    try:
+        Main.OUTPUT_FOLDER = out
+        Main.SAVE_SINGLES_TO_PHOTOS = False
+        for k, v in settings.items():
+            setattr(Main, k, v)
+        t0 = time.perf_counter()
+        Main.generate_from_text(deck)
+        return time.perf_counter() - t0
+    finally:
+        for k, v in saved.items():
+            setattr(Main, k, v)
+        shutil.rmtree(out, ignore_errors=True)
+
+def bench_sheets(n_cards=16):
+    # Nur Bögen: A4 rendern + verkleinern gegen direktes Rendern in Zellgröße
+    deck = synthetic_deck(n_cards)
+    downscale = _timed_run(deck, GENERATE_SINGLE=False, SHEET_DIRECT_RENDER=False)
+    direct = _timed_run(deck, GENERATE_SINGLE=False, SHEET_DIRECT_RENDER=True)
+    print(f'Nur Bögen, {n_cards} Karten:')
+    print(f'  A4 + verkl.    {downscale:8.2f} s')
+    print(f'  Zellgröße      {direct:8.2f} s   ({downscale / direct:.1f}x)')
+    return {'downscale_s': downscale, 'direct_s': direct}
+
+# Kandidaten für encode: (Name, Einstellungen)
+ENCODERS = (
+    ('png L1', dict(OUTPUT_FORMAT='png', PNG_COMPRESS_LEVEL=1, PNG_PALETTE=False)),
+    ('png L3', dict(OUTPUT_FORMAT='png', PNG_COMPRESS_LEVEL=3, PNG_PALETTE=False)),
+    ('png L6', dict(OUTPUT_FORMAT='png', PNG_COMPRESS_LEVEL=6, PNG_PALETTE=False)),
+    ('png L9', dict(OUTPUT_FORMAT='png', PNG_COMPRESS_LEVEL=9, PNG_PALETTE=False)),
+    ('png P L1', dict(OUTPUT_FORMAT='png', PNG_COMPRESS_LEVEL=1, PNG_PALETTE=True)),
+    ('png P L6', dict(OUTPUT_FORMAT='png', PNG_COMPRESS_LEVEL=6, PNG_PALETTE=True)),
+    ('png P L9', dict(OUTPUT_FORMAT='png', PNG_COMPRESS_LEVEL=9, PNG_PALETTE=True)),
+    ('webp m2 e0', dict(OUTPUT_FORMAT='webp', WEBP_METHOD=2, WEBP_EFFORT=0)),
+    ('webp m4 e80', dict(OUTPUT_FORMAT='webp', WEBP_METHOD=4, WEBP_EFFORT=80)),
+    ('jpeg q90', dict(OUTPUT_FORMAT='jpeg', JPEG_QUALITY=90)),
+)
+
+def _max_pixel_diff(a, b):
+    from PIL import ImageChops
+    return max(hi for _, hi in ImageChops.difference(a.convert('RGB'), b.convert('RGB')).getextrema())
+
+def bench_encode(n_cards=8, repeat=3):
+    # Encode-Zeit und Bytes je Karte (Vorder- + Rückseite) für jede Encoder-Einstellung
+    from PIL import Image
+    fonts = Main.FONTS.card_fonts()
+    faces = []
+    for i, (f, b) in enumerate(Main.iter_deck(synthetic_deck(n_cards)), 1):
+        card = Main.parse_card(i, f, b)
+        faces += [Main.render_front(card.front, i, fonts), Main.render_back(card.back, i, fonts)]
+    print(f'Encoding, {n_cards} Karten ({Main.IMG_SIZE[0]}x{Main.IMG_SIZE[1]}):')
+    print(f'  {"Encoder":12s} {"ms/Karte":>9s} {"KB/Karte":>9s} {"max. Abw.":>9s}')
+    results = {}
+    for name, settings in ENCODERS:
+        saved = {k: getattr(Main, k) for k in settings}
+        try:
+            for k, v in settings.items():
+                setattr(Main, k, v)
+            datas = []
+            t = _best_of(lambda: datas.__setitem__(slice(None), [Main.encode_image(img) for img in faces]),
+                         repeat)
+        finally:
+            for k, v in saved.items():
+                setattr(Main, k, v)
+        size = sum(len(d) for d in datas)
+        diff = max(_max_pixel_diff(img, Image.open(Main.io.BytesIO(d))) for img, d in zip(faces, datas))
+        results[name] = {'ms_per_card': t / n_cards * 1000, 'kb_per_card': size / n_cards / 1024,
+                         'max_diff': diff}
+        print(f'  {name:12s} {t / n_cards * 1000:9.1f} {size / n_cards / 1024:9.1f} {diff:9d}')
+    return results
+
+def _pdf_page_image(parser, page):
+    # Bild einer Seite aus der PDF zurückgewinnen (nur die Varianten, die SheetPdf schreibt)
+    from PIL import Image, PdfParser
+    xobjects = page[b'Resources'].get(b'XObject')
+    if not xobjects:
+        return None
+    st = parser.read_indirect(xobjects[b'Im0'])
+    d = st.dictionary
+    w, h, bits, cs = d[b'Width'], d[b'Height'], d[b'BitsPerComponent'], d[b'ColorSpace']
+    if d[b'Filter'] == PdfParser.PdfName(b'DCTDecode'):
+        return Image.open(Main.io.BytesIO(st.buf)).convert('RGB')
+    if b'DecodeParms' not in d:
+        return Image.frombytes('RGB', (w, h), zlib.decompress(st.buf))
+    # PNG-Prädiktor: IDAT-Daten wieder in eine PNG-Datei verpacken
+    def chunk(t, data):
+        return struct.pack('>I', len(data)) + t + data + struct.pack('>I', zlib.crc32(t + data))
+    if isinstance(cs, list):
+        color, plte = 3, chunk(b'PLTE', cs[3])
+    else:
+        color, plte = (0 if cs == PdfParser.PdfName(b'DeviceGray') else 2), b''
+    png = (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', w, h, bits, color, 0, 0, 0))
+           + plte + chunk(b'IDAT', st.buf) + chunk(b'IEND', b''))
+    return Image.open(Main.io.BytesIO(png)).convert('RGB')
+
+def check_pdf(n_cards=20, fmt=None):
+    # Duplex-PDF gegen die Bogenbilder desselben Laufs: Reihenfolge, Seitenmaße und Pixel
+    from PIL import Image, ImageChops, PdfParser
+    out = tempfile.mkdtemp(prefix='cards_pdf_')
+    saved = Main.OUTPUT_FOLDER, Main.SAVE_SINGLES_TO_PHOTOS, Main.OUTPUT_FORMAT
+    try:
+        Main.OUTPUT_FOLDER, Main.SAVE_SINGLES_TO_PHOTOS = out, False
+        Main.OUTPUT_FORMAT = fmt or Main.OUTPUT_FORMAT
+        Main.generate_from_text(synthetic_deck(n_cards), use_cache=False, sheet_output='both')
+        sheets = os.path.join(out, Main.SHEETS_SUBDIR)
+        parser = PdfParser.PdfParser(os.path.join(sheets, Main.SHEET_PDF_NAME))
+        n_sheets = -(-n_cards // (Main.SHEET_GRID_COLS * Main.SHEET_GRID_ROWS))
+        expected = [f'sheet_{i:02d}_{side}.{Main.image_ext()}' for i in range(1, n_sheets + 1)
+                    for side in ('front', 'back')]
+        if len(parser.pages) != len(expected):
+            raise SystemExit(f'PDF hat {len(parser.pages)} Seiten, erwartet {len(expected)}')
+        w_pt = Main.SHEET_PAGE_SIZE[0] * 72 / Main.DPI
+        worst = 0
+        for ref, pg in zip(expected, parser.pages):
+            page = parser.read_indirect(pg)
+            if abs(page[b'MediaBox'][2] - w_pt) > 0.01:
+                raise SystemExit(f'{ref}: falsche Seitenbreite {page[b"MediaBox"][2]}')
+            a = Image.open(os.path.join(sheets, ref)).convert('RGB')
+            b = _pdf_page_image(parser, page)
+            worst = max(worst, max(hi for _, hi in ImageChops.difference(a, b).getextrema()))
+        lossy = Main.OUTPUT_FORMAT == 'jpeg'
+        if worst and not lossy:
+            raise SystemExit(f'PDF-Seiten weichen von den Bogenbildern ab (max. {worst})')
+        print(f'PDF: {len(expected)} Seiten in Duplex-Reihenfolge, max. Abweichung {worst}')
+    finally:
+        Main.OUTPUT_FOLDER, Main.SAVE_SINGLES_TO_PHOTOS, Main.OUTPUT_FORMAT = saved
+        shutil.rmtree(out, ignore_errors=True)
+
+class PhotosStub:
+    # steht für Pythonistas photos/ui: merkt sich die Bilddaten, optional langsam oder mit Fehler
+    def __init__(self, delay=0.0, fail_on=()):
+        self.delay = delay
+        self.fail_on = set(fail_on)
+        self.images = []
+
+    def save_image(self, data):
+        time.sleep(self.delay)
+        if len(self.images) + 1 in self.fail_on:
+            self.fail_on.discard(len(self.images) + 1)
+            raise IOError('Fotos-Stub: Speichern abgelehnt')
+        self.images.append(data)
+
+def _photos_run(deck, stub, out=None, **settings):
+    # generate_from_text mit PhotosStub statt photos/ui; Rückgabe: (Sekunden, Ausgabeordner)
+    out = out or tempfile.mkdtemp(prefix='cards_writer_')
+    names = ('OUTPUT_FOLDER', 'SAVE_SINGLES_TO_PHOTOS', 'UI_AVAILABLE', 'GENERATE_SHEETS', 'RENDER_CACHE')
+    saved = {k: getattr(Main, k) for k in names + tuple(settings)}
+    old = getattr(Main, 'photos', None), getattr(Main, 'ui', None)
+    try:
+        Main.OUTPUT_FOLDER, Main.SAVE_SINGLES_TO_PHOTOS, Main.UI_AVAILABLE = out, True, True
+        Main.GENERATE_SHEETS = Main.RENDER_CACHE = False
+        Main.photos = stub
+        Main.ui = types.SimpleNamespace(Image=types.SimpleNamespace(from_data=lambda data: data))
+        for k, v in settings.items():
+            setattr(Main, k, v)
+        t0 = time.perf_counter()
+        Main.generate_from_text(deck)
+        return time.perf_counter() - t0, out
+    finally:
+        for k, v in saved.items():
+            setattr(Main, k, v)
+        Main.photos, Main.ui = old
+
+def _check_writer_failures(deck, photo_ms):
+    # Fehler im Lauf: ungültige Bogenausgabe startet keine Schreib-Threads; ein Renderfehler bei Karte 5
+    # (langsame Fotos, PDF, Cache) beendet alle Threads, speichert Karten 1-4 und verwirft die halbe PDF
+    before = threading.active_count()
+    out = tempfile.mkdtemp(prefix='cards_writer_')
+    render_card = Main.render_card
+    def failing(i, *args, **kwargs):
+        if i == 5:
+            raise RuntimeError('Testfehler bei Karte 5')
+        return render_card(i, *args, **kwargs)
+    try:
+        try:
+            _photos_run(deck, PhotosStub(), out, SHEET_OUTPUT='bogus')
+        except ValueError:
+            pass
+        leaked = threading.active_count() - before
+        stub = PhotosStub(photo_ms / 1000)
+        Main.render_card = failing
+        try:
+            _photos_run(deck, stub, out, GENERATE_SHEETS=True, RENDER_CACHE=True, SHEET_OUTPUT='both',
+                        RENDER_WORKERS=1)
+        except RuntimeError:
+            pass
+        finally:
+            Main.render_card = render_card
+        leaked = max(leaked, threading.active_count() - before)
+        singles = len(os.listdir(os.path.join(out, Main.SINGLE_SUBDIR)))
+        tmp = [f for f in os.listdir(os.path.join(out, Main.SHEETS_SUBDIR)) if f.endswith('.tmp')]
+        manifest = os.path.exists(os.path.join(out, Main.RENDER_CACHE_DIR, Main.RenderCache.MANIFEST))
+    finally:
+        shutil.rmtree(out, ignore_errors=True)
+    ok = leaked == 0 and singles == 8 and len(stub.images) == 8 and not tmp and manifest
+    print(f'Fehler im Lauf: {leaked} Threads übrig, {singles}/8 Dateien und {len(stub.images)}/8 Fotos '
+          f'von Karte 1-4, PDF-Rest {"ja" if tmp else "nein"}, Cache-Manifest {"ja" if manifest else "nein"}'
+          f' -> {"ok" if ok else "FEHLER"}')
+    if not ok:
+        sys.exit(1)
+
+def check_writer(n_cards=12, photo_ms=40):
+    # Jede Seite einmal kodiert: Fotos bekommen dieselben Bytes wie die Datei, in Kartenreihenfolge;
+    # ein Fotos-Fehler wird gemeldet, ohne dass Dateien fehlen. Dazu synchron gegen Hintergrund.
+    deck = synthetic_deck(n_cards)
+    stub = PhotosStub(fail_on=(3,))
+    _, out = _photos_run(deck, stub)
+    try:
+        single = os.path.join(out, Main.SINGLE_SUBDIR)
+        files = [os.path.join(single, f'card_{i:02d}_{side}.{Main.image_ext()}')
+                 for i in range(1, n_cards + 1) for side in ('front', 'back')]
+        data = [open(f, 'rb').read() for f in files]
+        if stub.images != data[:2] + data[3:]:
+            raise SystemExit('Fotos-Bilder weichen von den Dateien ab oder sind nicht in Kartenreihenfolge')
+        print(f'Writer: {len(files)} Dateien, {len(stub.images)} Fotos (1 Fehler gemeldet), Bytes identisch')
+    finally:
+        shutil.rmtree(out, ignore_errors=True)
+    _check_writer_failures(deck, photo_ms)
+    times = {}
+    for label, threads in (('synchron', 0), ('Hintergrund', Main.WRITER_THREADS or 2)):
+        t, out = _photos_run(deck, PhotosStub(photo_ms / 1000), WRITER_THREADS=threads)
+        shutil.rmtree(out, ignore_errors=True)
+        times[label] = t
+    print(f'{n_cards} Karten, Fotos-Stub {photo_ms} ms/Bild:')
+    print(f'  synchron     {times["synchron"]:8.2f} s')
+    print(f'  Hintergrund  {times["Hintergrund"]:8.2f} s   ({times["synchron"] / times["Hintergrund"]:.2f}x)')
+    return times
+
+# ====== Stufen-Benchmark: Zeit und Speicher je Pipeline-Stufe, JSON und Vergleich mit einer Basis ======
+STAGES = ('split', 'parse', 'wrap', 'render', 'compose', 'encode')
+# Unterhalb dieser Differenzen gilt eine Abweichung als Rauschen, auch wenn sie relativ groß ist
+MIN_DELTA_MS = 2.0
+MIN_DELTA_MB = 2.0
+
+def _proc_status(field):
+    try:
+        with open('/proc/self/status') as f:
+            m = re.search(field + r':\s+(\d+) kB', f.read())
+        return int(m.group(1)) / 1024 if m else None
+    except OSError:
+        return None
+
+def _reset_peak_rss():
+    # Linux: Spitzen-RSS (VmHWM) zurücksetzen, damit er nur die folgende Stufe misst
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return _proc_status('VmRSS')
+    except OSError:
+        return None
+
+def _stage_memory(fn):
+    # Spitzenzuwachs in MB: RSS (inkl. Pillow-Puffer) wo möglich, sonst Python-Heap über tracemalloc
+    gc.collect()
+    base = _reset_peak_rss()
+    if base is not None:
+        fn()
+        peak = _proc_status('VmHWM')
+        if peak is not None:
+            return max(0.0, peak - base), 'rss'
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / (1024 * 1024), 'tracemalloc'
+    finally:
+        tracemalloc.stop()
+
+def _stage_funcs(deck):
+    # Eingaben jeder Stufe werden vorab erzeugt, damit jede Stufe für sich gemessen wird
+    fonts = Main.FONTS.card_fonts()
+    pairs = [Main.extract_front_back(b) for b in Main.split_blocks(deck)]
+    structs = [(Main.parse_card_html_like(f), Main.parse_card_html_like(b)) for f, b in pairs]
+    lp = Main.layout_params()
+    draw = Main.ImageDraw.Draw(Main.Image.new('RGB', (1, 1)))
+    texts = [(t, lp.wrap_w - 80) for f, _ in structs for t in f.bullets]
+    texts += [(t, lp.wrap_w) for _, b in structs for t in b.paragraphs]
+    faces = [img for i, (f, b) in enumerate(structs, 1)
+             for img in (Main.render_front(f, i, fonts), Main.render_back(b, i, fonts))]
+    cell = Main.sheet_cell_size()
+    cells = [Main.fit_to_cell(img, *cell) for img in faces]
+    per_sheet = Main.SHEET_GRID_COLS * Main.SHEET_GRID_ROWS
+
+    def wrap():
+        Main._METRICS.clear()   # kalt messen wie im ersten Lauf
+        for t, w in texts:
+            Main.wrap_by_width(draw, t, fonts[1], w)
+    return {
+        'split': lambda: [Main.extract_front_back(b) for b in Main.split_blocks(deck)],
+        'parse': lambda: [(Main.parse_card_html_like(f), Main.parse_card_html_like(b)) for f, b in pairs],
+        'wrap': wrap,
+        'render': lambda: [(Main.render_front(f, i, fonts), Main.render_back(b, i, fonts))
+                           for i, (f, b) in enumerate(structs, 1)],
+        'compose': lambda: [Main.compose_sheet(cells[k:k + per_sheet], Main.SHEET_PAGE_SIZE, Main.SHEET_GRID_COLS,
+                                               Main.SHEET_GRID_ROWS, Main.SHEET_CELL_MARGIN,
+                                               footer_text='Sheet', fonts=fonts)
+                            for k in range(0, len(cells), per_sheet)],
+        'encode': lambda: [Main.encode_image(img) for img in faces],
+    }
+
+def bench_stages(n_cards=8, n_bullets=3, n_words=60, n_paragraphs=1, unicode=False, repeat=5):
+    deck = synthetic_deck(n_cards, n_bullets, n_words, n_paragraphs=n_paragraphs, unicode=unicode)
+    funcs = _stage_funcs(deck)
+    report = {
+        'meta': {'cards': n_cards, 'bullets': n_bullets, 'words': n_words, 'paragraphs': n_paragraphs,
+                 'unicode': unicode, 'repeat': repeat, 'python': platform.python_version(),
+                 'pillow': Main.PIL.__version__, 'output_format': Main.OUTPUT_FORMAT},
+        'stages': {},
+    }
+    print(f'Stufen, {n_cards} Karten ({n_bullets} Stichpunkte, {n_paragraphs} x {n_words} Wörter'
+          f'{", Unicode" if unicode else ""}):')
+    print(f'  {"Stufe":8s} {"ms":>10s} {"ms/Karte":>9s} {"Spitze MB":>10s}')
+    for name in STAGES:
+        fn = funcs[name]
+        seconds = _best_of(fn, repeat)
+        mem, source = _stage_memory(fn)
+        report['stages'][name] = {'seconds': seconds, 'ms_per_card': seconds / n_cards * 1000,
+                                  'peak_mb': mem, 'memory': source}
+        print(f'  {name:8s} {seconds * 1000:10.2f} {seconds / n_cards * 1000:9.2f} {mem:10.1f}')
+    return report
+
+def compare_stages(report, baseline, threshold=0.25, mem_threshold=None):
+    # Liste der Regressionen gegenüber einer gespeicherten Basis (leer = alles im Rahmen)
+    mem_threshold = threshold if mem_threshold is None else mem_threshold
+    differing = [k for k in ('cards', 'bullets', 'words', 'paragraphs', 'unicode', 'output_format')
+                 if baseline.get('meta', {}).get(k) != report['meta'].get(k)]
+    if differing:
+        print('Warnung: Basis mit anderen Parametern gemessen:', ', '.join(differing))
+    failures = []
+    print(f'Vergleich mit Basis (Schwelle Zeit {threshold:.0%}, Speicher {mem_threshold:.0%}):')
+    for name, cur in report['stages'].items():
+        base = baseline.get('stages', {}).get(name)
+        if base is None:
+            print(f'  {name:8s} neu (keine Basis)')
+            continue
+        dt = (cur['seconds'] - base['seconds']) * 1000
+        ratio = cur['seconds'] / base['seconds'] if base['seconds'] else float('inf')
+        line = f'  {name:8s} Zeit {ratio:6.2f}x ({dt:+8.2f} ms)'
+        if ratio > 1 + threshold and dt > MIN_DELTA_MS:
+            failures.append(f'{name}: Zeit {ratio:.2f}x')
+            line += '  REGRESSION'
+        if base.get('memory') == cur.get('memory'):
+            dm = cur['peak_mb'] - base['peak_mb']
+            mratio = cur['peak_mb'] / base['peak_mb'] if base['peak_mb'] else float('inf')
+            line += f'   Speicher {dm:+7.1f} MB'
+            if mratio > 1 + mem_threshold and dm > MIN_DELTA_MB:
+                failures.append(f'{name}: Speicher {dm:+.1f} MB')
+                line += '  REGRESSION'
+        print(line)
+    return failures
+
+# läuft in einem frischen Interpreter: Import + CLI-Parsing + Parsen eines Decks, ohne Pillow/ui
+_IMPORT_PROBE = '''
+import sys, time, json
+t0 = time.perf_counter()
+import Main
+t1 = time.perf_counter()
+Main.parse_cli_args(['--input', 'deck.txt', '--no-cache'])
+cards = [Main.parse_card(i, f, b) for i, (f, b) in enumerate(Main.iter_deck(sys.stdin.read()), 1)]
+t2 = time.perf_counter()
+print(json.dumps({'import_ms': (t1 - t0) * 1000, 'parse_ms': (t2 - t1) * 1000, 'cards': len(cards),
+                  'loaded': [m for m in ('PIL', 'ui', 'photos', 'concurrent.futures') if m in sys.modules]}))
+'''
+
+def check_import(budget_ms=60.0, runs=5, n_cards=20):
+    # Headless-Pfad: "import Main" bleibt unter dem Budget und lädt weder Pillow noch ui
+    here = os.path.dirname(os.path.abspath(__file__))
+    deck = synthetic_deck(n_cards)
+    subprocess.run([sys.executable, '-c', 'import Main'], cwd=here, check=True)   # .pyc erzeugen
+    results = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', _IMPORT_PROBE], cwd=here, input=deck,
+                             capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(out))
+    best = min(results, key=lambda r: r['import_ms'])
+    print(f'Import (bester von {runs}): {best["import_ms"]:.1f} ms, Budget {budget_ms:.0f} ms')
+    print(f'  CLI-Parsing + {best["cards"]} Karten parsen: {best["parse_ms"]:.1f} ms')
+    loaded = sorted({m for r in results for m in r['loaded']})
+    if loaded:
+        raise SystemExit(f'Headless-Import lädt unnötig: {", ".join(loaded)}')
+    if best['import_ms'] > budget_ms:
+        raise SystemExit(f'Import dauert {best["import_ms"]:.1f} ms (Budget {budget_ms:.0f} ms)')
+    print('  Pillow/ui nicht geladen, im Budget')
+    return best
+
+def bench_daemon(n_cards=3, runs=3):
+    # Kleine Decks wie aus Shortcuts: Kaltstart (eigener Prozess) gegen den Client mit warmem Daemon.
+    # Ohne Render-Cache, damit nur Interpreter-/Pillow-/Font-Start gegen warmen Zustand gemessen wird.
+    import threading
+    work = tempfile.mkdtemp(prefix='cards_daemon_')
+    script = os.path.join(work, 'Main.py')
+    shutil.copy(Main.__file__, script)
+    saved = Main.OUTPUT_FOLDER, Main.SAVE_SINGLES_TO_PHOTOS
+    Main.OUTPUT_FOLDER, Main.SAVE_SINGLES_TO_PHOTOS = os.path.join(work, 'daemon_out'), False
+    daemon = Main.RenderDaemon(port=0)
+    port = daemon.address[1]
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    try:
+        deck = synthetic_deck(n_cards)
+        def cli(*extra):
+            t0 = time.perf_counter()
+            subprocess.run([sys.executable, script, '--no-cache', *extra, deck], cwd=work, check=True,
+                           capture_output=True)
+            return time.perf_counter() - t0
+        Main.render_via_daemon(deck, use_cache=False, port=port)   # warm (Font-Caches, Metriken)
+        cold = min(cli() for _ in range(runs))
+        client = min(cli('--via-daemon', '--port', str(port)) for _ in range(runs))
+        def direct():
+            t0 = time.perf_counter()
+            if Main.render_via_daemon(deck, use_cache=False, port=port) is None:
+                raise SystemExit('Daemon nicht erreichbar')
+            return time.perf_counter() - t0
+        http = min(direct() for _ in range(runs))
+    finally:
+        daemon.shutdown()
+        Main.OUTPUT_FOLDER, Main.SAVE_SINGLES_TO_PHOTOS = saved
+        shutil.rmtree(work, ignore_errors=True)
+    print(f'{n_cards} Karten, ohne Render-Cache (bester von {runs}):')
+    print(f'  Kaltstart im Prozess  {cold:8.2f} s')
+    print(f'  Client + Daemon       {client:8.2f} s   ({cold / client:.1f}x)')
+    print(f'  nur HTTP-Auftrag      {http:8.2f} s')
+    return {'cold_s': cold, 'client_s': client, 'http_s': http}
+
+def _render_reference(struct, idx, side, fonts, size=None):
+    # Bisheriger Renderer (Stand vor der Layout/Paint-Trennung): frisches Bild, Kopfzeile, Text in einem
+    Image, ImageDraw = Main.Image, Main.ImageDraw
+    lp = Main.layout_params(size)
+    W, H = lp.size
+    img = Image.new('RGB', lp.size, Main.BACKGROUND_COLOR); draw = ImageDraw.Draw(img)
+    title_font, body_font, small_font = fonts
+    s = lp.scale
+    ref_title, ref_body = (title_font, body_font) if s == 1 else Main.FONTS.card_fonts()[:2]
+    x, content_w, header_h = lp.margin, lp.wrap_w, lp.header_h
+    draw.rectangle([0, 0, W, header_h], fill=Main.ACCENT_COLOR)
+    if struct.title:
+        sizes, total_h = [], 0
+        for ln in Main.wrap_by_width(draw, struct.title, ref_title, content_w):
+            w, h = Main.measure_text(draw, ln, title_font)
+            if ref_title is not title_font:
+                h = Main.measure_text(draw, ln, ref_title)[1]
+            sizes.append((ln, w, h))
+            total_h += int(h * 1.1)
+        cur_y = int(header_h / 2) - int(total_h * s) // 2
+        for ln, w, h in sizes:
+            draw.text(((W - w) // 2, cur_y), ln, font=title_font, fill=Main.TITLE_TEXT_COLOR)
+            cur_y += int(int(h * 1.1) * s)
+    y = header_h + lp.title_body_gap
+    if side == 'front':
+        blocks = [('b', struct.bullets)] if struct.bullets else [('p', struct.paragraphs)]
+    else:
+        blocks = [('p', struct.paragraphs)] if struct.paragraphs else [('B', struct.bullets)] if struct.bullets else []
+    for kind, texts in blocks:
+        for i, t in enumerate(texts, start=1):
+            for j, ln in enumerate(Main.wrap_by_width(draw, t, ref_body, content_w - (0 if kind == 'p' else 80))):
+                if kind == 'p': txt = ln
+                elif kind == 'b': txt = f'{i}. ' + ln if j == 0 else ' ' * len(f'{i}. ') + ln
+                else: txt = f'{i}. ' + ln if j == 0 else ' ' * 4 + ln
+                draw.text((x, int(y)), txt, font=body_font, fill=Main.BODY_TEXT_COLOR)
+                y += int(Main.line_height(draw, txt, ref_body) * 1.2) * s
+            y += lp.block_gap
+    if not blocks:
+        draw.text((x, int(y) + lp.hint_offset), '(keine Erklärung gefunden)', font=body_font, fill=Main.MUTED_TEXT_COLOR)
+    footer = f'Karte {idx} - {"Front" if side == "front" else "Back"}'
+    fw, fh = Main.measure_text(draw, footer, small_font)
+    draw.text((W - lp.margin - fw, H - lp.margin - fh), footer, font=small_font, fill=Main.MUTED_TEXT_COLOR)
+    return img
+
+def _py_alloc_kb(fn):
+    # Spitze der Python-Allokationen (tracemalloc) während fn, in KB
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+def bench_paint(n_cards=8, repeat=3):
+    # Layout/Paint gegen den bisherigen Renderer: pixelgleich (A4 und Zellgröße, auch Sonderfälle),
+    # Zeit je Seite für Trockenlauf (nur Layout), Paint aus fertigem Layout und Layout + Paint
+    deck = synthetic_deck(n_cards)
+    structs = [(Main.parse_card_html_like(f), Main.parse_card_html_like(b))
+               for f, b in (Main.extract_front_back(b) for b in Main.split_blocks(deck))]
+    P = Main.parse_card_html_like
+    structs += [(P('<h2>Nur Stichpunkte</h2><ul><li>eins zwei drei</li><li>vier</li></ul>'),
+                 P('<ul><li>' + synthetic_paragraph(40) + '</li><li>kurz</li></ul>')),
+                (P('Nur ein Absatz ohne Titel'), P(''))]
+    cell_face = Main.fit_size(Main.IMG_SIZE, *Main.sheet_cell_size())
+    bad = 0
+    for size in (None, cell_face):
+        fonts = Main.FONTS.card_fonts(Main.layout_params(size).font_sizes)
+        for i, pair in enumerate(structs, 1):
+            for side, st in zip(('front', 'back'), pair):
+                a = _render_reference(st, i, side, fonts, size)
+                b = Main.paint_layout(Main.layout_face(st, i, side, fonts, size))
+                if a.tobytes() != b.tobytes():
+                    print(f'  Abweichung: Karte {i} {side} Größe {size or Main.IMG_SIZE}')
+                    bad += 1
+    n_faces = 2 * len(structs)
+    print(f'Pixelgleich mit dem bisherigen Renderer ({n_faces} Seiten, A4 und Zellgröße):', 'ja' if not bad else 'NEIN')
+
+    fonts = Main.FONTS.card_fonts()
+    faces = [(st, i, side) for i, pair in enumerate(structs, 1) for side, st in zip(('front', 'back'), pair)]
+    layouts = [Main.layout_face(st, i, side, fonts) for st, i, side in faces]
+    runs = {
+        'bisher (neu + zeichnen)': lambda: [_render_reference(st, i, side, fonts) for st, i, side in faces],
+        'nur Layout (Trockenlauf)': lambda: [Main.layout_face(st, i, side, fonts) for st, i, side in faces],
+        'Paint aus Layout': lambda: [Main.paint_layout(l) for l in layouts],
+        'Layout + Paint': lambda: [Main.paint_layout(Main.layout_face(st, i, side, fonts)) for st, i, side in faces],
+    }
+    print(f'{n_faces} Seiten A4 {Main.IMG_SIZE[0]}x{Main.IMG_SIZE[1]} (bester von {repeat}):')
+    print(f'  {"":26s} {"ms/Seite":>9s} {"Py-KB Spitze":>13s}')
+    result = {}
+    for name, fn in runs.items():
+        fn()
+        t = _best_of(fn, repeat) / n_faces * 1000
+        kb = _py_alloc_kb(fn)
+        result[name] = {'ms_per_face': t, 'py_peak_kb': kb}
+        print(f'  {name:26s} {t:9.2f} {kb:13.1f}')
+    # Leere Seite: neu gezeichnet (Standard) gegen Kopie einer gecachten Vorlage (TEMPLATE_CACHE_SIZE > 0)
+    header_h = Main.layout_params().header_h
+    saved = Main.TEMPLATE_CACHE_SIZE
+    try:
+        canvas = {}
+        for n in (0, 1):
+            Main.TEMPLATE_CACHE_SIZE = n
+            Main.face_canvas(Main.IMG_SIZE, header_h)
+            canvas[n] = _best_of(lambda: [Main.face_canvas(Main.IMG_SIZE, header_h) for _ in range(20)], repeat) / 20 * 1000
+    finally:
+        Main.TEMPLATE_CACHE_SIZE = saved
+        Main._TEMPLATES.clear()
+    print(f'  Leere Seite: neu gezeichnet {canvas[0]:.2f} ms, Kopie der Vorlage {canvas[1]:.2f} ms')
+    result['canvas'] = {'draw_ms': canvas[0], 'copy_ms': canvas[1]}
+    if bad:
+        sys.exit(1)
+    return result
+
+def _naive_fit(struct, idx, side, fonts):
+    # Referenz: binäre Suche mit exaktem Layout je Kandidatengröße
+    lo, hi, best = Main.AUTO_FIT_MIN_BODY_SIZE, Main.BODY_FONT_SIZE, None
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        layout = Main.layout_face(struct, idx, side, fonts, body_size=mid)
+        if not layout.overflow:
+            best, lo = layout, mid + 1
+        else:
+            hi = mid - 1
+    return best or Main.layout_face(struct, idx, side, fonts, body_size=Main.AUTO_FIT_MIN_BODY_SIZE)
+
+def _split_card(n_paragraphs):
+    # Karte mit kurzer Vorderseite und langer Rückseite (Folgekarten bei AUTO_FIT = 'split')
+    return ('Vorderseite:\n<h4>Thema</h4>\n<ol><li>Frage?</li></ol>\nRückseite:\n<h4>Erklärung</h4>\n'
+            + ''.join(f'<p>{synthetic_paragraph(90, seed=k)}</p>\n' for k in range(n_paragraphs)) + '---\n')
+
+def check_split_cache():
+    # AUTO_FIT = 'split': wächst die Rückseite auf mehr Seiten, ändert sich der Footer "(1/n)" der
+    # unveränderten Vorderseite mit -> der Render-Cache darf die alte Vorderseite nicht liefern
+    keys = ('OUTPUT_FOLDER', 'SAVE_SINGLES_TO_PHOTOS', 'AUTO_FIT')
+    saved = {k: getattr(Main, k) for k in keys}
+    work = tempfile.mkdtemp(prefix='cards_split_')
+    try:
+        Main.SAVE_SINGLES_TO_PHOTOS, Main.AUTO_FIT = False, 'split'
+        deck = os.path.join(work, 'deck.txt')
+        counts = []
+        for n_paragraphs, out in ((4, 'stale'), (9, 'stale'), (9, 'fresh')):
+            with open(deck, 'w', encoding='utf-8') as f:
+                f.write(_split_card(n_paragraphs))
+            _render_into(os.path.join(work, out), deck, use_cache=True)
+            counts.append(len(os.listdir(os.path.join(work, out, Main.SINGLE_SUBDIR))) // 2)
+        bad = _tree_diff(os.path.join(work, 'stale'), os.path.join(work, 'fresh'))
+    finally:
+        for k, v in saved.items():
+            setattr(Main, k, v)
+        shutil.rmtree(work, ignore_errors=True)
+    ok = counts[0] < counts[1] and not bad
+    print(f'  Render-Cache bei \'split\': Seiten {counts[0]} -> {counts[1]}, '
+          f'veraltet gegen frisch: {", ".join(bad) or "gleich"} -> {"ok" if ok else "FEHLER"}')
+    return ok
+
+def bench_autofit(n_cards=12, repeat=3):
+    # AUTO_FIT = 'shrink' auf zu langen Rückseiten: Zeit je Karte gegen die naive Suche (exaktes Layout je
+    # Kandidat), gefundene Größen, Restüberlauf; dazu die Zahl der Folgekarten bei 'split'
+    fonts = Main.FONTS.card_fonts()
+    P = Main.parse_card_html_like
+    backs = [P(''.join(f'<p>{synthetic_paragraph(n, seed=k * 7 + j)}</p>' for j, n in enumerate((40 + 12 * k, 60, 50))))
+             for k in range(n_cards)]
+    faces = [(b, i) for i, b in enumerate(backs, 1) if Main.layout_face(b, i, 'back', fonts).overflow]
+    print(f'{len(faces)} von {n_cards} Rückseiten laufen über ({Main.AUTO_FIT_MIN_BODY_SIZE}-{Main.BODY_FONT_SIZE} px):')
+    saved = Main.AUTO_FIT
+    Main.AUTO_FIT = 'shrink'
+    try:
+        def run(fit_fn):
+            Main._METRICS.clear()   # kalt wie im ersten Lauf: neue Wörter, keine gecachten Breiten
+            return [fit_fn(b, i, 'back', fonts) for b, i in faces]
+        fit, naive = run(Main.fit_face), run(_naive_fit)
+        t_fit = _best_of(lambda: run(Main.fit_face), repeat)
+        t_naive = _best_of(lambda: run(_naive_fit), repeat)
+    finally:
+        Main.AUTO_FIT = saved
+    n = max(1, len(faces))
+    same = sum(a.body_size == b.body_size for a, b in zip(fit, naive))
+    print(f'  Schätzung + exakt   {t_fit / n * 1000:8.2f} ms/Karte')
+    print(f'  naive Suche         {t_naive / n * 1000:8.2f} ms/Karte')
+    print(f'  gleiche Größe wie naive Suche: {same}/{len(faces)}, Größen: {[l.body_size for l in fit]}')
+    rest = [(i, l.overflow) for (b, i), l in zip(faces, fit) if l.overflow]
+    print('  passen nicht (Mindestgröße):', rest or 'keine')
+    pages = [len(Main.layout_pages(b, i, 'back', fonts)) for b, i in faces]
+    print(f'  mit AUTO_FIT = \'split\': {sum(pages) - len(pages)} Folgekarten')
+    if not check_split_cache():
+        sys.exit(1)
+    return {'fit_ms': t_fit / n * 1000, 'naive_ms': t_naive / n * 1000, 'same_size': same, 'faces': len(faces)}
+
+def _compose_reference(images, page_size, cols, rows):
+    # Bisheriger Bogen (Stand vor SHEET_FAST_REDUCE): LANCZOS je Zelle, Schnittlinien mit ImageDraw.line
+    from PIL import Image, ImageDraw
+    page = Image.new('RGB', page_size, 'white')
+    draw = ImageDraw.Draw(page)
+    cell_w, cell_h = page_size[0] // cols, page_size[1] // rows
+    for i in range(1, cols):
+        draw.line([(i * cell_w, 0), (i * cell_w, page_size[1])], fill=(200, 200, 200), width=1)
+    for i in range(1, rows):
+        draw.line([(0, i * cell_h), (page_size[0], i * cell_h)], fill=(200, 200, 200), width=1)
+    for idx, img in enumerate(images[:cols * rows]):
+        col, row = idx % cols, idx // cols
+        size = Main.fit_size(img.size, cell_w, cell_h)
+        resized = img if size == img.size else img.resize(size, Image.LANCZOS)
+        page.paste(resized, (col * cell_w + (cell_w - size[0]) // 2, row * cell_h + (cell_h - size[1]) // 2))
+    return page
+
+def _mean_diff(a, b):
+    from PIL import ImageChops, ImageStat
+    return sum(ImageStat.Stat(ImageChops.difference(a, b)).mean) / 3
+
+def bench_compose(repeat=3):
+    # Bogen aus A4-Seiten (Verkleinern + Zusammensetzen) für 2x2, 3x3, 4x4: bisheriger Weg gegen
+    # Image.reduce; dazu Prüfung der Duplex-Spiegelung und der Beschnittzugabe mit einfarbigen Karten
+    from PIL import Image
+    fonts = Main.FONTS.card_fonts()
+    deck = list(Main.iter_deck(synthetic_deck(16)))
+    faces = [Main.render_front(Main.parse_card(i, f, b).front, i, fonts) for i, (f, b) in enumerate(deck, 1)]
+    page_size = Main.SHEET_PAGE_SIZE
+    print(f'Bogen aus A4-Seiten {Main.IMG_SIZE[0]}x{Main.IMG_SIZE[1]} (bester von {repeat}):')
+    print(f'  {"Raster":6s} {"bisher ms":>10s} {"neu ms":>8s} {"":>6s} {"max. Abw.":>9s} {"mittl. Abw.":>11s}')
+    results = {}
+    for n in (2, 3, 4):
+        imgs = faces[:n * n]
+        old = lambda: _compose_reference(imgs, page_size, n, n)
+        new = lambda: Main.compose_sheet(imgs, page_size, n, n, 0)
+        t_old, t_new = _best_of(old, repeat), _best_of(new, repeat)
+        a, b = old(), new()
+        results[f'{n}x{n}'] = {'old_ms': t_old * 1000, 'new_ms': t_new * 1000,
+                               'max_diff': _max_pixel_diff(a, b), 'mean_diff': _mean_diff(a, b)}
+        r = results[f'{n}x{n}']
+        print(f'  {n}x{n}    {r["old_ms"]:10.1f} {r["new_ms"]:8.1f} {t_old / t_new:5.1f}x {r["max_diff"]:9d} {r["mean_diff"]:11.3f}')
+
+    # Duplex: einfarbige Karten; der gewendete Rückseiten-Bogen muss jede Karte hinter ihre Vorderseite legen
+    ok = True
+    colors = [(40 * k % 256, 90 + 20 * k, 255 - 30 * k) for k in range(5)]
+    cards = [Image.new('RGB', Main.IMG_SIZE, c) for c in colors]
+    cols, rows = 3, 2
+    front = Main.compose_sheet(cards, page_size, cols, rows, 0)
+    for mirror, flip in (('columns', Image.FLIP_LEFT_RIGHT), ('rows', Image.FLIP_TOP_BOTTOM)):
+        back = Main.compose_sheet(cards, page_size, cols, rows, 0, mirror=mirror).transpose(flip)
+        cw, ch = page_size[0] // cols, page_size[1] // rows
+        for k in range(len(cards)):
+            cx, cy = (k % cols) * cw + cw // 2, (k // cols) * ch + ch // 2
+            if front.getpixel((cx, cy)) != back.getpixel((cx, cy)):
+                print(f'  Spiegelung {mirror}: Karte {k + 1} liegt nicht hinter ihrer Vorderseite')
+                ok = False
+    # Beschnittzugabe: Randfarbe der Karte läuft bleed px über die Kartenkante hinaus
+    bleed = 12
+    page = Main.compose_sheet(cards, page_size, cols, rows, 0, bleed=bleed)
+    cw, ch = page_size[0] // cols, page_size[1] // rows
+    tw, th = cw - 2 * bleed, ch - 2 * bleed
+    w, h = Main.fit_size(Main.IMG_SIZE, tw, th)
+    for k in range(len(cards)):
+        x0 = (k % cols) * cw + bleed + (tw - w) // 2
+        y0 = (k // cols) * ch + bleed + (th - h) // 2
+        for p in ((x0 - bleed, y0 + 20), (x0 + 20, y0 - bleed), (x0 - bleed, y0 - bleed)):
+            if page.getpixel(p) != colors[k]:
+                print(f'  Beschnittzugabe: Karte {k + 1} an {p} {page.getpixel(p)} statt {colors[k]}')
+                ok = False
+    print('Duplex-Spiegelung und Beschnittzugabe:', 'ok' if ok else 'FEHLER')
+    if not ok:
+        sys.exit(1)
+    return results
+
+def _paint_with(renderer, layouts):
+    saved = Main.TEXT_RENDERER
+    Main.TEXT_RENDERER = renderer
+    try:
+        return [Main.paint_layout(l) for l in layouts]
+    finally:
+        Main.TEXT_RENDERER = saved
+
+def bench_atlas(n_cards=8, repeat=3, tolerance=0):
+    # Glyph-Atlas gegen draw.text: Pixelabweichung (A4 und Zellgröße, mit typografischen Zeichen und
+    # Subpixel-Positionen), dann Zeit je Seite und Textzeilen pro Sekunde (kalter und warmer Atlas)
+    from PIL import ImageChops
+    P = Main.parse_card_html_like
+    structs = [(P(f), P(b)) for f, b in (Main.extract_front_back(b)
+                                         for b in Main.split_blocks(synthetic_deck(n_cards, unicode=True)))]
+    cell_face = Main.fit_size(Main.IMG_SIZE, *Main.sheet_cell_size())
+    worst, n_diff, n_px = 0, 0, 0
+    for size in (None, cell_face):
+        fonts = Main.FONTS.card_fonts(Main.layout_params(size).font_sizes)
+        layouts = [Main.layout_face(st, i, side, fonts, size)
+                   for i, pair in enumerate(structs, 1) for side, st in zip(('front', 'back'), pair)]
+        # verschobene Kopien: Nachkommastellen in x/y prüfen alle Subpixel-Phasen
+        layouts += [l._replace(ops=[op._replace(xy=(op.xy[0] + k / 7, op.xy[1] + k / 5)) for k, op in enumerate(l.ops)])
+                    for l in layouts[:2]]
+        for a, b in zip(_paint_with('pil', layouts), _paint_with('atlas', layouts)):
+            d = ImageChops.difference(a, b).convert('L')
+            worst = max(worst, d.getextrema()[1])
+            n_diff += sum(d.histogram()[1:])
+            n_px += d.size[0] * d.size[1]
+    ok = worst <= tolerance
+    print(f'Atlas gegen draw.text: max. Abweichung {worst}/255 (Toleranz {tolerance}), '
+          f'{n_diff} von {n_px} Pixeln verschieden ->', 'ok' if ok else 'FEHLER')
+
+    fonts = Main.FONTS.card_fonts()
+    layouts = [Main.layout_face(st, i, side, fonts) for i, pair in enumerate(structs, 1)
+               for side, st in zip(('front', 'back'), pair)]
+    n_lines = sum(len(l.ops) for l in layouts)
+    Main.GLYPHS.clear()
+    t0 = time.perf_counter()
+    _paint_with('atlas', layouts)
+    cold = time.perf_counter() - t0
+    times = {r: _best_of(lambda: _paint_with(r, layouts), repeat) for r in ('pil', 'atlas')}
+    canvas = _best_of(lambda: [Main.face_canvas(l.size, l.header_h) for l in layouts], repeat)
+    print(f'{len(layouts)} Seiten A4, {n_lines} Zeilen (bester von {repeat}):')
+    print(f'  {"":18s} {"ms/Seite":>9s} {"Zeilen/s (nur Text)":>20s}')
+    for name, t in (('draw.text', times['pil']), ('Atlas, kalt', cold), ('Atlas, warm', times['atlas'])):
+        text_s = max(t - canvas, 1e-9)
+        print(f'  {name:18s} {t / len(layouts) * 1000:9.2f} {n_lines / text_s:20.0f}')
+    print('  Atlas:', Main.GLYPHS.stats())
+    if not ok:
+        sys.exit(1)
+    return {'max_diff': worst, 'pil_ms': times['pil'] * 1000, 'atlas_ms': times['atlas'] * 1000, 'cold_ms': cold * 1000}
+
+def bench_pixelmode(n_cards=8, repeat=3):
+    # Pixelformate RGB/L/P: Speicher je Seite, Zeit für Paint, Bogen (Verkleinern + Zusammensetzen)
+    # und PNG-Kodierung, Bytes; Abweichung gegen RGB (L: gegen RGB in Graustufen, P: gegen die
+    # quantisierte RGB-Seite, höchstens eine Stufe der Farbrampe);
+    # plus eine Karte, deren Rückseite auch nach AUTO_FIT noch über den Rand läuft (Zeilen außerhalb der Seite)
+    fonts = Main.FONTS.card_fonts()
+    deck = list(Main.iter_deck(synthetic_deck(n_cards) + synthetic_deck(1, n_words=400, n_paragraphs=2, seed=1)))
+    layouts = []
+    for i, (f, b) in enumerate(deck, 1):
+        card = Main.parse_card(i, f, b)
+        layouts += [Main.fit_face(card.front, i, 'front', fonts), Main.fit_face(card.back, i, 'back', fonts)]
+    if not layouts[-1].overflow:
+        print('  Überlauf-Karte passt auf die Seite, prüft nichts')
+        sys.exit(1)
+    grid = Main.SHEET_GRID_COLS * Main.SHEET_GRID_ROWS
+    n = len(layouts)
+    rgb = [Main.paint_layout(l, 'RGB') for l in layouts]
+    step = 255 / Main.PALETTE_STEPS
+    print(f'{n} Seiten A4 {Main.IMG_SIZE[0]}x{Main.IMG_SIZE[1]}, Bögen {Main.SHEET_GRID_COLS}x{Main.SHEET_GRID_ROWS} (bester von {repeat}):')
+    print(f'  {"Modus":5s} {"MB/Seite":>9s} {"Paint ms":>9s} {"Bogen ms":>9s} {"PNG ms":>8s} {"KB/Seite":>9s} {"max. Abw.":>9s}')
+    results, ok = {}, True
+    for mode in ('RGB', 'L', 'P'):
+        faces = [Main.paint_layout(l, mode) for l in layouts]
+        t_paint = _best_of(lambda: [Main.paint_layout(l, mode) for l in layouts], repeat)
+        sheets = lambda: [Main.compose_sheet(faces[k:k + grid], Main.SHEET_PAGE_SIZE, Main.SHEET_GRID_COLS,
+                                             Main.SHEET_GRID_ROWS, 0, mode=mode) for k in range(0, n, grid)]
+        t_sheet = _best_of(sheets, repeat)
+        datas = []
+        t_png = _best_of(lambda: datas.__setitem__(slice(None), [Main.encode_image(img, 'png') for img in faces]),
+                         repeat)
+        if mode == 'RGB':
+            diff = 0
+        elif mode == 'L':
+            diff = max(_max_pixel_diff(a.convert('L'), b) for a, b in zip(rgb, faces))
+        else:
+            diff = max(_max_pixel_diff(Main.quantize_fixed(a), b) for a, b in zip(rgb, faces))
+        limit = 0 if mode == 'RGB' else 2 if mode == 'L' else step
+        ok = ok and diff <= limit
+        mb = len(faces[0].tobytes()) / 1e6
+        r = results[mode] = {'mb_per_face': mb, 'paint_ms': t_paint / n * 1000, 'sheet_ms': t_sheet / n * 1000,
+                             'png_ms': t_png / n * 1000, 'kb_per_face': sum(map(len, datas)) / n / 1024,
+                             'max_diff': diff}
+        print(f'  {mode:5s} {mb:9.1f} {r["paint_ms"]:9.1f} {r["sheet_ms"]:9.1f} {r["png_ms"]:8.1f} '
+              f'{r["kb_per_face"]:9.1f} {diff:9d}')
+    print('Abweichung gegen RGB (L <= 2, P <= eine Rampenstufe):', 'ok' if ok else 'FEHLER')
+    if not ok:
+        sys.exit(1)
+    return results
+
+class _UiWidget:
+    # Minimaler Ersatz für Pythonista-ui-Elemente: nimmt beliebige Attribute an (Klassenwerte, weil
+    # CardGeneratorView.__init__ den Basis-Konstruktor nicht aufruft)
+    x = y = 0
+    width, height = 540, 900
+    enabled = True
+    text = title = ''
+
+    def __init__(self, frame=None):
+        if frame:
+            self.x, self.y, self.width, self.height = frame
+
+    def add_subview(self, view):
+        self.__dict__.setdefault('subviews', []).append(view)
+
+def _ui_stub():
+    return types.SimpleNamespace(View=_UiWidget, ScrollView=_UiWidget, Label=_UiWidget, TextView=_UiWidget,
+                                 TextField=_UiWidget, Button=_UiWidget, ALIGN_CENTER=1,
+                                 on_main_thread=lambda fn: fn)
+
+def check_progress(n_cards=12):
+    # Fortschritts-API ohne Pythonista: Ereignisse (Zähler, Bytes, Ende), Abbruch nach Karte 3 und
+    # die View mit ui-Stub (Button kehrt sofort zurück, zweiter Tipp bricht ab)
+    deck = synthetic_deck(n_cards)
+    out = tempfile.mkdtemp(prefix='cards_progress_')
+    names = ('OUTPUT_FOLDER', 'SAVE_SINGLES_TO_PHOTOS', 'UI_AVAILABLE', 'RENDER_CACHE', 'GENERATE_SINGLE', 'GENERATE_SHEETS')
+    saved = {k: getattr(Main, k) for k in names}
+    old_ui, old_view = getattr(Main, 'ui', None), Main._VIEW_CLASS
+    ok = True
+    def fail(msg):
+        nonlocal ok
+        print('  FEHLER:', msg)
+        ok = False
+    try:
+        Main.SAVE_SINGLES_TO_PHOTOS, Main.UI_AVAILABLE, Main.RENDER_CACHE = False, False, False
+        Main.GENERATE_SINGLE = Main.GENERATE_SHEETS = True
+        grid = Main.SHEET_GRID_COLS * Main.SHEET_GRID_ROWS
+        # 1) vollständiger Lauf, Ereignisse über den Iterator
+        Main.OUTPUT_FOLDER = os.path.join(out, 'full')
+        job = Main.GenerationJob(deck).start()
+        events = list(job.events(timeout=300))
+        saved_n = job.wait()
+        last = events[-1]
+        n_bytes = sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(Main.OUTPUT_FOLDER) for f in fs)
+        if [e['event'] for e in events[:1]] != ['start'] or last['event'] != 'done':
+            fail(f'Ereignisfolge {events[0]["event"]} ... {last["event"]}')
+        if (last['cards'], last['total'], last['faces'], last['pages']) != (n_cards, n_cards, 2 * n_cards,
+                                                                         2 * -(-n_cards // grid)):
+            fail(f'Zähler am Ende: {last}')
+        if last['bytes'] != n_bytes or saved_n != 2 * n_cards:
+            fail(f'Bytes {last["bytes"]} statt {n_bytes}, gespeichert {saved_n}')
+        if any(b['cards'] < a['cards'] or b['bytes'] < a['bytes'] for a, b in zip(events, events[1:])):
+            fail('Zähler nicht monoton')
+        etas = [e['eta'] for e in events if e['event'] == 'card']
+        print(f'Ereignisse: {len(events)} ({n_cards} Karten, {last["pages"]} Bögen, {last["bytes"] / 1e6:.1f} MB), '
+              f'ETA nach Karte 1: {etas[0]:.1f} s, Lauf {last["elapsed"]:.1f} s')
+        # 2) Abbruch aus dem Callback nach Karte 3
+        Main.OUTPUT_FOLDER = os.path.join(out, 'cancel')
+        job = Main.GenerationJob(deck, on_event=lambda e: e['event'] == 'card' and e['cards'] == 3 and job.cancel())
+        job.run()
+        singles = os.listdir(os.path.join(Main.OUTPUT_FOLDER, Main.SINGLE_SUBDIR))
+        if not job.cancelled or job.result != 6 or len(singles) != 6:
+            fail(f'Abbruch: cancelled={job.cancelled}, gespeichert={job.result}, Dateien={len(singles)}')
+        print(f'Abbruch nach Karte 3: {len(singles)} Einzelbilder, Bögen:',
+              sorted(os.listdir(os.path.join(Main.OUTPUT_FOLDER, Main.SHEETS_SUBDIR))))
+        # 3) View mit ui-Stub: Button-Aktion blockiert nicht, zweiter Tipp bricht ab
+        Main.OUTPUT_FOLDER = os.path.join(out, 'view')
+        Main.ui, Main._VIEW_CLASS = _ui_stub(), None
+        view = Main._card_generator_view_class()()
+        sample = view.cards_text.text
+        if not sample.startswith('Vorderseite:') or '\nRückseite:' not in sample:
+            fail('View: Beispieltext nicht bündig (Leerzeichen vor "Vorderseite:"/"Rückseite:")')
+        view.cards_text.text = deck
+        t0 = time.perf_counter()
+        view.generate_cards(view.generate_btn)
+        t_action = time.perf_counter() - t0
+        while view.job.running and not view.status_label.text.startswith('Karte 2'):
+            time.sleep(0.01)
+        shown = view.status_label.text
+        view.generate_cards(view.generate_btn)
+        view.job.wait(300)
+        t_cancel = time.perf_counter() - t0
+        if t_action > 0.1 or not view.job.cancelled or not view.status_label.text.startswith('Abgebrochen'):
+            fail(f'View: Aktion {t_action * 1000:.0f} ms, Status "{view.status_label.text}"')
+        if view.generate_btn.title != 'Karten generieren' or not view.generate_btn.enabled:
+            fail('View: Button nicht zurückgesetzt')
+        print(f'View: Button-Aktion kehrt nach {t_action * 1000:.1f} ms zurück, Anzeige "{shown}", '
+              f'Abbruch nach {t_cancel:.1f} s: "{view.status_label.text}"')
+    finally:
+        for k, v in saved.items():
+            setattr(Main, k, v)
+        Main.ui, Main._VIEW_CLASS = old_ui, old_view
+        shutil.rmtree(out, ignore_errors=True)
+    print('Fortschritt, Abbruch und View:', 'ok' if ok else 'FEHLER')
+    if not ok:
+        sys.exit(1)
+
+def _manifest_worker(job):
+    # ein Lauf auf dem geteilten Cache-Ordner: eigene Einträge anlegen, dann gleichzeitig schließen
+    root, k, n_keys, start = job
+    cache = Main.RenderCache(root, fingerprint='bench')
+    for j in range(n_keys):
+        cache.put(f'{k:02d}{j:062d}', b'x')
+    while time.time() < start:
+        time.sleep(0.001)
+    cache.close()
+
+def check_manifest_race(procs=4, n_keys=200, rounds=3):
+    # Batch-Prozesse teilen sich den Render-Cache: kein Lauf darf beim Schließen die Manifest-Einträge
+    # eines anderen überschreiben
+    from concurrent.futures import ProcessPoolExecutor
+    root = tempfile.mkdtemp(prefix='cards_manifest_')
+    lost = 0
+    try:
+        with ProcessPoolExecutor(max_workers=procs) as executor:
+            for r in range(rounds):
+                start = time.time() + 0.5
+                list(executor.map(_manifest_worker, [(root, r * procs + k, n_keys, start) for k in range(procs)]))
+        with open(os.path.join(root, Main.RenderCache.MANIFEST), encoding='utf-8') as f:
+            entries = json.load(f)['entries']
+        lost = rounds * procs * n_keys - len(entries)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print(f'Manifest: {rounds} x {procs} Prozesse mit je {n_keys} Einträgen, {lost} verloren')
+    return lost == 0
+
+def bench_batch(n_decks=6, n_cards=4, jobs=2):
+    # Batch-Modus: synthetische Decks (auch in Unterordnern) parallel rendern, Ausgabe je Deck prüfen,
+    # dann Fortsetzen: zweiter Lauf überspringt alles, nach gekürztem Journal nur die fehlenden Decks.
+    # deck_00.md neben deck_00.txt: gleicher Name, andere Endung -> eigener Ordner
+    work = tempfile.mkdtemp(prefix='cards_batch_')
+    src = os.path.join(work, 'decks')
+    os.makedirs(os.path.join(src, 'sub'))
+    names = [os.path.join('sub' if k % 2 else '', f'deck_{k:02d}.txt') for k in range(n_decks - 1)] + ['deck_00.md']
+    for k, name in enumerate(names):
+        with open(os.path.join(src, name), 'w', encoding='utf-8') as f:
+            f.write(synthetic_deck(n_cards, seed=k))
+    keys = ('OUTPUT_FOLDER', 'SAVE_SINGLES_TO_PHOTOS', 'BATCH_PATTERN')
+    saved = {k: getattr(Main, k) for k in keys}
+    Main.OUTPUT_FOLDER, Main.SAVE_SINGLES_TO_PHOTOS, Main.BATCH_PATTERN = os.path.join(work, 'out'), False, '**/*.*'
+    ok = True
+    try:
+        first = Main.run_batch(src, jobs, use_cache=False)
+        out_root = os.path.join(Main.OUTPUT_FOLDER, Main.BATCH_SUBDIR)
+        for name in names:
+            out_dir = os.path.join(out_root, name)
+            singles = os.path.join(out_dir, Main.SINGLE_SUBDIR)
+            n = len(os.listdir(singles)) if os.path.isdir(singles) else 0
+            if n != 2 * n_cards or not os.path.isdir(os.path.join(out_dir, Main.SHEETS_SUBDIR)):
+                print(f'  {name}: {n} Einzelbilder statt {2 * n_cards} oder keine Bögen')
+                ok = False
+        second = Main.run_batch(src, jobs, use_cache=False)
+        if second['rendered'] or second['skipped'] != n_decks:
+            print('  zweiter Lauf hat nicht alles übersprungen')
+            ok = False
+        # Abbruch nachstellen: die letzten Journalzeilen fehlen
+        journal = os.path.join(out_root, Main.BATCH_JOURNAL)
+        with open(journal, encoding='utf-8') as f:
+            lines = f.readlines()
+        drop = max(1, n_decks // 3)
+        with open(journal, 'w', encoding='utf-8') as f:
+            f.writelines(lines[:-drop])
+            f.write(lines[-drop][:20])   # halb geschriebene Zeile
+        third = Main.run_batch(src, jobs, use_cache=False)
+        if third['rendered'] != drop or third['skipped'] != n_decks - drop:
+            print(f'  Fortsetzen: {third["rendered"]} gerendert statt {drop}')
+            ok = False
+    finally:
+        for k, v in saved.items():
+            setattr(Main, k, v)
+        shutil.rmtree(work, ignore_errors=True)
+    print(f'{n_decks} Decks x {n_cards} Karten, {jobs} parallel: '
+          f'{first["cards"] / first["seconds"]:.2f} Karten/s, {first["bytes"] / 1e6 / first["seconds"]:.1f} MB/s')
+    ok = check_manifest_race(max(2, jobs)) and ok
+    print('Batch-Ausgabe, Fortsetzen und Cache-Manifest:', 'ok' if ok else 'FEHLER')
+    if not ok:
+        sys.exit(1)
+    return first
+
+# Absichtlich fehlerhafte Karten für check: (erwarteter Befund, Block)
+BAD_CARDS = (
+    ('overflow', 'Vorderseite:\n<h4>Zu lang</h4>\n<p>x</p>\nRückseite:\n<h4>Erklärung</h4>\n'
+                 + ''.join(f'<p>{synthetic_paragraph(90, seed=k)}</p>\n' for k in range(8))),
+    ('empty_back', 'Vorderseite:\n<h4>Leer</h4>\n<ol><li>Frage?</li></ol>\nRückseite:\n<h4>Erklärung</h4>\n'),
+    ('fallback_split', '<h4>Ohne Marker</h4>\n<ol><li>Frage?</li></ol>\n===\n<h4>Antwort</h4>\n<p>Text</p>\n'),
+    ('fallback_split', '<h4>Nur Vorderseite</h4>\n<p>Text ohne Rückseite</p>\n'),
+    ('long_line', 'Vorderseite:\n<h4>Langes Wort</h4>\n<p>Donaudampfschifffahrtsgesellschaftskapitänsmützenabzeichen'
+                  'herstellungsbetriebsratsvorsitzender</p>\nRückseite:\n<h4>Erklärung</h4>\n<p>Text</p>\n'),
+)
+
+def check_check(n_cards=12, min_speedup=50.0):
+    # --check: Befunde an den absichtlich fehlerhaften Karten, keine an einem sauberen Deck,
+    # Laufzeit gegen einen vollen Renderlauf (Cache aus, gleiches Deck)
+    ok = True
+    clean = synthetic_deck(n_cards)
+    Main.check_deck(clean)  # Fonts laden, Metriken warm
+    report = Main.check_deck(clean)
+    if report['cards'] != n_cards or report['problems']:
+        print(f'  sauberes Deck: {report["cards"]} Karten, {len(report["problems"])} mit Befund')
+        ok = False
+    bad = Main.check_deck(''.join(block + '---\n' for _, block in BAD_CARDS))
+    found = {p['card']: {it['type'] for it in p['issues']} for p in bad['problems']}
+    for k, (kind, _) in enumerate(BAD_CARDS, start=1):
+        hit = kind in found.get(k, ())
+        print(f'  Karte {k}: {kind:15s} {"erkannt" if hit else "FEHLT"}  {sorted(found.get(k, ()))}')
+        ok = ok and hit
+    # Zeilenart kommt aus DrawOp.kind, nicht aus der Farbe: gleiche Befunde, wenn Footer und Fließtext
+    # dasselbe Farbtupel haben
+    blocks = [block for _, block in BAD_CARDS]
+    before = [Main.check_card(k, block) for k, block in enumerate(blocks, 1)]
+    muted = Main.MUTED_TEXT_COLOR
+    Main.MUTED_TEXT_COLOR = Main.BODY_TEXT_COLOR
+    try:
+        after = [Main.check_card(k, block) for k, block in enumerate(blocks, 1)]
+    finally:
+        Main.MUTED_TEXT_COLOR = muted
+    if after != before:
+        print('  Befunde hängen von den Textfarben ab')
+        ok = False
+    check_s = min(_best_of(lambda: Main.check_deck(clean), 3), report['seconds'])
+    render_s = _timed_run(clean, RENDER_CACHE=False)
+    speedup = render_s / check_s
+    print(f'{n_cards} Karten: Rendern {render_s:.2f} s, Prüfen {check_s * 1000:.1f} ms ({speedup:.0f}x)')
+    if speedup < min_speedup:
+        print(f'  langsamer als {min_speedup:.0f}x')
+        ok = False
+    print('Deck-Prüfung:', 'ok' if ok else 'FEHLER')
+    if not ok:
+        sys.exit(1)
+    return {'render_s': render_s, 'check_s': check_s, 'speedup': speedup}
+
+def _render_into(out, deck_path, numbers=None, use_cache=False):
+    # voller Lauf (numbers None) oder --cards in den Ordner out; Ausgabe unterdrückt
+    import contextlib
+    Main.OUTPUT_FOLDER = out
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if numbers is None:
+            with open(deck_path, encoding='utf-8') as f:
+                Main.generate_from_text(f, use_cache=use_cache)
+        else:
+            Main.rerender_cards(deck_path, numbers, use_cache=use_cache)
+    return time.perf_counter() - t0
+
+def _tree_diff(a, b):
+    # Dateien (ohne Cache/Index), die fehlen oder nicht byteweise gleich sind
+    bad = []
+    for sub in (Main.SINGLE_SUBDIR, Main.SHEETS_SUBDIR):
+        names = set(os.listdir(os.path.join(a, sub))) | set(os.listdir(os.path.join(b, sub)))
+        for name in sorted(names):
+            pa, pb = os.path.join(a, sub, name), os.path.join(b, sub, name)
+            if not (os.path.exists(pa) and os.path.exists(pb)):
+                bad.append(name)
+                continue
+            with open(pa, 'rb') as fa, open(pb, 'rb') as fb:
+                if fa.read() != fb.read():
+                    bad.append(name)
+    return bad
+
+def check_index(n_cards=40, pick='21-22', scan_cards=20000):
+    # --cards: Deck rendern, Karten in der Datei ändern, nur diese neu rendern -> muss byteweise dem
+    # vollen Lauf (mit Cache) über das geänderte Deck entsprechen (auch mit CRLF und AUTO_FIT = 'split');
+    # dazu Dauer gegen den vollen Lauf und Geschwindigkeit des Index-Aufbaus
+    keys = ('OUTPUT_FOLDER', 'SAVE_SINGLES_TO_PHOTOS', 'AUTO_FIT')
+    saved = {k: getattr(Main, k) for k in keys}
+    Main.SAVE_SINGLES_TO_PHOTOS = False
+    numbers = Main.parse_card_ranges(pick)
+    work = tempfile.mkdtemp(prefix='cards_index_')
+    ok = True
+    try:
+        for auto_fit, newline in (('shrink', '\n'), ('split', '\r\n')):
+            Main.AUTO_FIT = auto_fit
+            blocks = synthetic_deck(n_cards).split('---\n')[:n_cards]
+            if auto_fit == 'split':   # lange Karten vor der Auswahl verschieben die Bögen
+                blocks[1] = blocks[1].replace('</p>', synthetic_paragraph(400) + '</p>')
+            deck = os.path.join(work, f'deck_{auto_fit}.txt')
+            def write(blocks):
+                with open(deck, 'w', encoding='utf-8', newline=newline) as f:
+                    f.write(''.join(blk + '---\n' for blk in blocks))
+            write(blocks)
+            # Referenz: voller Lauf über das geänderte Deck mit demselben Cache-Stand
+            part, full = os.path.join(work, f'part_{auto_fit}'), os.path.join(work, f'full_{auto_fit}')
+            _render_into(part, deck, use_cache=True)
+            Main.DeckIndex.load(deck)
+            shutil.copytree(part, full)
+            for n in numbers:
+                blocks[n - 1] = blocks[n - 1].replace('</h4>', ' (korrigiert)</h4>', 1)
+            time.sleep(0.01)
+            write(blocks)
+            _render_into(part, deck, numbers, use_cache=True)
+            _render_into(full, deck, use_cache=True)
+            bad = _tree_diff(full, part)
+            # Dauer ohne Cache (Nachbarkarten auf den Bögen werden mitgerendert)
+            t_part = _render_into(os.path.join(work, 'cold_part'), deck, numbers)
+            t_full = _render_into(os.path.join(work, 'cold_full'), deck)
+            print(f'  {auto_fit:6s} {newline!r:6s}: Karten {pick} in {t_part:.2f} s, voller Lauf {t_full:.2f} s '
+                  f'({t_full / t_part:.1f}x), {"gleich" if not bad else "ABWEICHUNG " + ", ".join(bad[:6])}')
+            ok = ok and not bad
+        # Index nach Änderung: geänderte Karten werden erkannt
+        index = Main.DeckIndex.load(deck)
+        if len(index) != n_cards:
+            print(f'  Index: {len(index)} Blöcke statt {n_cards}')
+            ok = False
+        # Zufällige Dateien mit Randfällen: Index-Blöcke müssen genau iter_blocks im Textmodus sein
+        pieces = ('---', ' ---- ', '\xa0---\xa0', '--- x', 'a---', '', ' ', '\xa0', 'Vorderseite: Ä', 'Text',
+                  '\ufeffText', 'Rückseite:', '<p>ö</p>')
+        rnd = random.Random(1)
+        fuzz = os.path.join(work, 'fuzz.txt')
+        for k in range(300):
+            nl = rnd.choice(('\n', '\r\n', '\r'))
+            text = nl.join(rnd.choice(pieces) for _ in range(rnd.randint(0, 30)))
+            with open(fuzz, 'w', encoding='utf-8', newline='') as f:
+                f.write(text + (nl if rnd.random() < 0.5 else ''))
+            ref = list(Main.iter_blocks(open(fuzz, encoding='utf-8')))
+            index = Main.DeckIndex.scan(fuzz)
+            got = [blk for _, blk in index.read(range(1, len(index) + 1))]
+            if got != ref:
+                print(f'  Fuzz {k}: {len(got)} statt {len(ref)} Blöcke in {text!r}')
+                ok = False
+                break
+        # Geschwindigkeit: Index-Aufbau gegen das Lesen aller Blöcke per iter_deck
+        big = os.path.join(work, 'big.txt')
+        with open(big, 'w', encoding='utf-8') as f:
+            f.write(synthetic_deck(scan_cards))
+        t0 = time.perf_counter()
+        index = Main.DeckIndex.scan(big)
+        t_scan = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        n_blocks = sum(1 for _ in Main.iter_blocks(open(big, encoding='utf-8')))
+        t_blocks = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        block = next(index.read([scan_cards]))[1]
+        t_seek = time.perf_counter() - t0
+        same = len(index) == n_blocks == scan_cards and block == list(Main.iter_blocks(open(big, encoding='utf-8')))[-1]
+        print(f'  {scan_cards} Karten: Index {t_scan * 1000:.0f} ms (iter_blocks {t_blocks * 1000:.0f} ms), '
+              f'letzte Karte lesen {t_seek * 1000:.2f} ms, {"gleich" if same else "ABWEICHUNG"}')
+        ok = ok and same
+    finally:
+        for k, v in saved.items():
+            setattr(Main, k, v)
+        shutil.rmtree(work, ignore_errors=True)
+    print('Block-Index und --cards:', 'ok' if ok else 'FEHLER')
+    if not ok:
+        sys.exit(1)
+
+def _raster_svg_face(data):
+    # Karten-SVG aus svg_face mit Pillow nachzeichnen (Text an der Grundlinie, anchor 'ls'), zum Vergleich
+    # mit paint_layout: gleiche Pixel = gleiche Positionen, Größen und Farben
+    import xml.etree.ElementTree as ET
+    from PIL import Image, ImageDraw
+    ns = '{http://www.w3.org/2000/svg}'
+    root = ET.fromstring(data)
+    img = Image.new('RGB', (int(root.get('width')), int(root.get('height'))))
+    draw = ImageDraw.Draw(img)
+    for el in root:
+        if el.tag == ns + 'rect':
+            draw.rectangle((0, 0, int(el.get('width')) - 1, int(el.get('height')) - 1), fill=el.get('fill'))
+        elif el.tag == ns + 'g':
+            font = Main.FONTS.get(int(el.get('font-size')))
+            for t in el:
+                draw.text((int(t.get('x')), int(t.get('y'))), t.text, font=font, fill=el.get('fill'), anchor='ls')
+    return img
+
+def _svg_run(deck, out, fmt):
+    import contextlib
+    saved = {k: getattr(Main, k) for k in ('OUTPUT_FOLDER', 'OUTPUT_FORMAT', 'SAVE_SINGLES_TO_PHOTOS')}
+    Main.OUTPUT_FOLDER, Main.OUTPUT_FORMAT, Main.SAVE_SINGLES_TO_PHOTOS = out, fmt, False
+    try:
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            Main.generate_from_text(deck, use_cache=False)
+        return time.perf_counter() - t0
+    finally:
+        for k, v in saved.items():
+            setattr(Main, k, v)
+
+def _dir_bytes(path):
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, names in os.walk(path) for f in names)
+
+def bench_svg(n_cards=200):
+    # SVG gegen PNG: Zeit und Bytes für ein Deck; Karten-SVGs nachgezeichnet gegen paint_layout (Pixel),
+    # alle SVGs wohlgeformt, Speicher flach (Spitze bei n/4 und n Karten)
+    import xml.etree.ElementTree as ET
+    ok = True
+    work = tempfile.mkdtemp(prefix='cards_svg_')
+    prev = Main.TEXT_RENDERER
+    try:
+        Main.load_pil()
+        Main.TEXT_RENDERER = 'pil'   # Referenz mit draw.text wie beim Nachzeichnen
+        worst = 0
+        for i, (front_raw, back_raw) in enumerate(Main.iter_deck(synthetic_deck(6, unicode=True)), start=1):
+            card = Main.parse_card(i, front_raw, back_raw)
+            for side, struct in (('front', card.front), ('back', card.back)):
+                layout = Main.fit_face(struct, i, side)
+                diff = _max_pixel_diff(Main.paint_layout(layout), _raster_svg_face(Main.svg_face(layout)))
+                worst = max(worst, diff)
+        Main.TEXT_RENDERER = prev
+        print(f'  Karten-SVG nachgezeichnet gegen paint_layout: max. Abweichung {worst}')
+        ok = ok and worst == 0
+        deck = synthetic_deck(n_cards)
+        t_png = _svg_run(deck, os.path.join(work, 'png'), 'png')
+        t_svg = _svg_run(deck, os.path.join(work, 'svg'), 'svg')
+        b_png, b_svg = _dir_bytes(os.path.join(work, 'png')), _dir_bytes(os.path.join(work, 'svg'))
+        print(f'{n_cards} Karten: PNG {t_png:.2f} s, {b_png / 1e6:.1f} MB; SVG {t_svg:.2f} s, {b_svg / 1e6:.2f} MB '
+              f'({t_png / t_svg:.0f}x schneller, {b_png / b_svg:.0f}x kleiner)')
+        bad = 0
+        for d, _, names in os.walk(os.path.join(work, 'svg')):
+            for name in names:
+                try:
+                    ET.parse(os.path.join(d, name))
+                except ET.ParseError as e:
+                    bad += 1
+                    print(f'  {name}: {e}')
+        ok = ok and not bad
+        peaks = [_py_alloc_kb(lambda n=n: _svg_run(synthetic_deck(n), os.path.join(work, f'mem{n}'), 'svg'))
+                 for n in (max(4, n_cards // 4), n_cards)]
+        print(f'  Python-Spitze: {peaks[0]:.0f} KB bei {max(4, n_cards // 4)} Karten, {peaks[1]:.0f} KB bei {n_cards}')
+        ok = ok and peaks[1] < peaks[0] * 1.5 + 512
+    finally:
+        Main.TEXT_RENDERER = prev
+        shutil.rmtree(work, ignore_errors=True)
+    print('SVG-Ausgabe:', 'ok' if ok else 'FEHLER')
+    if not ok:
+        sys.exit(1)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Benchmarks für Main.py')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    st = sub.add_parser('stages', help='Zeit und Speicher je Pipeline-Stufe, JSON, Vergleich mit Basis')
+    st.add_argument('--cards', type=int, default=8)
+    st.add_argument('--bullets', type=int, default=3)
+    st.add_argument('--words', type=int, default=60)
+    st.add_argument('--paragraphs', type=int, default=1)
+    st.add_argument('--unicode', action='store_true', help='typografische Zeichen, NFD, Ligaturen')
+    st.add_argument('--repeat', type=int, default=5)
+    st.add_argument('--json', metavar='DATEI', help='Ergebnis als JSON schreiben')
+    st.add_argument('--compare', metavar='BASIS', help='gegen gespeichertes JSON prüfen, Exit 1 bei Regression')
+    st.add_argument('--threshold', type=float, default=0.25, help='erlaubter Zuwachs (0.25 = +25%%)')
+    st.add_argument('--mem-threshold', type=float, default=None, help='Schwelle Speicher (Standard: --threshold)')
+    w = sub.add_parser('wrap', help='wrap_by_width gegen die quadratische Referenz')
+    w.add_argument('--words', type=int, default=500)
+    w.add_argument('--repeat', type=int, default=20)
+    m = sub.add_parser('memory', help='Spitzen-RSS über wachsende Deckgrößen')
+    m.add_argument('--cards', type=int, nargs='+', default=[8, 32])
+    m.add_argument('--tolerance', type=float, default=0.15)
+    m.add_argument('--sheet-output', choices=('images', 'pdf', 'both'), default=None)
+    m.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    s = sub.add_parser('sheets', help='Nur-Bögen-Lauf: Downscale gegen direktes Rendern')
+    s.add_argument('--cards', type=int, default=16)
+    pp = sub.add_parser('parser', help='Parser: Gleichheit mit der Referenz und Durchsatz')
+    pp.add_argument('--blocks', type=int, default=100000)
+    pp.add_argument('--fuzz', type=int, default=5000)
+    e = sub.add_parser('encode', help='Encode-Zeit und Dateigröße je Ausgabeformat')
+    e.add_argument('--cards', type=int, default=8)
+    pd = sub.add_parser('pdf', help='Duplex-PDF gegen die Bogenbilder prüfen')
+    pd.add_argument('--cards', type=int, default=20)
+    pd.add_argument('--format', choices=sorted(Main.IMAGE_EXTENSIONS), default=None)
+    im = sub.add_parser('import', help='Importzeit des Headless-Pfads gegen ein Budget')
+    im.add_argument('--budget-ms', type=float, default=60.0)
+    im.add_argument('--runs', type=int, default=5)
+    dm = sub.add_parser('daemon', help='Kaltstart gegen Render-Daemon (kleine Decks)')
+    dm.add_argument('--cards', type=int, default=3)
+    dm.add_argument('--runs', type=int, default=3)
+    wr = sub.add_parser('writer', help='Hintergrund-Schreiber mit Fotos-Stub prüfen und messen')
+    wr.add_argument('--cards', type=int, default=12)
+    wr.add_argument('--photo-ms', type=float, default=40)
+    pt = sub.add_parser('paint', help='Layout/Paint gegen den bisherigen Renderer (Pixel, Zeit je Seite)')
+    pt.add_argument('--cards', type=int, default=8)
+    pt.add_argument('--repeat', type=int, default=3)
+    af = sub.add_parser('autofit', help='AUTO_FIT: Schrumpfen zu langer Karten gegen die naive Suche')
+    af.add_argument('--cards', type=int, default=12)
+    af.add_argument('--repeat', type=int, default=3)
+    cp = sub.add_parser('compose', help='Bogen: Image.reduce gegen LANCZOS (2x2-4x4), Duplex, Beschnitt')
+    cp.add_argument('--repeat', type=int, default=3)
+    bt = sub.add_parser('batch', help='Batch-Modus: Ausgabe je Deck, Fortsetzen über das Journal, Durchsatz')
+    bt.add_argument('--decks', type=int, default=6)
+    bt.add_argument('--cards', type=int, default=4)
+    bt.add_argument('--jobs', type=int, default=2)
+    at = sub.add_parser('atlas', help='Glyph-Atlas gegen draw.text: Pixelabweichung und Durchsatz')
+    at.add_argument('--cards', type=int, default=8)
+    at.add_argument('--repeat', type=int, default=3)
+    at.add_argument('--tolerance', type=int, default=0, help='erlaubte max. Abweichung je Kanal (0-255)')
+    pm = sub.add_parser('pixelmode', help='Pixelformate RGB/L/P: Speicher, Paint, Bogen, PNG, Abweichung')
+    pm.add_argument('--cards', type=int, default=8)
+    pm.add_argument('--repeat', type=int, default=3)
+    pg = sub.add_parser('progress', help='Fortschritts-Ereignisse, Abbruch und View mit ui-Stub prüfen')
+    pg.add_argument('--cards', type=int, default=12)
+    ck = sub.add_parser('check', help='--check: Befunde an fehlerhaften Karten und Laufzeit gegen Rendern')
+    ck.add_argument('--cards', type=int, default=12)
+    ck.add_argument('--min-speedup', type=float, default=50.0)
+    ix = sub.add_parser('index', help='Block-Index: --cards gegen vollen Lauf (byteweise), Index-Aufbau')
+    ix.add_argument('--cards', type=int, default=40)
+    ix.add_argument('--pick', default='21-22')
+    ix.add_argument('--scan-cards', type=int, default=20000)
+    sv = sub.add_parser('svg', help='SVG-Ausgabe gegen PNG: Zeit, Bytes, Positionen (nachgezeichnet), Speicher')
+    sv.add_argument('--cards', type=int, default=200)
+    args = ap.parse_args(argv)
+    if args.cmd == 'stages':
+        report = bench_stages(args.cards, args.bullets, args.words, args.paragraphs, args.unicode, args.repeat)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+            print('JSON:', args.json)
+        if args.compare:
+            with open(args.compare, encoding='utf-8') as f:
+                baseline = json.load(f)
+            failures = compare_stages(report, baseline, args.threshold, args.mem_threshold)
+            if failures:
+                print('Regressionen:', '; '.join(failures))
+                sys.exit(1)
+            print('  keine Regression')
+    elif args.cmd == 'wrap':
+        bench_wrap(args.words, args.repeat)
+    elif args.cmd == 'memory':
+        if args.child:
+            _memory_child(args.child, args.sheet_output)
+        else:
+            bench_memory(tuple(args.cards), args.tolerance, args.sheet_output)
+    elif args.cmd == 'sheets':
+        bench_sheets(args.cards)
+    elif args.cmd == 'parser':
+        bench_parser(args.blocks, args.fuzz)
+    elif args.cmd == 'encode':
+        bench_encode(args.cards)
+    elif args.cmd == 'pdf':
+        check_pdf(args.cards, args.format)
+    elif args.cmd == 'import':
+        check_import(args.budget_ms, args.runs)
+    elif args.cmd == 'daemon':
+        bench_daemon(args.cards, args.runs)
+    elif args.cmd == 'writer':
+        check_writer(args.cards, args.photo_ms)
+    elif args.cmd == 'paint':
+        bench_paint(args.cards, args.repeat)
+    elif args.cmd == 'autofit':
+        bench_autofit(args.cards, args.repeat)
+    elif args.cmd == 'compose':
+        bench_compose(args.repeat)
+    elif args.cmd == 'batch':
+        bench_batch(args.decks, args.cards, args.jobs)
+    elif args.cmd == 'atlas':
+        bench_atlas(args.cards, args.repeat, args.tolerance)
+    elif args.cmd == 'pixelmode':
+        bench_pixelmode(args.cards, args.repeat)
+    elif args.cmd == 'progress':
+        check_progress(args.cards)
+    elif args.cmd == 'check':
+        check_check(args.cards, args.min_speedup)
+    elif args.cmd == 'index':
+        check_index(args.cards, args.pick, args.scan_cards)
+    elif args.cmd == 'svg':
+        bench_svg(args.cards)
+
+if __name__ == '__main__':
+    main()